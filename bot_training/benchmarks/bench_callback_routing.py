@@ -0,0 +1,77 @@
+"""Стоимость маршрутизации callback_query в зависимости от числа обработчиков.
+
+Сравниваются прежняя схема (роутер на группу кнопок, фильтр-лямбда
+c.data.startswith(...) на каждый обработчик) и CallbackDispatcher
+с выбором обработчика по коду операции. Нажимается кнопка последнего
+обработчика - худший случай для перебора фильтров.
+Запуск из каталога bot_training:
+    python -m benchmarks.bench_callback_routing [--updates 2000]
+"""
+import argparse
+import asyncio
+import time
+
+from aiogram import Dispatcher, Router
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from benchmarks.fakes import callback_update, make_bot
+from handlers.callback_dispatcher import CallbackDispatcher, CallbackHandlers
+from keyboards import callbacks as codec
+
+HANDLERS_PER_ROUTER = 4
+
+
+async def handle(callback):
+    return True
+
+
+def filter_dispatcher(count: int) -> Dispatcher:
+    dp = Dispatcher(storage=MemoryStorage())
+    for start in range(0, count, HANDLERS_PER_ROUTER):
+        router = Router()
+        for i in range(start, min(start + HANDLERS_PER_ROUTER, count)):
+            router.callback_query.register(handle, lambda c, prefix=f'action{i}_': c.data.startswith(prefix))
+        dp.include_router(router)
+    return dp
+
+
+def codec_dispatcher(count: int) -> Dispatcher:
+    ops = [f'x{i}' for i in range(count)]
+    # Коды операций для бенчмарка добавляются к настоящим
+    codec.OPS = codec.OPS | set(ops)
+    table = CallbackHandlers()
+    for op in ops:
+        table(op)(handle)
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.include_router(CallbackDispatcher(table))
+    return dp
+
+
+async def per_update_us(dp: Dispatcher, data: str, updates: int) -> float:
+    bot = make_bot()
+    batch = [callback_update(1, data) for _ in range(updates)]
+    for update in batch[:100]:
+        assert await dp.feed_update(bot, update) is True
+    started = time.perf_counter()
+    for update in batch:
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - started) / updates * 1e6
+
+
+async def run(updates: int):
+    print(f"{'handlers':>9}{'filters, us':>14}{'codec, us':>12}")
+    for count in (6, 12, 25, 50, 100, 200):
+        filters = await per_update_us(filter_dispatcher(count), f'action{count - 1}_123_456', updates)
+        dispatched = await per_update_us(codec_dispatcher(count), f'x{count - 1}:123:456', updates)
+        print(f"{count:>9}{filters:>14.1f}{dispatched:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.updates))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Сколько скачивает зеркало таблицы: полная загрузка против проверки modifiedTime.
+
+Настоящий GoogleSheetsManager (gspread) работает с FakeSheetsServer,
+который считает запросы и байты ответов. Зеркало делает pull раз в
+цикл (в боте цикл - MIRROR_PULL_INTERVAL); время от времени
+администратор правит расписание или бот записывает ученика. В конце
+локальная база сверяется с таблицей. Запуск из каталога bot_training:
+    python -m benchmarks.bench_incremental_refresh [--cycles 60] [--schedule-rows 3000]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from benchmarks.bench_schedule_index import make_rows
+from benchmarks.fake_sheets_server import FakeSheetsServer, LocalSheetsManager
+from data.local_store import LocalStore
+from services.async_sheets import AsyncSheetsManager
+from services.google_sheets import GoogleSheetsManager
+from services.sheets_mirror import SCHEDULE_MIRROR, SCHEDULE_SHEET, STUDENTS_MIRROR, STUDENTS_SHEET, SheetsMirror
+
+STUDENT_HEADER = ['ID', 'ФИО', 'Город', 'Уровень', 'Дата', 'Статус', 'Цена', 'Предоплата', 'Проверил', 'Время']
+
+
+def student_rows(count: int) -> list:
+    rows = [STUDENT_HEADER]
+    for i in range(count):
+        rows.append([str(100000 + i), f'Ученик {i}', 'Москва', 'Functional', f'{1 + i % 28:02d}.05.2025',
+                     'confirmed', '5000', '1000', '1', '2025-05-01 12:00'])
+    return rows
+
+
+async def run_mode(incremental: bool, args) -> dict:
+    server = FakeSheetsServer({
+        SCHEDULE_SHEET: make_rows(args.schedule_rows),
+        STUDENTS_SHEET: student_rows(args.students),
+    })
+    await server.start()
+    store = LocalStore(':memory:')
+    sheets_manager = AsyncSheetsManager(LocalSheetsManager(server, store))
+    mirror = SheetsMirror(sheets_manager, store, [SCHEDULE_MIRROR, STUDENTS_MIRROR], check_modified=incremental)
+    rnd = random.Random(args.seed)
+    try:
+        # Первая загрузка одинакова в обоих режимах и в замер не входит
+        await mirror.pull_all()
+        server.reset_counters()
+
+        started = time.perf_counter()
+        for cycle in range(1, args.cycles + 1):
+            if cycle % args.edit_every == 0:
+                # Администратор снимает или ставит отметку актуальности
+                row_number = rnd.randint(2, args.schedule_rows + 1)
+                server.edit_cell(SCHEDULE_SHEET, row_number, 2, rnd.choice(['да', 'нет']))
+            if cycle % args.register_every == 0:
+                # Бот записывает ученика и отправляет строку в таблицу
+                GoogleSheetsManager.save_student(store, {
+                    'user_id': 900000 + cycle, 'full_name': f'Новый {cycle}', 'city': 'Казань',
+                    'level': 'Functional', 'date': '01.06.2025', 'payment_status': 'pending',
+                })
+                await mirror.push(STUDENTS_SHEET)
+            await mirror.pull_all()
+        elapsed = time.perf_counter() - started
+
+        consistent = all(store.values(title) == rows for title, rows in server.worksheets.items())
+        return {
+            'bytes_downloaded': sum(server.bytes_sent.values()),
+            'requests': dict(server.requests),
+            'bytes_by_request': dict(server.bytes_sent),
+            'pull_cycle_ms': round(elapsed / args.cycles * 1000, 2),
+            'consistent': consistent,
+        }
+    finally:
+        sheets_manager.close()
+        store.close()
+        await server.stop()
+
+
+async def run(args) -> dict:
+    full = await run_mode(False, args)
+    incremental = await run_mode(True, args)
+    return {
+        'cycles': args.cycles,
+        'schedule_rows': args.schedule_rows,
+        'students': args.students,
+        'full': full,
+        'incremental': incremental,
+        'bytes_saved_pct': round(100 * (1 - incremental['bytes_downloaded'] / max(1, full['bytes_downloaded'])), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cycles', type=int, default=60)
+    parser.add_argument('--schedule-rows', type=int, default=3000)
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--edit-every', type=int, default=10)
+    parser.add_argument('--register-every', type=int, default=15)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if not (result['full']['consistent'] and result['incremental']['consistent']):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
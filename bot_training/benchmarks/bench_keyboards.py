@@ -0,0 +1,46 @@
+"""Стоимость клавиатур уровней и дат на один апдейт: сборка против кэша.
+
+Запуск из каталога bot_training:
+    python -m benchmarks.bench_keyboards [--dates 20]
+"""
+import argparse
+import timeit
+
+from config import LEVELS
+from keyboards.inline_kb import KeyboardCache, build_dates_keyboard, build_levels_keyboard
+
+
+def per_call_us(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dates', type=int, default=20)
+    args = parser.parse_args()
+
+    level = next(iter(LEVELS.values()))
+    dates = [f"{1 + i % 28:02d}.{1 + i // 28:02d}.2030" for i in range(args.dates)]
+    cache = KeyboardCache()
+
+    # Кэш должен отдавать ту же разметку, что и сборка
+    assert cache.levels() == build_levels_keyboard()
+    assert cache.dates(level, dates, 1) == build_dates_keyboard(dates)
+    assert cache.dates(level, dates, 1) is cache.dates(level, dates, 1)
+    assert cache.dates(level, dates, 2) is not cache.dates(level, dates, 1)
+
+    results = [
+        ('levels', per_call_us(build_levels_keyboard, 2000),
+         per_call_us(cache.levels, 100000)),
+        ('dates', per_call_us(lambda: build_dates_keyboard(dates), 2000),
+         per_call_us(lambda: cache.dates(level, dates, 1), 100000)),
+    ]
+
+    print(f"levels: {len(LEVELS)}, dates: {args.dates}")
+    print(f"{'keyboard':<12}{'build, us':>12}{'cached, us':>12}{'speedup':>10}")
+    for name, built, cached in results:
+        print(f"{name:<12}{built:>12.1f}{cached:>12.3f}{built / cached:>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Накладные расходы middleware метрик на один апдейт.
+
+Одни и те же апдейты (сообщение и нажатие кнопки, каждый с вызовом
+Bot API) прогоняются через диспетчер без метрик и с метриками, разница
+сравнивается с лимитом. Отдельно показана стоимость каждого middleware
+с пустым обработчиком. Затем проверяется, что /metrics отдает
+собранные значения. Запуск из каталога bot_training:
+    python -m benchmarks.bench_metrics_overhead [--updates 5000]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import statistics
+import time
+
+from aiogram import Dispatcher, F, Router
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendMessage
+from aiohttp import ClientSession
+
+from benchmarks.fakes import callback_update, make_bot, message_update
+from handlers.callback_dispatcher import CallbackDispatcher, CallbackHandlers
+from keyboards.callbacks import BACK_TO_LEVELS, encode
+from services.instrumentation import (
+    BotApiMetricsMiddleware, HandlerMetricsMiddleware, MetricsServer, UpdateMetricsMiddleware, setup_metrics
+)
+
+LIMIT_US = 50
+REPEATS = 5
+CHUNK = 250
+
+
+def build(with_metrics: bool):
+    router = Router()
+
+    @router.message(F.text)
+    async def on_message(message):
+        await message.answer('ok')
+
+    callbacks = CallbackHandlers()
+
+    @callbacks(BACK_TO_LEVELS)
+    async def on_callback(callback):
+        await callback.answer()
+
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.include_router(router)
+    dp.include_router(CallbackDispatcher(callbacks))
+    bot = make_bot()
+    if with_metrics:
+        setup_metrics(dp)
+        bot.session.middleware(BotApiMetricsMiddleware())
+    return dp, bot
+
+
+async def per_update_us(dp: Dispatcher, bot, updates: list) -> float:
+    started = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - started) / len(updates) * 1e6
+
+
+async def middleware_us(middleware, args: tuple, count: int) -> float:
+    """Стоимость одного вызова middleware сверх вызова пустого обработчика"""
+    async def call_next(*_):
+        return None
+
+    async def direct(*_):
+        return await call_next()
+
+    timings = []
+    for target in (direct, middleware):
+        best = float('inf')
+        for _ in range(REPEATS):
+            started = time.perf_counter()
+            for _ in range(count):
+                await target(call_next, *args)
+            best = min(best, time.perf_counter() - started)
+        timings.append(best / count * 1e6)
+    return timings[1] - timings[0]
+
+
+async def run(count: int, port: int) -> dict:
+    updates = [message_update(i % 100 + 1, 'hello') if i % 2 else callback_update(i % 100 + 1, encode(BACK_TO_LEVELS))
+               for i in range(count)]
+    plain = build(False)
+    measured = build(True)
+
+    # Стоимость каждого middleware отдельно: на апдейт приходится по одному
+    # вызову внешнего и внутреннего middleware и один вызов Bot API
+    handler = measured[0].sub_routers[0].message.handlers[0]
+    method = SendMessage(chat_id=1, text='ok')
+    parts = {
+        'update': await middleware_us(UpdateMetricsMiddleware(), (updates[0], {}), count),
+        'handler': await middleware_us(HandlerMetricsMiddleware(), (updates[1].message, {'handler': handler}), count),
+        'bot_api': await middleware_us(BotApiMetricsMiddleware(), (measured[1], method), count),
+    }
+
+    # Сквозной замер: короткие прогоны чередуются, сборщик мусора выключен,
+    # берется медиана разностей соседних прогонов
+    for dp, bot in (plain, measured):
+        await per_update_us(dp, bot, updates[:500])  # прогрев
+    differences = []
+    gc.disable()
+    try:
+        for start in range(0, count, CHUNK):
+            chunk = updates[start:start + CHUNK]
+            for _ in range(REPEATS):
+                differences.append(await per_update_us(*measured, chunk) - await per_update_us(*plain, chunk))
+    finally:
+        gc.enable()
+
+    server = MetricsServer('127.0.0.1', port)
+    await server.start()
+    try:
+        async with ClientSession() as session:
+            async with session.get(f'http://127.0.0.1:{port}/metrics') as response:
+                body = await response.text()
+                content_type = response.headers['Content-Type']
+    finally:
+        await server.stop()
+
+    overhead = statistics.median(differences)
+    return {
+        'updates': count,
+        'middleware_us': {name: round(value, 2) for name, value in parts.items()},
+        # Сквозная оценка включает и обвязку aiogram вокруг middleware
+        'overhead_us': round(overhead, 2),
+        'limit_us': LIMIT_US,
+        'within_limit': overhead < LIMIT_US,
+        'endpoint_content_type': content_type,
+        'endpoint_has_handler_metrics': 'handler_seconds_bucket' in body and 'bot_api_seconds_count' in body,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', type=int, default=5000)
+    parser.add_argument('--port', type=int, default=9190)
+    args = parser.parse_args()
+    result = asyncio.run(run(args.updates, args.port))
+    print(json.dumps(result, indent=2))
+    if not result['within_limit']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Сравнение индекса расписания с прежним построчным поиском.
+
+Запуск из каталога bot_training:
+    python -m benchmarks.bench_schedule_index [--rows 10000]
+"""
+import argparse
+import random
+import timeit
+
+from config import LEVELS
+from services.schedule_index import ScheduleIndex
+
+ACTIVE = ['да', 'yes', 'true', '1', '+']
+
+
+def make_rows(count: int, seed: int = 1) -> list:
+    rnd = random.Random(seed)
+    levels = list(LEVELS.values())
+    rows = [['Уровень', 'Дата', 'Актуальная', 'Ссылка']]
+    for i in range(count):
+        date = f"{1 + i % 28:02d}.{1 + (i // 28) % 12:02d}.{2020 + i // 336}"
+        actual = 'да' if rnd.random() < 0.1 else 'нет'
+        rows.append([rnd.choice(levels), date, actual, f"https://t.me/+group{i}"])
+    return rows
+
+
+def legacy_dates_for_level(all_data: list, level: str) -> list:
+    """Прежний GoogleSheetsManager.get_dates_for_level без логирования"""
+    headers = [header.strip().lower() for header in all_data[0]]
+    dates = []
+    for row in all_data[1:]:
+        if len(row) < 3:
+            continue
+        record = dict(zip(headers, row))
+        record_level = record.get('уровень', '').strip()
+        actual_status = record.get('актуальная', '').strip().lower()
+        date_value = record.get('дата', '').strip()
+        if (record_level.lower() == level.lower() and
+                actual_status in ACTIVE and date_value):
+            dates.append(date_value)
+    return dates
+
+
+def legacy_group_info(all_data: list, level: str, date: str) -> dict:
+    """Прежний GoogleSheetsManager.get_group_info_for_date"""
+    headers = [header.strip().lower() for header in all_data[0]]
+    level_col = date_col = actual_col = link_col = None
+    for i, header in enumerate(headers):
+        if 'уровень' in header:
+            level_col = i
+        elif 'дата' in header:
+            date_col = i
+        elif 'актуальная' in header:
+            actual_col = i
+        elif 'ссылка' in header:
+            link_col = i
+    for row in all_data[1:]:
+        if len(row) <= max(level_col, date_col, actual_col):
+            continue
+        if (row[level_col].strip().lower() == level.lower() and
+                row[date_col].strip() == date and
+                row[actual_col].strip().lower() in ACTIVE):
+            group_link = row[link_col].strip() if len(row) > link_col else None
+            return {"group_exists": True, "group_link": group_link or None, "has_link": bool(group_link)}
+    return {"group_exists": False, "group_link": None}
+
+
+def per_call_us(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    index = ScheduleIndex(rows)
+    level = 'Functional'
+    dates = index.dates_for_level(level)
+    date = dates[len(dates) // 2]
+
+    # Результаты должны совпадать с прежней реализацией
+    assert legacy_dates_for_level(rows, level) == dates
+    assert legacy_group_info(rows, level, date) == index.group_info(level, date)
+
+    build = per_call_us(lambda: ScheduleIndex(rows), 3)
+    results = [
+        ('dates_for_level', per_call_us(lambda: legacy_dates_for_level(rows, level), 10),
+         per_call_us(lambda: index.dates_for_level(level), 100000)),
+        ('group_info', per_call_us(lambda: legacy_group_info(rows, level, date), 10),
+         per_call_us(lambda: index.group_info(level, date), 100000)),
+    ]
+
+    print(f"rows: {args.rows}, index build: {build:.0f} us (once per snapshot)")
+    print(f"{'lookup':<18}{'scan, us':>12}{'index, us':>12}{'speedup':>10}")
+    for name, scan, indexed in results:
+        print(f"{name:<18}{scan:>12.1f}{indexed:>12.3f}{scan / indexed:>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Холодный старт бота и задержка первого апдейта, с прогревом и без.
+
+1. Импорт main в отдельном процессе: как сейчас (gspread и oauth2client
+   загружаются при первом обращении к Google) и с прежним немедленным
+   импортом этих пакетов.
+2. Запуск диспетчера до готовности и первые апдейты пользователя
+   (/start и выбор уровня): с прежними обработчиками startup и со
+   Startup.run. Google заменен FakeSheetsServer с задержкой ответа,
+   работает настоящий GoogleSheetsManager.
+
+Запуск из каталога bot_training:
+    python -m benchmarks.bench_startup [--runs 5] [--sheets-latency 0.1]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from aiogram import Dispatcher
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from benchmarks.bench_schedule_index import make_rows
+from benchmarks.bench_incremental_refresh import student_rows
+from benchmarks.fake_sheets_server import FakeSheetsServer, LocalSheetsManager
+from benchmarks.fakes import callback_update, make_bot, message_update
+from config import LEVELS
+from data.backends import MemoryBackend
+from data.local_store import LocalStore
+from data.temporary_storage import TemporaryStorage
+from keyboards.callbacks import level_callback
+from main import include_routers
+from services.async_sheets import AsyncSheetsManager
+from services.sheets_mirror import SCHEDULE_MIRROR, SCHEDULE_SHEET, STUDENTS_MIRROR, STUDENTS_SHEET, SheetsMirror
+from services.startup import Startup
+from services.write_behind import StudentWriteQueue
+
+IMPORT_VARIANTS = {
+    'lazy': 'import main',
+    'eager': 'import gspread, oauth2client.service_account; import main',
+}
+
+
+def _env() -> dict:
+    return dict(os.environ, ADMIN_IDS=os.environ.get('ADMIN_IDS', '1'), BOT_TOKEN='42:TEST')
+
+
+def import_seconds(code: str, runs: int) -> float:
+    """Медиана времени запуска интерпретатора с импортом main"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, env=_env())
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+async def start_bot(warm: bool, args) -> dict:
+    server = FakeSheetsServer({
+        SCHEDULE_SHEET: make_rows(args.schedule_rows),
+        STUDENTS_SHEET: student_rows(args.students),
+    }, latency=args.sheets_latency)
+    await server.start()
+    TemporaryStorage.configure(MemoryBackend())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LocalStore(os.path.join(tmp, 'local.sqlite3'))
+        sheets_manager = AsyncSheetsManager(LocalSheetsManager(server, store))
+        mirror = SheetsMirror(sheets_manager, store, [SCHEDULE_MIRROR, STUDENTS_MIRROR])
+        queue = StudentWriteQueue(store, mirror)
+        dp = Dispatcher(storage=MemoryStorage(), sheets_manager=sheets_manager, sheets_mirror=mirror,
+                        student_queue=queue)
+        if warm:
+            dp.startup.register(Startup(sheets_manager, mirror).run)
+        else:
+            # Так main.py запускал бота до прогрева
+            dp.startup.register(mirror.start)
+        dp.shutdown.register(mirror.stop)
+        include_routers(dp)
+        bot = make_bot()
+
+        try:
+            started = time.perf_counter()
+            await dp.emit_startup(bot=bot)
+            ready = time.perf_counter() - started
+
+            first_updates = {}
+            user_id = 100000
+            for name, update in (('start', message_update(user_id, '/start')),
+                                 ('level', callback_update(user_id, level_callback(next(iter(LEVELS)))))):
+                started = time.perf_counter()
+                await dp.feed_update(bot, update)
+                first_updates[name] = round((time.perf_counter() - started) * 1000, 2)
+            await dp.emit_shutdown(bot=bot)
+        finally:
+            sheets_manager.close()
+            store.close()
+            await server.stop()
+
+    return {'ready_ms': round(ready * 1000, 1), 'first_update_ms': first_updates}
+
+
+def start_in_process(mode: str, argv: list) -> dict:
+    """Каждый запуск - в новом процессе: роутеры подключаются к диспетчеру
+    один раз, а кэши клавиатур и расписания должны быть пустыми"""
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_startup', '--mode', mode] + argv,
+                            check=True, env=_env(), capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--sheets-latency', type=float, default=0.1)
+    parser.add_argument('--schedule-rows', type=int, default=3000)
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--mode', choices=('cold', 'warm'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        print(json.dumps(asyncio.run(start_bot(args.mode == 'warm', args))))
+        return
+
+    argv = ['--sheets-latency', str(args.sheets_latency), '--schedule-rows', str(args.schedule_rows),
+            '--students', str(args.students)]
+
+    imports = {name: round(import_seconds(code, args.runs) * 1000, 1) for name, code in IMPORT_VARIANTS.items()}
+    result = {
+        'import_main_ms': imports,
+        'import_saved_ms': round(imports['eager'] - imports['lazy'], 1),
+        'startup': {mode: start_in_process(mode, argv) for mode in ('cold', 'warm')},
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
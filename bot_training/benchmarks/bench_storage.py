@@ -0,0 +1,55 @@
+"""Сравнение хранилищ TemporaryStorage: словари в памяти и SQLite (WAL).
+
+Запуск из каталога bot_training:
+    python -m benchmarks.bench_storage [--users 10000]
+"""
+import argparse
+import os
+import tempfile
+import timeit
+
+from data.backends import MemoryBackend, SQLiteBackend
+
+
+def sample_user(user_id: int) -> dict:
+    return {
+        'user_id': user_id, 'full_name': 'Ivan Ivanov', 'city': 'Moscow',
+        'username': f'user{user_id}', 'level': 'Functional', 'level_key': 'functional',
+        'date': '01.01.2030', 'full_price': 15000, 'prepayment': 7500,
+    }
+
+
+def per_call_us(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def measure(backend, users: int) -> dict:
+    for user_id in range(users):
+        backend.save_user_data(user_id, sample_user(user_id))
+    probe = users // 2
+    data = sample_user(probe)
+    return {
+        'get_user_data': per_call_us(lambda: backend.get_user_data(probe), 20000),
+        'save_user_data': per_call_us(lambda: backend.save_user_data(probe, data), 5000),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_backend = SQLiteBackend(os.path.join(tmp, 'bench.sqlite3'))
+        results = {'memory': measure(MemoryBackend(), args.users),
+                   'sqlite': measure(sqlite_backend, args.users)}
+        sqlite_backend.close()
+
+    print(f"users: {args.users}")
+    print(f"{'backend':<10}{'get, us':>10}{'save, us':>10}")
+    for name, timings in results.items():
+        print(f"{name:<10}{timings['get_user_data']:>10.2f}{timings['save_user_data']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
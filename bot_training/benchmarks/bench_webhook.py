@@ -0,0 +1,110 @@
+"""Задержка обработки апдейтов: webhook против long polling.
+
+Поднимает webhook-сервер на локальном порту и отправляет в него
+синтетические апдейты, затем прогоняет те же апдейты через
+Dispatcher.feed_update (так апдейты обрабатываются при polling).
+Сеть до Telegram не моделируется. Запуск из каталога bot_training:
+    python -m benchmarks.bench_webhook [--users 200]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+import time
+
+from aiohttp import ClientSession, web
+from aiogram import Dispatcher
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from benchmarks.common import summarize
+from benchmarks.fakes import FakeSheetsManager, make_bot, message_update, schedule_rows
+from handlers.registration import router as registration_router
+from handlers.start import router as start_router
+from services.webhook import create_webhook_app
+
+SECRET = 'benchmark-secret'
+PATH = '/webhook'
+
+
+def user_updates(user_id: int) -> list:
+    return [message_update(user_id, '/start'), message_update(user_id, 'Ivan Ivanov, Moscow')]
+
+
+async def polling_latencies(dp: Dispatcher, bot, users: range) -> list:
+    async def run_user(user_id: int):
+        latencies = []
+        for update in user_updates(user_id):
+            started = time.perf_counter()
+            await dp.feed_update(bot, update)
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    results = await asyncio.gather(*(run_user(user_id) for user_id in users))
+    return [value for latencies in results for value in latencies]
+
+
+async def webhook_latencies(session: ClientSession, url: str, users: range) -> list:
+    headers = {'X-Telegram-Bot-Api-Secret-Token': SECRET, 'Content-Type': 'application/json'}
+
+    async def run_user(user_id: int):
+        latencies = []
+        for update in user_updates(user_id):
+            body = update.model_dump_json(by_alias=True, exclude_none=True)
+            started = time.perf_counter()
+            async with session.post(url, data=body, headers=headers) as response:
+                await response.read()
+                assert response.status == 200, response.status
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    results = await asyncio.gather(*(run_user(user_id) for user_id in users))
+    return [value for latencies in results for value in latencies]
+
+
+async def run(users: int, port: int) -> dict:
+    bot = make_bot()
+    dp = Dispatcher(storage=MemoryStorage(), sheets_manager=FakeSheetsManager(schedule_rows(['Basic'], ['01.01.2030'])))
+    dp.include_router(start_router)
+    dp.include_router(registration_router)
+
+    # handle_in_background=False: ответ приходит после обработки апдейта
+    app = create_webhook_app(dp, bot, PATH, SECRET, handle_in_background=False)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    url = f'http://127.0.0.1:{port}{PATH}'
+
+    try:
+        async with ClientSession() as session:
+            # Запрос с неверным секретом должен быть отклонен
+            async with session.post(url, data='{}', headers={'X-Telegram-Bot-Api-Secret-Token': 'wrong'}) as response:
+                rejected_status = response.status
+
+            webhook = await webhook_latencies(session, url, range(1, users + 1))
+        polling = await polling_latencies(dp, bot, range(users + 1, 2 * users + 1))
+    finally:
+        await runner.cleanup()
+
+    return {
+        'users': users,
+        'updates_per_mode': users * 2,
+        'wrong_secret_status': rejected_status,
+        'polling_ms': summarize(polling),
+        'webhook_ms': summarize(webhook),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--port', type=int, default=8089)
+    args = parser.parse_args()
+    # Хендлер регистрации печатает отладку в stdout, отчет должен остаться чистым JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        result = asyncio.run(run(args.users, args.port))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Общие помощники для бенчмарков и нагрузочных тестов"""
+import asyncio
+import time
+from typing import List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[position]
+
+
+def summarize(values: List[float], scale: float = 1000.0) -> dict:
+    """p50/p95/p99/max в миллисекундах (по умолчанию)"""
+    return {
+        'count': len(values),
+        'p50': round(percentile(values, 50) * scale, 3),
+        'p95': round(percentile(values, 95) * scale, 3),
+        'p99': round(percentile(values, 99) * scale, 3),
+        'max': round(max(values, default=0.0) * scale, 3),
+    }
+
+
+class LoopLagMonitor:
+    """Измеряет задержку event loop: насколько позже срабатывает sleep(interval)"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,168 @@
+"""Локальный сервер, отвечающий как Sheets API v4 и Drive API v3.
+
+Поддерживает ровно те запросы, которые делает GoogleSheetsManager через
+gspread: метаданные таблицы, чтение листа, batchUpdate, append и
+modifiedTime файла. Каждый ответ учитывается в счетчиках запросов и
+байтов, поэтому по ним видно, сколько бот скачивает из Google.
+
+gspread ходит на https://sheets.googleapis.com и https://www.googleapis.com,
+сессия из FakeSheetsServer.session() перенаправляет эти запросы сюда.
+"""
+import asyncio
+import re
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+import gspread
+import requests
+from aiohttp import web
+
+from data.local_store import LocalStore, normalize_row
+from services.google_sheets import GoogleSheetsManager
+
+SPREADSHEET_ID = 'bench-spreadsheet'
+SHEET_URL = f'https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/edit'
+GOOGLE_HOSTS = ('https://sheets.googleapis.com', 'https://www.googleapis.com')
+
+# 'Ученики'!A12 или 'Ученики'!A12:J14
+RANGE_ROW = re.compile(r"^'?(.*?)'?(?:!([A-Z]+)(\d+))?(?::[A-Z]+\d+)?$")
+
+
+class _LocalAdapter(requests.adapters.HTTPAdapter):
+    """Отправляет запросы к Google на локальный сервер"""
+
+    def __init__(self, base_url: str):
+        super().__init__()
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.url = self.base_url + parts.path + (f'?{parts.query}' if parts.query else '')
+        return super().send(request, **kwargs)
+
+
+class FakeSheetsServer:
+    def __init__(self, worksheets: Dict[str, List[list]], host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0):
+        self.worksheets = {title: [normalize_row(row) for row in rows] for title, rows in worksheets.items()}
+        self.host = host
+        self.port = port
+        # Задержка каждого ответа - сетевой путь до Google
+        self.latency = latency
+        self.requests = Counter()
+        self.bytes_sent = Counter()
+        self._modified = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self._runner = None
+
+    @property
+    def modified_time(self) -> str:
+        return self._modified.isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+    def touch(self):
+        """Таблица изменилась - как после правки в интерфейсе или через API"""
+        self._modified += timedelta(seconds=1)
+
+    def edit_cell(self, title: str, row_number: int, column: int, value: str):
+        """Правка администратора в интерфейсе таблицы"""
+        row = self.worksheets[title][row_number - 1]
+        row.extend([''] * (column + 1 - len(row)))
+        row[column] = value
+        self.worksheets[title][row_number - 1] = normalize_row(row)
+        self.touch()
+
+    def reset_counters(self):
+        self.requests.clear()
+        self.bytes_sent.clear()
+
+    def session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = _LocalAdapter(f'http://{self.host}:{self.port}')
+        for host in GOOGLE_HOSTS:
+            session.mount(host, adapter)
+        return session
+
+    @web.middleware
+    async def _count(self, request: web.Request, handler):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        response = await handler(request)
+        kind = request.match_info.route.name or 'unknown'
+        self.requests[kind] += 1
+        self.bytes_sent[kind] += len(response.body or b'')
+        return response
+
+    def _parse_range(self, value: str):
+        title, _, row = RANGE_ROW.match(value).groups()
+        return title, int(row) if row else None
+
+    async def _metadata(self, request: web.Request) -> web.Response:
+        sheets = [{'properties': {'sheetId': i, 'title': title, 'index': i, 'sheetType': 'GRID',
+                                  'gridProperties': {'rowCount': max(1000, len(rows)), 'columnCount': 26}}}
+                  for i, (title, rows) in enumerate(self.worksheets.items())]
+        return web.json_response({'spreadsheetId': SPREADSHEET_ID, 'properties': {'title': 'Bench'}, 'sheets': sheets})
+
+    async def _values(self, request: web.Request) -> web.Response:
+        value_range = request.match_info['range']
+        if request.method == 'POST':
+            if not value_range.endswith(':append'):
+                raise web.HTTPNotFound()
+            title, _ = self._parse_range(value_range[:-len(':append')])
+            rows = (await request.json())['values']
+            sheet = self.worksheets[title]
+            first = len(sheet) + 1
+            sheet.extend(normalize_row(row) for row in rows)
+            self.touch()
+            return web.json_response({'spreadsheetId': SPREADSHEET_ID, 'updates': {
+                'updatedRange': f"'{title}'!A{first}:Z{len(sheet)}", 'updatedRows': len(rows)}})
+
+        title, _ = self._parse_range(value_range)
+        rows = self.worksheets[title]
+        return web.json_response({'range': f"'{title}'!A1:Z{max(1, len(rows))}", 'majorDimension': 'ROWS',
+                                  'values': rows})
+
+    async def _batch_update(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        for item in body['data']:
+            title, row_number = self._parse_range(item['range'])
+            sheet = self.worksheets[title]
+            for offset, row in enumerate(item['values']):
+                index = row_number - 1 + offset
+                sheet.extend([] for _ in range(index + 1 - len(sheet)))
+                sheet[index] = normalize_row(row)
+        self.touch()
+        return web.json_response({'spreadsheetId': SPREADSHEET_ID, 'totalUpdatedRows': len(body['data'])})
+
+    async def _drive_file(self, request: web.Request) -> web.Response:
+        return web.json_response({'id': SPREADSHEET_ID, 'name': 'Bench', 'createdTime': '2024-01-01T00:00:00.000Z',
+                                  'modifiedTime': self.modified_time})
+
+    async def start(self):
+        app = web.Application(middlewares=[self._count])
+        app.router.add_get('/v4/spreadsheets/{id}', self._metadata, name='metadata')
+        app.router.add_post('/v4/spreadsheets/{id}/values:batchUpdate', self._batch_update, name='batch_update')
+        app.router.add_route('*', '/v4/spreadsheets/{id}/values/{range}', self._values, name='values')
+        app.router.add_get('/drive/v3/files/{id}', self._drive_file, name='drive_metadata')
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        # port=0 - свободный порт, который выбрала система
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+class LocalSheetsManager(GoogleSheetsManager):
+    """GoogleSheetsManager, который вместо Google ходит на FakeSheetsServer"""
+
+    def __init__(self, server: FakeSheetsServer, store: LocalStore, **kwargs):
+        super().__init__('{}', SHEET_URL, store=store, **kwargs)
+        self.server = server
+
+    def _authorize(self):
+        self.client = gspread.Client(None, session=self.server.session())
+        self._sheet = self.client.open_by_url(self.sheet_url)
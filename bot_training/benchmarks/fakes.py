@@ -0,0 +1,173 @@
+"""Локальные подмены Telegram Bot API и Google Sheets для бенчмарков"""
+import asyncio
+import itertools
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import CreateChatInviteLink
+from aiogram.methods.base import TelegramMethod
+from aiogram.types import CallbackQuery, Chat, ChatInviteLink, Message, PhotoSize, Update, User
+
+from services.schedule_index import ScheduleIndex
+
+BOT_TOKEN = '123456:FAKE-TOKEN-FOR-BENCHMARKS'
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+
+class FakeSession(BaseSession):
+    """Сессия бота без сети: отвечает на любой метод с заданной задержкой"""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls = Counter()
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None):
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if isinstance(method, CreateChatInviteLink):
+            return ChatInviteLink(
+                invite_link=f'https://t.me/+fake{next(_message_ids)}', creator=_user(bot.id), creates_join_request=False,
+                is_primary=False, is_revoked=False, name=method.name, expire_date=method.expire_date,
+            )
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            return True
+        return Message(
+            message_id=getattr(method, 'message_id', None) or next(_message_ids),
+            date=datetime.now(),
+            chat=Chat(id=chat_id, type='private'),
+            text=getattr(method, 'text', None),
+            caption=getattr(method, 'caption', None),
+        )
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b''
+
+    async def close(self):
+        pass
+
+
+def make_bot(latency: float = 0.0) -> Bot:
+    return Bot(token=BOT_TOKEN, session=FakeSession(latency))
+
+
+def _user(user_id: int) -> User:
+    return User(id=user_id, is_bot=False, first_name=f'User{user_id}', username=f'user{user_id}')
+
+
+def message_update(user_id: int, text: str = None, photo: bool = False) -> Update:
+    message = Message(
+        message_id=next(_message_ids),
+        date=datetime.now(),
+        chat=Chat(id=user_id, type='private'),
+        from_user=_user(user_id),
+        text=text,
+        photo=[PhotoSize(file_id=f'photo{user_id}', file_unique_id=f'u{user_id}', width=10, height=10)] if photo else None,
+    )
+    return Update(update_id=next(_update_ids), message=message)
+
+
+def callback_update(user_id: int, data: str, chat_id: int = None) -> Update:
+    chat_id = chat_id or user_id
+    message = Message(
+        message_id=next(_message_ids),
+        date=datetime.now(),
+        chat=Chat(id=chat_id, type='private'),
+        text='...',
+    )
+    callback = CallbackQuery(
+        id=str(next(_update_ids)),
+        from_user=_user(user_id),
+        chat_instance=str(chat_id),
+        data=data,
+        message=message,
+    )
+    return Update(update_id=next(_update_ids), callback_query=callback)
+
+
+def schedule_rows(levels: List[str], dates: List[str], link: bool = True) -> list:
+    rows = [['Уровень', 'Дата', 'Актуальная', 'Ссылка']]
+    for level in levels:
+        for date in dates:
+            rows.append([level, date, 'да', f'https://t.me/+{level}{date}' if link else ''])
+    return rows
+
+
+class FakeSheetsManager:
+    """Подмена AsyncSheetsManager: листы в памяти, задержка на каждый вызов"""
+
+    def __init__(self, rows: list, latency: float = 0.0):
+        self.index = ScheduleIndex(rows)
+        self.version = 1
+        self.latency = latency
+        self.worksheets = {'Даты': [list(row) for row in rows], 'Ученики': []}
+        self.saved_rows = self.worksheets['Ученики']
+        self.calls = Counter()
+        self.guard = None
+        # Счетчик записей вместо modifiedTime из Drive
+        self.revision = 0
+
+    async def _delay(self, method: str):
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get_dates_for_level(self, level: str) -> list:
+        await self._delay('get_dates_for_level')
+        return self.index.dates_for_level(level)
+
+    async def get_dates_with_version(self, level: str) -> tuple:
+        await self._delay('get_dates_with_version')
+        return self.index.dates_for_level(level), self.version
+
+    async def get_group_info_for_date(self, level: str, date: str) -> dict:
+        await self._delay('get_group_info_for_date')
+        return self.index.group_info(level, date)
+
+    async def get_group_infos(self, pairs: list) -> dict:
+        await self._delay('get_group_infos')
+        return {pair: self.index.group_info(*pair) for pair in pairs}
+
+    async def save_user_data(self, user_data: dict) -> bool:
+        await self._delay('save_user_data')
+        self.saved_rows.append(user_data)
+        return True
+
+    async def append_student_rows(self, rows: list):
+        await self._delay('append_student_rows')
+        self.saved_rows.extend(rows)
+
+    async def get_values(self, title: str) -> list:
+        await self._delay('get_values')
+        return [[str(cell) for cell in row] for row in self.worksheets[title]]
+
+    async def get_modified_time(self) -> str:
+        await self._delay('get_modified_time')
+        return str(self.revision)
+
+    async def update_rows(self, title: str, updates: list):
+        await self._delay('update_rows')
+        self.revision += 1
+        for row_number, row in updates:
+            self.worksheets[title][row_number - 1] = list(row)
+
+    async def append_rows(self, title: str, rows: list) -> int:
+        await self._delay('append_rows')
+        self.revision += 1
+        self.worksheets[title].extend(list(row) for row in rows)
+        return len(self.worksheets[title]) - len(rows) + 1
+
+    async def refresh_schedule(self):
+        await self._delay('refresh_schedule')
+
+    def close(self):
+        pass
+
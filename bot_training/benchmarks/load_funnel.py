@@ -0,0 +1,149 @@
+"""Нагрузочный тест всей воронки записи.
+
+N пользователей одновременно проходят /start, ввод ФИО и города, выбор
+уровня и даты, переход к оплате и отправку чека, затем администратор
+подтверждает все чеки. Telegram Bot API и Google Sheets заменены
+локальными подделками с настраиваемой задержкой, роутеры подключаются
+так же, как в main.py. Отчет - JSON: пропускная способность, задержки
+каждого обработчика (p50/p95/p99, мс) и задержка event loop.
+Запуск из каталога bot_training:
+    python -m benchmarks.load_funnel [--users 200] [--api-latency 0.05] [--sheets-latency 0.2]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from aiogram import Dispatcher
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from benchmarks.common import LoopLagMonitor, summarize
+from benchmarks.fakes import FakeSheetsManager, callback_update, make_bot, message_update, schedule_rows
+from config import ADMIN_IDS, LEVELS
+from data.backends import MemoryBackend
+from data.local_store import LocalStore
+from data.temporary_storage import TemporaryStorage
+from keyboards.callbacks import CONFIRM_RECEIPT, START_PAYMENT, date_callback, encode, level_callback
+from main import include_routers
+from services import fanout
+from services.group_manager import GroupManager
+from services.rate_limiter import TelegramRateLimiter
+from services.sheets_mirror import SCHEDULE_MIRROR, STUDENTS_MIRROR, SheetsMirror
+from services.write_behind import StudentWriteQueue
+
+FIRST_USER_ID = 100000
+LEVEL_KEY = 'basic'
+DATES = ['01.01.2030', '15.01.2030', '01.02.2030']
+
+
+class Funnel:
+    """Прогоняет пользователей через бота и собирает задержки по обработчикам"""
+
+    def __init__(self, dp: Dispatcher, bot):
+        self.dp = dp
+        self.bot = bot
+        self.latencies = defaultdict(list)
+        self.receipts = {}  # user_id -> message_id чека
+        self.errors = 0
+
+    async def step(self, handler: str, update):
+        started = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception:
+            self.errors += 1
+        self.latencies[handler].append(time.perf_counter() - started)
+
+    async def register_user(self, user_id: int, date: str):
+        await self.step('cmd_start', message_update(user_id, '/start'))
+        await self.step('process_user_info', message_update(user_id, f'User {user_id}, Moscow'))
+        await self.step('process_level_selection', callback_update(user_id, level_callback(LEVEL_KEY)))
+        await self.step('process_date_selection', callback_update(user_id, date_callback(date)))
+        await self.step('start_payment_process', callback_update(user_id, encode(START_PAYMENT)))
+        receipt = message_update(user_id, photo=True)
+        self.receipts[user_id] = receipt.message.message_id
+        await self.step('handle_receipt', receipt)
+
+    async def confirm(self, admin_id: int, user_id: int):
+        data = encode(CONFIRM_RECEIPT, user_id, self.receipts[user_id])
+        await self.step('confirm_payment', callback_update(admin_id, data))
+
+
+async def run(users: int, api_latency: float, sheets_latency: float, rate_limit: bool) -> dict:
+    bot = make_bot(api_latency)
+    if rate_limit:
+        bot.session.middleware(TelegramRateLimiter(ADMIN_IDS))
+    sheets = FakeSheetsManager(schedule_rows([LEVELS[LEVEL_KEY]], DATES), latency=sheets_latency)
+    TemporaryStorage.configure(MemoryBackend())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LocalStore(os.path.join(tmp, 'local.sqlite3'))
+        mirror = SheetsMirror(sheets, store, [SCHEDULE_MIRROR, STUDENTS_MIRROR])
+        queue = StudentWriteQueue(store, mirror)
+        dp = Dispatcher(storage=MemoryStorage(), sheets_manager=sheets, sheets_mirror=mirror, student_queue=queue,
+                        group_manager=GroupManager(bot, ADMIN_IDS))
+        include_routers(dp)
+        funnel = Funnel(dp, bot)
+        user_ids = range(FIRST_USER_ID, FIRST_USER_ID + users)
+
+        await mirror.start()
+        monitor = LoopLagMonitor()
+        monitor.start()
+        started = time.perf_counter()
+
+        await asyncio.gather(*(funnel.register_user(user_id, DATES[user_id % len(DATES)]) for user_id in user_ids))
+        registered = time.perf_counter()
+        await asyncio.gather(*(funnel.confirm(ADMIN_IDS[0], user_id) for user_id in user_ids))
+        confirmed = time.perf_counter()
+
+        # Дожидаемся рассылки чеков администраторам и записи в таблицу
+        await asyncio.gather(*list(fanout._background_tasks))
+        await mirror.stop()
+        store.close()
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0.05)  # даем монитору зафиксировать последний замер
+        await monitor.stop()
+
+    updates = sum(len(values) for values in funnel.latencies.values())
+    return {
+        'users': users,
+        'api_latency_s': api_latency,
+        'sheets_latency_s': sheets_latency,
+        'rate_limit': rate_limit,
+        'elapsed_s': round(elapsed, 3),
+        'registration_s': round(registered - started, 3),
+        'confirmation_s': round(confirmed - registered, 3),
+        'throughput': {
+            'funnels_per_s': round(users / elapsed, 1),
+            'updates_per_s': round(updates / (confirmed - started), 1),
+        },
+        'handlers_ms': {name: summarize(values) for name, values in funnel.latencies.items()},
+        'loop_lag_ms': summarize(monitor.samples),
+        'errors': funnel.errors,
+        'rows_written': len(sheets.saved_rows),
+        'pending_receipts_left': len(TemporaryStorage.get_all_pending_receipts()),
+        'bot_api_calls': dict(bot.session.calls),
+        'sheets_calls': dict(sheets.calls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--api-latency', type=float, default=0.05, help='задержка каждого вызова Bot API, с')
+    parser.add_argument('--sheets-latency', type=float, default=0.2, help='задержка каждого вызова Sheets, с')
+    parser.add_argument('--rate-limit', action='store_true', help='включить лимиты Telegram на отправку')
+    args = parser.parse_args()
+    # Хендлер регистрации печатает отладку в stdout, отчет должен остаться чистым JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        result = asyncio.run(run(args.users, args.api_latency, args.sheets_latency, args.rate_limit))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Нагрузочный тест: задержка event loop при медленных вызовах Google Sheets.
+
+Сравнивает прямой синхронный вызов менеджера из обработчика с вызовом
+через AsyncSheetsManager. Запуск из каталога bot_training:
+    python -m benchmarks.load_sheets_event_loop [--calls 40] [--latency 0.2]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import LoopLagMonitor, summarize
+from services.async_sheets import AsyncSheetsManager
+
+
+class SlowSheetsManager:
+    """Подмена GoogleSheetsManager с заданной задержкой каждого вызова"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def get_dates_for_level(self, level: str) -> list:
+        time.sleep(self.latency)
+        return ['01.01.2030']
+
+    def save_user_data(self, user_data: dict) -> bool:
+        time.sleep(self.latency)
+        return True
+
+
+async def run(mode: str, calls: int, latency: float) -> dict:
+    manager = SlowSheetsManager(latency)
+    facade = AsyncSheetsManager(manager, max_workers=4, timeout=60, max_concurrency=8)
+
+    async def handler(i: int):
+        if mode == 'sync':
+            manager.save_user_data({'n': i})
+        else:
+            await facade.save_user_data({'n': i})
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    await asyncio.sleep(0.05)  # базовая линия без нагрузки
+    started = time.perf_counter()
+    await asyncio.gather(*(handler(i) for i in range(calls)))
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.05)  # даем монитору зафиксировать последний замер
+    await monitor.stop()
+    facade.close()
+
+    return {'mode': mode, 'calls': calls, 'latency_s': latency,
+            'elapsed_s': round(elapsed, 3), 'loop_lag_ms': summarize(monitor.samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = [asyncio.run(run(mode, args.calls, args.latency)) for mode in ('sync', 'executor')]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
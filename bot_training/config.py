@@ -8,6 +8,69 @@ ADMIN_IDS = list(map(int, os.getenv('ADMIN_IDS', '').split(',')))
 GOOGLE_SHEETS_CREDENTIALS = os.getenv('GOOGLE_SHEETS_CREDENTIALS')
 SHEET_URL = os.getenv('SHEET_URL')
 
+# Время жизни снимка листа 'Даты' в секундах
+SCHEDULE_CACHE_TTL = float(os.getenv('SCHEDULE_CACHE_TTL', '60'))
+
+# Пул потоков для синхронных вызовов gspread
+SHEETS_MAX_WORKERS = int(os.getenv('SHEETS_MAX_WORKERS', '4'))
+SHEETS_MAX_CONCURRENCY = int(os.getenv('SHEETS_MAX_CONCURRENCY', '8'))
+SHEETS_CALL_TIMEOUT = float(os.getenv('SHEETS_CALL_TIMEOUT', '10'))
+# Бюджет запросов к Sheets API в минуту (квота Google - 60 чтений и 60 записей)
+SHEETS_READ_QUOTA = int(os.getenv('SHEETS_READ_QUOTA', '50'))
+SHEETS_WRITE_QUOTA = int(os.getenv('SHEETS_WRITE_QUOTA', '50'))
+# Предохранитель: после N ошибок подряд запросы не отправляются M секунд
+SHEETS_BREAKER_THRESHOLD = int(os.getenv('SHEETS_BREAKER_THRESHOLD', '5'))
+SHEETS_BREAKER_RESET = float(os.getenv('SHEETS_BREAKER_RESET', '30'))
+# Пауза после 429 удваивается с каждым отказом подряд, в секундах
+SHEETS_BACKOFF_BASE = float(os.getenv('SHEETS_BACKOFF_BASE', '2'))
+SHEETS_BACKOFF_MAX = float(os.getenv('SHEETS_BACKOFF_MAX', '120'))
+
+# Локальная база - основная копия учеников и расписания, Google Sheets - ее зеркало
+LOCAL_DB_PATH = os.getenv('LOCAL_DB_PATH', 'data/local.sqlite3')
+# Как часто забирать изменения из таблицы, в секундах
+MIRROR_PULL_INTERVAL = float(os.getenv('MIRROR_PULL_INTERVAL', '60'))
+
+# Отправка изменений в таблицу: пачка уходит раз в N мс или при M строках
+WRITE_BEHIND_INTERVAL_MS = int(os.getenv('WRITE_BEHIND_INTERVAL_MS', '500'))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv('WRITE_BEHIND_MAX_BATCH', '50'))
+
+# Хранилище сессий, чеков, реестра групп и состояний FSM: 'memory', 'sqlite' или 'redis'.
+# 'redis' нужен, чтобы несколько экземпляров бота работали с общими данными
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'memory')
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'data/bot.sqlite3')
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
+# Брошенные сессии регистрации: время простоя в секундах и максимум записей
+SESSION_IDLE_TTL = float(os.getenv('SESSION_IDLE_TTL', '86400'))
+SESSION_MAX_ENTRIES = int(os.getenv('SESSION_MAX_ENTRIES', '10000'))
+
+# Сколько администраторов получают рассылку одновременно
+ADMIN_FANOUT_CONCURRENCY = int(os.getenv('ADMIN_FANOUT_CONCURRENCY', '8'))
+
+# Лимиты Telegram на отправку: сообщений в секунду всего и в один чат
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+TELEGRAM_CHAT_BURST = float(os.getenv('TELEGRAM_CHAT_BURST', '1'))
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '3'))
+
+# Способ получения апдейтов: 'polling' или 'webhook'
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBAPP_HOST = os.getenv('WEBAPP_HOST', '0.0.0.0')
+WEBAPP_PORT = int(os.getenv('WEBAPP_PORT', '8080'))
+
+# Метрики Prometheus: GET /metrics на локальном адресе, порт 0 отключает сервер
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9090'))
+
+# Через сколько минут ожидания проверки чека администраторам приходит предупреждение; 0 - не предупреждать
+RECEIPT_SLA_MINUTES = float(os.getenv('RECEIPT_SLA_MINUTES', '30'))
+
+# Срок действия пригласительных ссылок в учебные группы, секунды
+GROUP_INVITE_LINK_TTL = float(os.getenv('GROUP_INVITE_LINK_TTL', '604800'))
+
 # Уровни обучения
 LEVELS = {
     'basic': 'Basic',
@@ -0,0 +1,724 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from data.receipt_index import PendingReceiptIndex, receipt_facets
+from services.metrics import metrics
+
+
+class StorageBackend:
+    """Интерфейс хранилища сессий регистрации и ожидающих чеков"""
+
+    def save_user_data(self, user_id: int, data: Dict[str, Any]):
+        raise NotImplementedError
+
+    def get_user_data(self, user_id: int) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def delete_user_data(self, user_id: int):
+        raise NotImplementedError
+
+    def add_pending_receipt(self, user_id: int, receipt_data: Dict[str, Any]):
+        raise NotImplementedError
+
+    def get_pending_receipt(self, user_id: int) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def remove_pending_receipt(self, user_id: int):
+        raise NotImplementedError
+
+    def pop_pending_receipt(self, user_id: int) -> Dict[str, Any]:
+        """Атомарно забирает чек: из нескольких одновременных вызовов данные получит только один"""
+        raise NotImplementedError
+
+    def get_all_pending_receipts(self) -> Dict[int, Dict[str, Any]]:
+        raise NotImplementedError
+
+    def list_pending_receipts(self, offset: int, limit: int, level: Optional[str] = None,
+                              date: Optional[str] = None) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+        """Страница ожидающих чеков, старые первыми, и общее число чеков под фильтром"""
+        raise NotImplementedError
+
+    def pending_receipt_facets(self) -> Dict[str, Dict[str, int]]:
+        """Число ожидающих чеков по уровням и по датам: {'level': {...}, 'date': {...}}"""
+        raise NotImplementedError
+
+    def oldest_pending_receipt(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Чек, который ждет проверки дольше всех"""
+        raise NotImplementedError
+
+    def next_unalerted_receipt_time(self) -> Optional[datetime]:
+        """Время отправки самого старого чека, о просрочке которого еще не предупреждали"""
+        raise NotImplementedError
+
+    def pop_overdue_receipts(self, cutoff: datetime, limit: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """Чеки, отправленные до cutoff, о которых еще не предупреждали.
+
+        Каждый чек возвращается один раз, пока его не отправят заново.
+        """
+        raise NotImplementedError
+
+    def get_receipt_decision(self, user_id: int, receipt_id: int) -> Dict[str, Any]:
+        """Решение администратора по чеку, если оно уже принято"""
+        raise NotImplementedError
+
+    def claim_receipt_decision(self, user_id: int, receipt_id: int, decision: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Атомарно записывает решение по чеку.
+
+        Возвращает None, если решение записано этим вызовом, иначе -
+        решение, принятое раньше.
+        """
+        raise NotImplementedError
+
+    def add_receipt_card(self, user_id: int, receipt_id: int, admin_id: int, message_id: int):
+        """Запоминает карточку чека, отправленную администратору"""
+        raise NotImplementedError
+
+    def get_receipt_cards(self, user_id: int, receipt_id: int) -> List[Tuple[int, int]]:
+        """Карточки чека: (admin_id, message_id) в порядке отправки"""
+        raise NotImplementedError
+
+    def get_group(self, level: str, date: str) -> Dict[str, Any]:
+        """Группа из реестра: {'chat_id', 'invite_link', 'invite_expires_at'}; {} - группы нет"""
+        raise NotImplementedError
+
+    def set_group(self, level: str, date: str, group: Dict[str, Any]):
+        raise NotImplementedError
+
+    def session_stats(self) -> Dict[str, int]:
+        """Размер хранилища сессий и число вытесненных записей"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+# Сколько хранить решения по чекам для ответа на повторные нажатия
+DECISION_TTL = 7 * 24 * 3600
+DECISIONS_LIMIT = 10000
+
+
+def _record_eviction(stats: Dict[str, int], reason: str, count: int):
+    if count:
+        stats[f'evicted_{reason}'] += count
+        metrics.inc('session_evictions_total', count, reason=reason)
+
+
+def _receipt_time(timestamp: Optional[str]) -> Optional[datetime]:
+    if timestamp is None:
+        return None
+    try:
+        return datetime.fromisoformat(timestamp)
+    except ValueError:
+        # Чек без времени отправки считается самым старым
+        return datetime.min
+
+
+class MemoryBackend(StorageBackend):
+    """Хранение в словарях процесса (данные теряются при перезапуске).
+
+    Сессии лежат в OrderedDict в порядке последнего обращения, поэтому
+    самые старые всегда в начале: вытеснение по TTL и по лимиту снимает
+    записи с головы и стоит амортизированно O(1) на операцию.
+    """
+
+    def __init__(self, idle_ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        # user_id -> (время последнего обращения, данные)
+        self.user_data: OrderedDict = OrderedDict()
+        self.pending_receipts = {}
+        self.receipt_index = PendingReceiptIndex()
+        self.groups = {}
+        self.decisions: OrderedDict = OrderedDict()
+        # (user_id, id чека) -> [(admin_id, message_id)]
+        self.receipt_cards: OrderedDict = OrderedDict()
+        self.stats = {'evicted_ttl': 0, 'evicted_capacity': 0}
+
+    def _touch(self, user_id: int, data: Dict[str, Any]):
+        self.user_data[user_id] = (time.monotonic(), data)
+        self.user_data.move_to_end(user_id)
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = 0
+        if self.idle_ttl is not None:
+            while self.user_data:
+                touched_at, _ = next(iter(self.user_data.values()))
+                if now - touched_at <= self.idle_ttl:
+                    break
+                self.user_data.popitem(last=False)
+                expired += 1
+        _record_eviction(self.stats, 'ttl', expired)
+
+        overflow = 0
+        if self.max_entries is not None:
+            while len(self.user_data) > self.max_entries:
+                self.user_data.popitem(last=False)
+                overflow += 1
+        _record_eviction(self.stats, 'capacity', overflow)
+        metrics.set('session_entries', len(self.user_data))
+
+    def save_user_data(self, user_id: int, data: Dict[str, Any]):
+        self._touch(user_id, data)
+        self._evict()
+
+    def get_user_data(self, user_id: int) -> Dict[str, Any]:
+        self._evict()
+        entry = self.user_data.get(user_id)
+        if entry is None:
+            return {}
+        self._touch(user_id, entry[1])
+        return entry[1]
+
+    def delete_user_data(self, user_id: int):
+        self.user_data.pop(user_id, None)
+
+    def add_pending_receipt(self, user_id: int, receipt_data: Dict[str, Any]):
+        self.pending_receipts[user_id] = receipt_data
+        self.receipt_index.add(user_id, receipt_data)
+
+    def get_pending_receipt(self, user_id: int) -> Dict[str, Any]:
+        return self.pending_receipts.get(user_id, {})
+
+    def remove_pending_receipt(self, user_id: int):
+        self.pending_receipts.pop(user_id, None)
+        self.receipt_index.remove(user_id)
+
+    def pop_pending_receipt(self, user_id: int) -> Dict[str, Any]:
+        self.receipt_index.remove(user_id)
+        return self.pending_receipts.pop(user_id, {})
+
+    def get_all_pending_receipts(self) -> Dict[int, Dict[str, Any]]:
+        return self.pending_receipts.copy()
+
+    def list_pending_receipts(self, offset: int, limit: int, level: Optional[str] = None,
+                              date: Optional[str] = None) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+        user_ids, total = self.receipt_index.page(offset, limit, level, date)
+        return [(user_id, self.pending_receipts[user_id]) for user_id in user_ids], total
+
+    def pending_receipt_facets(self) -> Dict[str, Dict[str, int]]:
+        return self.receipt_index.facets()
+
+    def oldest_pending_receipt(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+        user_id = self.receipt_index.oldest()
+        return (user_id, self.pending_receipts[user_id]) if user_id is not None else None
+
+    def next_unalerted_receipt_time(self) -> Optional[datetime]:
+        return _receipt_time(self.receipt_index.next_unalerted())
+
+    def pop_overdue_receipts(self, cutoff: datetime, limit: int) -> List[Tuple[int, Dict[str, Any]]]:
+        return [(user_id, self.pending_receipts[user_id])
+                for user_id in self.receipt_index.pop_overdue(cutoff.isoformat(), limit)]
+
+    def get_receipt_decision(self, user_id: int, receipt_id: int) -> Dict[str, Any]:
+        return self.decisions.get((user_id, receipt_id), {})
+
+    def claim_receipt_decision(self, user_id: int, receipt_id: int, decision: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        existing = self.decisions.get((user_id, receipt_id))
+        if existing is not None:
+            return existing
+        self.decisions[(user_id, receipt_id)] = decision
+        while len(self.decisions) > DECISIONS_LIMIT:
+            self.decisions.popitem(last=False)
+        return None
+
+    def add_receipt_card(self, user_id: int, receipt_id: int, admin_id: int, message_id: int):
+        self.receipt_cards.setdefault((user_id, receipt_id), []).append((admin_id, message_id))
+        while len(self.receipt_cards) > DECISIONS_LIMIT:
+            self.receipt_cards.popitem(last=False)
+
+    def get_receipt_cards(self, user_id: int, receipt_id: int) -> List[Tuple[int, int]]:
+        return list(self.receipt_cards.get((user_id, receipt_id), []))
+
+    def get_group(self, level: str, date: str) -> Dict[str, Any]:
+        return dict(self.groups.get((level, date), {}))
+
+    def set_group(self, level: str, date: str, group: Dict[str, Any]):
+        self.groups[(level, date)] = dict(group)
+
+    def session_stats(self) -> Dict[str, int]:
+        self._evict()
+        return {'size': len(self.user_data), **self.stats}
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """Соединение SQLite в режиме WAL с кэшем подготовленных запросов"""
+    connection = sqlite3.connect(path, check_same_thread=False, cached_statements=256, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+class SQLiteBackend(StorageBackend):
+    """Хранение в локальной базе SQLite, переживает перезапуск бота.
+
+    Все запросы - постоянные строки с параметрами, поэтому sqlite3
+    подготавливает каждый из них один раз и дальше берет из кэша.
+    Лимит сессий соблюдается при каждой записи нового пользователя:
+    лишние самые старые строки удаляются в той же транзакции по индексу
+    touched_at, а число строк хранится в памяти, как и индекс чеков.
+    Вытеснение по TTL выполняется пачкой раз в EVICT_EVERY записей -
+    чтение и так не отдает просроченные сессии.
+    """
+
+    EVICT_EVERY = 64
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS user_data ('
+        'user_id INTEGER PRIMARY KEY, data TEXT NOT NULL, touched_at REAL NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS pending_receipts (user_id INTEGER PRIMARY KEY, data TEXT NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS groups ('
+        'level TEXT NOT NULL, date TEXT NOT NULL, chat_id INTEGER NOT NULL, '
+        'invite_link TEXT, invite_expires_at REAL, PRIMARY KEY (level, date))',
+        'CREATE TABLE IF NOT EXISTS receipt_decisions ('
+        'user_id INTEGER NOT NULL, receipt_id INTEGER NOT NULL, data TEXT NOT NULL, created_at REAL NOT NULL, '
+        'PRIMARY KEY (user_id, receipt_id))',
+        'CREATE TABLE IF NOT EXISTS receipt_cards ('
+        'user_id INTEGER NOT NULL, receipt_id INTEGER NOT NULL, admin_id INTEGER NOT NULL, '
+        'message_id INTEGER NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (user_id, receipt_id, admin_id, message_id))',
+    )
+    INDEXES = (
+        'CREATE INDEX IF NOT EXISTS user_data_touched_at ON user_data (touched_at)',
+        'CREATE INDEX IF NOT EXISTS receipt_decisions_created_at ON receipt_decisions (created_at)',
+        'CREATE INDEX IF NOT EXISTS receipt_cards_created_at ON receipt_cards (created_at)',
+    )
+
+    UPDATE_USER = 'UPDATE user_data SET data = ?, touched_at = ? WHERE user_id = ?'
+    INSERT_USER = 'INSERT INTO user_data (user_id, data, touched_at) VALUES (?, ?, ?)'
+    GET_USER = 'UPDATE user_data SET touched_at = ? WHERE user_id = ? AND touched_at >= ? RETURNING data'
+    DELETE_USER = 'DELETE FROM user_data WHERE user_id = ?'
+    EVICT_EXPIRED = 'DELETE FROM user_data WHERE touched_at < ?'
+    EVICT_OLDEST = 'DELETE FROM user_data WHERE user_id IN (SELECT user_id FROM user_data ORDER BY touched_at LIMIT ?)'
+    COUNT_USERS = 'SELECT COUNT(*) FROM user_data'
+    SAVE_RECEIPT = 'INSERT OR REPLACE INTO pending_receipts (user_id, data) VALUES (?, ?)'
+    GET_RECEIPT = 'SELECT data FROM pending_receipts WHERE user_id = ?'
+    GET_RECEIPTS = 'SELECT user_id, data FROM pending_receipts WHERE user_id IN ({})'
+    DELETE_RECEIPT = 'DELETE FROM pending_receipts WHERE user_id = ?'
+    POP_RECEIPT = 'DELETE FROM pending_receipts WHERE user_id = ? RETURNING data'
+    ALL_RECEIPTS = 'SELECT user_id, data FROM pending_receipts'
+    GET_DECISION = 'SELECT data FROM receipt_decisions WHERE user_id = ? AND receipt_id = ?'
+    CLAIM_DECISION = 'INSERT OR IGNORE INTO receipt_decisions (user_id, receipt_id, data, created_at) VALUES (?, ?, ?, ?)'
+    EXPIRE_DECISIONS = 'DELETE FROM receipt_decisions WHERE created_at < ?'
+    ADD_CARD = (
+        'INSERT OR IGNORE INTO receipt_cards (user_id, receipt_id, admin_id, message_id, created_at) '
+        'VALUES (?, ?, ?, ?, ?)'
+    )
+    GET_CARDS = 'SELECT admin_id, message_id FROM receipt_cards WHERE user_id = ? AND receipt_id = ? ORDER BY created_at'
+    EXPIRE_CARDS = 'DELETE FROM receipt_cards WHERE created_at < ?'
+    GET_GROUP = 'SELECT chat_id, invite_link, invite_expires_at FROM groups WHERE level = ? AND date = ?'
+    SET_GROUP = (
+        'INSERT OR REPLACE INTO groups (level, date, chat_id, invite_link, invite_expires_at) '
+        'VALUES (?, ?, ?, ?, ?)'
+    )
+
+    def __init__(self, path: str, idle_ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.connection = connect_sqlite(path)
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self.stats = {'evicted_ttl': 0, 'evicted_capacity': 0}
+        self._writes = 0
+        self._lock = threading.Lock()
+        for statement in self.SCHEMA:
+            self.connection.execute(statement)
+        for statement in self.INDEXES:
+            self.connection.execute(statement)
+        self._size = self._execute(self.COUNT_USERS)[0][0]
+        # База - файл одного процесса, поэтому индекс чеков держится в памяти
+        # и строится один раз при открытии
+        self.receipt_index = PendingReceiptIndex()
+        for user_id, data in self._execute(self.ALL_RECEIPTS):
+            self.receipt_index.add(user_id, json.loads(data))
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def _rowcount(self, sql: str, params: tuple) -> int:
+        with self._lock:
+            return self.connection.execute(sql, params).rowcount
+
+    def _cutoff(self) -> float:
+        return time.time() - self.idle_ttl if self.idle_ttl is not None else 0
+
+    def _evict(self):
+        if self.idle_ttl is not None:
+            expired = self._rowcount(self.EVICT_EXPIRED, (self._cutoff(),))
+            self._size -= expired
+            _record_eviction(self.stats, 'ttl', expired)
+
+    def save_user_data(self, user_id: int, data: Dict[str, Any]):
+        value, now = json.dumps(data, ensure_ascii=False), time.time()
+        overflow = 0
+        with self._lock:
+            self.connection.execute('BEGIN')
+            try:
+                size = self._size
+                if not self.connection.execute(self.UPDATE_USER, (value, now, user_id)).rowcount:
+                    self.connection.execute(self.INSERT_USER, (user_id, value, now))
+                    size += 1
+                    # Новый пользователь - сразу возвращаемся к лимиту
+                    if self.max_entries is not None and size > self.max_entries:
+                        overflow = self.connection.execute(self.EVICT_OLDEST, (size - self.max_entries,)).rowcount
+                        size -= overflow
+                self.connection.execute('COMMIT')
+            except Exception:
+                self.connection.execute('ROLLBACK')
+                raise
+            self._size = size
+        _record_eviction(self.stats, 'capacity', overflow)
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self._evict()
+
+    def get_user_data(self, user_id: int) -> Dict[str, Any]:
+        rows = self._execute(self.GET_USER, (time.time(), user_id, self._cutoff()))
+        return json.loads(rows[0][0]) if rows else {}
+
+    def delete_user_data(self, user_id: int):
+        self._size -= self._rowcount(self.DELETE_USER, (user_id,))
+
+    def add_pending_receipt(self, user_id: int, receipt_data: Dict[str, Any]):
+        self._execute(self.SAVE_RECEIPT, (user_id, json.dumps(receipt_data, ensure_ascii=False)))
+        self.receipt_index.add(user_id, receipt_data)
+
+    def get_pending_receipt(self, user_id: int) -> Dict[str, Any]:
+        rows = self._execute(self.GET_RECEIPT, (user_id,))
+        return json.loads(rows[0][0]) if rows else {}
+
+    def remove_pending_receipt(self, user_id: int):
+        self._execute(self.DELETE_RECEIPT, (user_id,))
+        self.receipt_index.remove(user_id)
+
+    def pop_pending_receipt(self, user_id: int) -> Dict[str, Any]:
+        rows = self._execute(self.POP_RECEIPT, (user_id,))
+        self.receipt_index.remove(user_id)
+        return json.loads(rows[0][0]) if rows else {}
+
+    def get_all_pending_receipts(self) -> Dict[int, Dict[str, Any]]:
+        return {user_id: json.loads(data) for user_id, data in self._execute(self.ALL_RECEIPTS)}
+
+    def list_pending_receipts(self, offset: int, limit: int, level: Optional[str] = None,
+                              date: Optional[str] = None) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+        user_ids, total = self.receipt_index.page(offset, limit, level, date)
+        return self._get_receipts(user_ids), total
+
+    def _get_receipts(self, user_ids: List[int]) -> List[Tuple[int, Dict[str, Any]]]:
+        if not user_ids:
+            return []
+        sql = self.GET_RECEIPTS.format(','.join('?' * len(user_ids)))
+        receipts = {user_id: json.loads(data) for user_id, data in self._execute(sql, tuple(user_ids))}
+        return [(user_id, receipts[user_id]) for user_id in user_ids if user_id in receipts]
+
+    def pending_receipt_facets(self) -> Dict[str, Dict[str, int]]:
+        return self.receipt_index.facets()
+
+    def oldest_pending_receipt(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+        user_id = self.receipt_index.oldest()
+        receipts = self._get_receipts([user_id]) if user_id is not None else []
+        return receipts[0] if receipts else None
+
+    def next_unalerted_receipt_time(self) -> Optional[datetime]:
+        return _receipt_time(self.receipt_index.next_unalerted())
+
+    def pop_overdue_receipts(self, cutoff: datetime, limit: int) -> List[Tuple[int, Dict[str, Any]]]:
+        return self._get_receipts(self.receipt_index.pop_overdue(cutoff.isoformat(), limit))
+
+    def get_receipt_decision(self, user_id: int, receipt_id: int) -> Dict[str, Any]:
+        rows = self._execute(self.GET_DECISION, (user_id, receipt_id))
+        return json.loads(rows[0][0]) if rows else {}
+
+    def claim_receipt_decision(self, user_id: int, receipt_id: int, decision: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        self._rowcount(self.EXPIRE_DECISIONS, (now - DECISION_TTL,))
+        claimed = self._rowcount(self.CLAIM_DECISION, (user_id, receipt_id, json.dumps(decision, ensure_ascii=False), now))
+        if claimed:
+            return None
+        return self.get_receipt_decision(user_id, receipt_id)
+
+    def add_receipt_card(self, user_id: int, receipt_id: int, admin_id: int, message_id: int):
+        now = time.time()
+        self._rowcount(self.EXPIRE_CARDS, (now - DECISION_TTL,))
+        self._rowcount(self.ADD_CARD, (user_id, receipt_id, admin_id, message_id, now))
+
+    def get_receipt_cards(self, user_id: int, receipt_id: int) -> List[Tuple[int, int]]:
+        return [(admin_id, message_id) for admin_id, message_id in self._execute(self.GET_CARDS, (user_id, receipt_id))]
+
+    def get_group(self, level: str, date: str) -> Dict[str, Any]:
+        rows = self._execute(self.GET_GROUP, (level, date))
+        if not rows:
+            return {}
+        chat_id, invite_link, invite_expires_at = rows[0]
+        return {'chat_id': chat_id, 'invite_link': invite_link, 'invite_expires_at': invite_expires_at}
+
+    def set_group(self, level: str, date: str, group: Dict[str, Any]):
+        self._execute(self.SET_GROUP, (level, date, group['chat_id'], group.get('invite_link'),
+                                       group.get('invite_expires_at')))
+
+    def session_stats(self) -> Dict[str, int]:
+        self._evict()
+        self._size = self._execute(self.COUNT_USERS)[0][0]
+        metrics.set('session_entries', self._size)
+        return {'size': self._size, **self.stats}
+
+    def close(self):
+        self.connection.close()
+
+
+class RedisBackend(StorageBackend):
+    """Общее хранилище для нескольких экземпляров бота (Redis или совместимый сервер).
+
+    Принимает готовый синхронный клиент redis.Redis, поэтому работает и с
+    fakeredis. Сессии - строки с EXPIRE по времени простоя плюс ZSET
+    с временем обращения для лимита записей. Лимит обрезается в той же
+    транзакции, что и запись сессии, поэтому его не превышают и несколько
+    реплик сразу; ZSET от истекших сессий чистится раз в EVICT_EVERY
+    записей. Чеки и реестр групп - хэши.
+    Забор чека выполняется одной транзакцией MULTI/EXEC (HGET + HDEL),
+    поэтому подтвердить чек сможет только одна реплика.
+    """
+
+    EVICT_EVERY = 64
+
+    def __init__(self, client, idle_ttl: Optional[float] = None, max_entries: Optional[int] = None,
+                 prefix: str = 'bot_training'):
+        self.redis = client
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self.sessions_key = f'{prefix}:sessions'
+        self.receipts_key = f'{prefix}:receipts'
+        self.groups_key = f'{prefix}:groups'
+        # Индексы чеков: ZSET по времени отправки для всех чеков, уровня, даты,
+        # уровня и даты, плюс множество имен ZSET уровней и дат для фильтров
+        self.receipt_index_key = f'{prefix}:receipts_by_time'
+        self.receipt_facets_key = f'{prefix}:receipt_facets'
+        # Чеки, о просрочке которых еще не предупреждали, по времени отправки
+        self.receipt_alerts_key = f'{prefix}:receipt_alerts'
+        self.stats_key = f'{prefix}:session_stats'
+        self._writes = 0
+
+    def _session_key(self, user_id: int) -> str:
+        return f'{self.prefix}:session:{user_id}'
+
+    def _expire_seconds(self) -> Optional[int]:
+        return max(1, int(self.idle_ttl)) if self.idle_ttl is not None else None
+
+    def _evict(self):
+        pipe = self.redis.pipeline(transaction=True)
+        if self.idle_ttl is not None:
+            # Сами строки уже удалены Redis по EXPIRE, убираем их из ZSET
+            pipe.zremrangebyscore(self.sessions_key, '-inf', time.time() - self.idle_ttl)
+        pipe.zcard(self.sessions_key)
+        results = pipe.execute()
+        expired = results[0] if self.idle_ttl is not None else 0
+        size = results[-1]
+        if expired:
+            self.redis.hincrby(self.stats_key, 'evicted_ttl', expired)
+            metrics.inc('session_evictions_total', expired, reason='ttl')
+        metrics.set('session_entries', size)
+
+    def save_user_data(self, user_id: int, data: Dict[str, Any]):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.set(self._session_key(user_id), json.dumps(data, ensure_ascii=False), ex=self._expire_seconds())
+        pipe.zadd(self.sessions_key, {user_id: time.time()})
+        if self.max_entries is not None:
+            # Все, кроме max_entries последних сессий; пусто, если лимит не превышен
+            pipe.zrange(self.sessions_key, 0, -self.max_entries - 1)
+            pipe.zremrangebyrank(self.sessions_key, 0, -self.max_entries - 1)
+        results = pipe.execute()
+        if self.max_entries is not None and results[2]:
+            overflow = results[2]
+            self.redis.delete(*(self._session_key(int(member)) for member in overflow))
+            self.redis.hincrby(self.stats_key, 'evicted_capacity', len(overflow))
+            metrics.inc('session_evictions_total', len(overflow), reason='capacity')
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self._evict()
+
+    def get_user_data(self, user_id: int) -> Dict[str, Any]:
+        key = self._session_key(user_id)
+        value = self.redis.get(key)
+        if value is None:
+            return {}
+        # Продлеваем сессию при обращении
+        pipe = self.redis.pipeline(transaction=True)
+        if self.idle_ttl is not None:
+            pipe.expire(key, self._expire_seconds())
+        pipe.zadd(self.sessions_key, {user_id: time.time()}, xx=True)
+        pipe.execute()
+        return json.loads(value)
+
+    def delete_user_data(self, user_id: int):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(self._session_key(user_id))
+        pipe.zrem(self.sessions_key, user_id)
+        pipe.execute()
+
+    def session_stats(self) -> Dict[str, int]:
+        self._evict()
+        stats = self.redis.hgetall(self.stats_key)
+        return {
+            'size': self.redis.zcard(self.sessions_key),
+            'evicted_ttl': int(stats.get(b'evicted_ttl', 0)),
+            'evicted_capacity': int(stats.get(b'evicted_capacity', 0)),
+        }
+
+    def _receipt_buckets(self, receipt_data: Dict[str, Any]) -> List[str]:
+        level, date = receipt_facets(receipt_data)
+        return ['all', f'level:{level}', f'date:{date}', f'level_date:{level}|{date}']
+
+    def _bucket_key(self, bucket: str) -> str:
+        return f'{self.receipt_index_key}:{bucket}'
+
+    def _unindex_receipt(self, pipe, user_id: int, receipt_data: Dict[str, Any]):
+        for bucket in self._receipt_buckets(receipt_data):
+            pipe.zrem(self._bucket_key(bucket), user_id)
+        pipe.zrem(self.receipt_alerts_key, user_id)
+
+    def add_pending_receipt(self, user_id: int, receipt_data: Dict[str, Any]):
+        previous = self.get_pending_receipt(user_id)
+        buckets = self._receipt_buckets(receipt_data)
+        try:
+            score = datetime.fromisoformat(receipt_data['timestamp']).timestamp()
+        except (KeyError, ValueError):
+            score = time.time()
+        pipe = self.redis.pipeline(transaction=True)
+        if previous:
+            self._unindex_receipt(pipe, user_id, previous)
+        pipe.hset(self.receipts_key, user_id, json.dumps(receipt_data, ensure_ascii=False))
+        for bucket in buckets:
+            pipe.zadd(self._bucket_key(bucket), {user_id: score})
+        pipe.zadd(self.receipt_alerts_key, {user_id: score})
+        pipe.sadd(self.receipt_facets_key, buckets[1], buckets[2])
+        pipe.execute()
+
+    def get_pending_receipt(self, user_id: int) -> Dict[str, Any]:
+        value = self.redis.hget(self.receipts_key, user_id)
+        return json.loads(value) if value is not None else {}
+
+    def remove_pending_receipt(self, user_id: int):
+        self.pop_pending_receipt(user_id)
+
+    def pop_pending_receipt(self, user_id: int) -> Dict[str, Any]:
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hget(self.receipts_key, user_id)
+        pipe.hdel(self.receipts_key, user_id)
+        value, deleted = pipe.execute()
+        if not deleted or value is None:
+            return {}
+        receipt_data = json.loads(value)
+        pipe = self.redis.pipeline(transaction=True)
+        self._unindex_receipt(pipe, user_id, receipt_data)
+        pipe.execute()
+        return receipt_data
+
+    def get_all_pending_receipts(self) -> Dict[int, Dict[str, Any]]:
+        return {int(user_id): json.loads(data) for user_id, data in self.redis.hgetall(self.receipts_key).items()}
+
+    def list_pending_receipts(self, offset: int, limit: int, level: Optional[str] = None,
+                              date: Optional[str] = None) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+        if level is not None and date is not None:
+            bucket = f'level_date:{level}|{date}'
+        elif level is not None:
+            bucket = f'level:{level}'
+        elif date is not None:
+            bucket = f'date:{date}'
+        else:
+            bucket = 'all'
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zrange(self._bucket_key(bucket), offset, offset + limit - 1)
+        pipe.zcard(self._bucket_key(bucket))
+        members, total = pipe.execute()
+        if not members:
+            return [], total
+        return self._get_receipts([int(member) for member in members]), total
+
+    def pending_receipt_facets(self) -> Dict[str, Dict[str, int]]:
+        buckets = [bucket.decode() for bucket in self.redis.smembers(self.receipt_facets_key)]
+        pipe = self.redis.pipeline(transaction=False)
+        for bucket in buckets:
+            pipe.zcard(self._bucket_key(bucket))
+        facets = {'level': {}, 'date': {}}
+        empty = []
+        for bucket, count in zip(buckets, pipe.execute()):
+            if not count:
+                empty.append(bucket)
+                continue
+            field, value = bucket.split(':', 1)
+            facets[field][value] = count
+        if empty:
+            self.redis.srem(self.receipt_facets_key, *empty)
+        return facets
+
+    def _get_receipts(self, user_ids: List[int]) -> List[Tuple[int, Dict[str, Any]]]:
+        if not user_ids:
+            return []
+        values = self.redis.hmget(self.receipts_key, user_ids)
+        return [(user_id, json.loads(value)) for user_id, value in zip(user_ids, values) if value is not None]
+
+    def oldest_pending_receipt(self) -> Optional[Tuple[int, Dict[str, Any]]]:
+        members = self.redis.zrange(self._bucket_key('all'), 0, 0)
+        receipts = self._get_receipts([int(members[0])]) if members else []
+        return receipts[0] if receipts else None
+
+    def next_unalerted_receipt_time(self) -> Optional[datetime]:
+        head = self.redis.zrange(self.receipt_alerts_key, 0, 0, withscores=True)
+        return datetime.fromtimestamp(head[0][1]) if head else None
+
+    def pop_overdue_receipts(self, cutoff: datetime, limit: int) -> List[Tuple[int, Dict[str, Any]]]:
+        members = self.redis.zrangebyscore(self.receipt_alerts_key, '-inf', cutoff.timestamp(), start=0, num=limit)
+        if not members:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        for member in members:
+            pipe.zrem(self.receipt_alerts_key, member)
+        # Чек достается тому экземпляру бота, чей ZREM его удалил
+        user_ids = [int(member) for member, removed in zip(members, pipe.execute()) if removed]
+        return self._get_receipts(user_ids)
+
+    def _decision_key(self, user_id: int, receipt_id: int) -> str:
+        return f'{self.prefix}:decision:{user_id}:{receipt_id}'
+
+    def get_receipt_decision(self, user_id: int, receipt_id: int) -> Dict[str, Any]:
+        value = self.redis.get(self._decision_key(user_id, receipt_id))
+        return json.loads(value) if value is not None else {}
+
+    def claim_receipt_decision(self, user_id: int, receipt_id: int, decision: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        key = self._decision_key(user_id, receipt_id)
+        if self.redis.set(key, json.dumps(decision, ensure_ascii=False), nx=True, ex=DECISION_TTL):
+            return None
+        return self.get_receipt_decision(user_id, receipt_id)
+
+    def _cards_key(self, user_id: int, receipt_id: int) -> str:
+        return f'{self.prefix}:cards:{user_id}:{receipt_id}'
+
+    def add_receipt_card(self, user_id: int, receipt_id: int, admin_id: int, message_id: int):
+        key = self._cards_key(user_id, receipt_id)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.rpush(key, f'{admin_id}:{message_id}')
+        pipe.expire(key, DECISION_TTL)
+        pipe.execute()
+
+    def get_receipt_cards(self, user_id: int, receipt_id: int) -> List[Tuple[int, int]]:
+        cards = []
+        for value in self.redis.lrange(self._cards_key(user_id, receipt_id), 0, -1):
+            admin_id, message_id = value.decode().split(':')
+            cards.append((int(admin_id), int(message_id)))
+        return cards
+
+    def get_group(self, level: str, date: str) -> Dict[str, Any]:
+        value = self.redis.hget(self.groups_key, f'{level}|{date}')
+        if value is None:
+            return {}
+        return json.loads(value)
+
+    def set_group(self, level: str, date: str, group: Dict[str, Any]):
+        self.redis.hset(self.groups_key, f'{level}|{date}', json.dumps(group, ensure_ascii=False))
+
+    def close(self):
+        self.redis.close()
@@ -0,0 +1,249 @@
+import json
+import logging
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+from data.backends import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+# Чья версия строки побеждает, если ее изменили и в базе, и в таблице
+OWNER_LOCAL = 'local'
+OWNER_SHEETS = 'sheets'
+
+
+def normalize_row(row: list) -> List[str]:
+    """Строка в том виде, в котором ее возвращает Sheets: текст без пустого хвоста"""
+    cells = ['' if cell is None else str(cell) for cell in row]
+    while cells and cells[-1] == '':
+        cells.pop()
+    return cells
+
+
+class MirroredSheet:
+    """Лист Google Sheets, зеркалирующий таблицу локальной базы.
+
+    key(header, row) возвращает ключ строки или None для строк, которые
+    зеркало не трогает (пустые, без ключевых колонок). owner решает
+    конфликт, когда строку изменили с обеих сторон после последней синхронизации.
+    """
+
+    def __init__(self, title: str, key: Callable[[list, list], Optional[str]], owner: str):
+        self.title = title
+        self.key = key
+        self.owner = owner
+
+    @staticmethod
+    def split_header(values: List[list]) -> Tuple[list, List[list], int]:
+        """Заголовок, строки данных и номер первой строки данных в листе.
+
+        Первая строка считается заголовком, если ее первая ячейка не число.
+        """
+        if values and values[0] and not str(values[0][0]).strip().lstrip('-').isdigit():
+            return normalize_row(values[0]), values[1:], 2
+        return [], values, 1
+
+
+class LocalStore:
+    """Локальная база SQLite - основная копия учеников, оплат и расписания.
+
+    Google Sheets - зеркало, которое SheetsMirror синхронизирует в обе
+    стороны. Для каждой строки хранится base - строка в том виде, в каком
+    она последний раз совпадала с таблицей. Сравнение с base показывает,
+    какая сторона изменилась, поэтому слияние трехстороннее и не зависит
+    от часов: изменилась одна сторона - берется она, обе - владелец листа.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS mirror_rows ('
+        'sheet TEXT NOT NULL, row_key TEXT NOT NULL, row TEXT NOT NULL, base TEXT, '
+        'sheet_row INTEGER, dirty INTEGER NOT NULL, position INTEGER NOT NULL, updated_at REAL NOT NULL, '
+        'PRIMARY KEY (sheet, row_key))',
+        'CREATE TABLE IF NOT EXISTS mirror_headers (sheet TEXT PRIMARY KEY, header TEXT NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS mirror_rows_dirty ON mirror_rows (sheet, dirty, position)',
+    )
+
+    GET_ROW = 'SELECT row, base, dirty FROM mirror_rows WHERE sheet = ? AND row_key = ?'
+    ALL_ROWS = 'SELECT row_key, row, base, dirty, sheet_row, position FROM mirror_rows WHERE sheet = ?'
+    ORDERED_ROWS = 'SELECT row FROM mirror_rows WHERE sheet = ? ORDER BY position, row_key'
+    DIRTY_ROWS = (
+        'SELECT row_key, row, base, sheet_row, updated_at FROM mirror_rows '
+        'WHERE sheet = ? AND dirty = 1 ORDER BY position, row_key LIMIT ?'
+    )
+    COUNT_DIRTY = 'SELECT COUNT(*) FROM mirror_rows WHERE sheet = ? AND dirty = 1'
+    DIRTY_KEYS = 'SELECT row_key FROM mirror_rows WHERE sheet = ? AND dirty = 1 AND row_key IN ({})'
+    NEXT_POSITION = 'SELECT COALESCE(MAX(position), 0) + 1 FROM mirror_rows WHERE sheet = ?'
+    INSERT_LOCAL = (
+        'INSERT INTO mirror_rows (sheet, row_key, row, base, sheet_row, dirty, position, updated_at) '
+        'VALUES (?, ?, ?, NULL, NULL, 1, ?, ?)'
+    )
+    UPDATE_LOCAL = 'UPDATE mirror_rows SET row = ?, dirty = ?, updated_at = ? WHERE sheet = ? AND row_key = ?'
+    INSERT_REMOTE = (
+        'INSERT INTO mirror_rows (sheet, row_key, row, base, sheet_row, dirty, position, updated_at) '
+        'VALUES (?, ?, ?, ?, ?, 0, ?, ?)'
+    )
+    TAKE_REMOTE = (
+        'UPDATE mirror_rows SET row = ?, base = ?, sheet_row = ?, dirty = 0, position = ?, updated_at = ? '
+        'WHERE sheet = ? AND row_key = ?'
+    )
+    KEEP_LOCAL = (
+        'UPDATE mirror_rows SET base = ?, sheet_row = ?, position = ? '
+        'WHERE sheet = ? AND row_key = ?'
+    )
+    DETACH_ROW = 'UPDATE mirror_rows SET base = NULL, sheet_row = NULL, dirty = 1 WHERE sheet = ? AND row_key = ?'
+    DELETE_ROW = 'DELETE FROM mirror_rows WHERE sheet = ? AND row_key = ?'
+    MARK_PUSHED = (
+        'UPDATE mirror_rows SET base = ?, sheet_row = ?, dirty = (row != ?) '
+        'WHERE sheet = ? AND row_key = ?'
+    )
+    GET_HEADER = 'SELECT header FROM mirror_headers WHERE sheet = ?'
+    SET_HEADER = 'INSERT OR REPLACE INTO mirror_headers (sheet, header) VALUES (?, ?)'
+
+    def __init__(self, path: str):
+        self.connection = connect_sqlite(path)
+        self._lock = threading.Lock()
+        for statement in self.SCHEMA:
+            self.connection.execute(statement)
+
+    def upsert(self, sheet: str, key: str, row: list) -> bool:
+        """Локальная запись строки. True - строка изменилась и будет отправлена в таблицу"""
+        row_json = json.dumps(normalize_row(row), ensure_ascii=False)
+        with self._lock:
+            current = self.connection.execute(self.GET_ROW, (sheet, key)).fetchone()
+            if current is None:
+                position = self.connection.execute(self.NEXT_POSITION, (sheet,)).fetchone()[0]
+                self.connection.execute(self.INSERT_LOCAL, (sheet, key, row_json, position, time.time()))
+                return True
+            if current[0] == row_json:
+                return False
+            self.connection.execute(self.UPDATE_LOCAL, (row_json, int(row_json != current[1]), time.time(), sheet, key))
+            return True
+
+    def values(self, sheet: str) -> List[list]:
+        """Заголовок и строки листа в порядке таблицы, как get_all_values()"""
+        with self._lock:
+            header = self.connection.execute(self.GET_HEADER, (sheet,)).fetchone()
+            rows = [json.loads(row) for row, in self.connection.execute(self.ORDERED_ROWS, (sheet,))]
+        return ([json.loads(header[0])] if header else []) + rows
+
+    def dirty_rows(self, sheet: str, limit: int) -> List[tuple]:
+        """Строки, ожидающие отправки: (ключ, строка, base, номер строки в листе, время изменения)"""
+        with self._lock:
+            rows = self.connection.execute(self.DIRTY_ROWS, (sheet, limit)).fetchall()
+        return [(key, json.loads(row), json.loads(base) if base else None, sheet_row, updated_at)
+                for key, row, base, sheet_row, updated_at in rows]
+
+    def dirty_keys(self, sheet: str, keys: Iterable[str]) -> Set[str]:
+        """Какие из строк keys еще не отправлены в таблицу"""
+        keys = list(keys)
+        if not keys:
+            return set()
+        with self._lock:
+            rows = self.connection.execute(self.DIRTY_KEYS.format(','.join('?' * len(keys))), (sheet, *keys)).fetchall()
+        return {key for key, in rows}
+
+    def pending_count(self, sheet: str) -> int:
+        with self._lock:
+            return self.connection.execute(self.COUNT_DIRTY, (sheet,)).fetchone()[0]
+
+    def mark_pushed(self, sheet: str, pushed: List[tuple]):
+        """pushed: (ключ, отправленная строка, номер строки в листе или None).
+
+        Если строку изменили локально, пока шла отправка, она остается
+        в очереди на следующую синхронизацию.
+        """
+        with self._lock:
+            self.connection.execute('BEGIN')
+            try:
+                for key, row, sheet_row in pushed:
+                    row_json = json.dumps(row, ensure_ascii=False)
+                    self.connection.execute(self.MARK_PUSHED, (row_json, sheet_row, row_json, sheet, key))
+                self.connection.execute('COMMIT')
+            except Exception:
+                self.connection.execute('ROLLBACK')
+                raise
+
+    def merge_remote(self, spec: MirroredSheet, values: List[list]) -> dict:
+        """Сливает содержимое листа с локальной копией. Возвращает счетчики изменений"""
+        header, rows, first_row = spec.split_header(values)
+        stats = {'inserted': 0, 'updated': 0, 'deleted': 0, 'conflicts': 0, 'duplicates': 0, 'unchanged': 0}
+        now = time.time()
+
+        with self._lock:
+            self.connection.execute('BEGIN')
+            try:
+                if header:
+                    self.connection.execute(self.SET_HEADER, (spec.title, json.dumps(header, ensure_ascii=False)))
+                local = {key: (row, base, dirty, stored_row, position) for key, row, base, dirty, stored_row, position
+                         in self.connection.execute(self.ALL_ROWS, (spec.title,))}
+                seen = set()
+
+                for offset, raw in enumerate(rows):
+                    remote = normalize_row(raw)
+                    key = spec.key(header, remote) if remote else None
+                    if key is None:
+                        continue
+                    if key in seen:
+                        # Повтор ключа в листе: действует первая строка
+                        stats['duplicates'] += 1
+                        continue
+                    seen.add(key)
+                    sheet_row = first_row + offset
+                    remote_json = json.dumps(remote, ensure_ascii=False)
+
+                    current = local.get(key)
+                    if current is None:
+                        self.connection.execute(self.INSERT_REMOTE, (spec.title, key, remote_json, remote_json,
+                                                                     sheet_row, sheet_row, now))
+                        stats['inserted'] += 1
+                        continue
+
+                    row, base, dirty, stored_row, position = current
+                    if remote_json == base:
+                        # В таблице ничего нового: локальная строка остается как есть
+                        if stored_row == sheet_row and position == sheet_row:
+                            # Строка не сдвинулась - в базу писать нечего
+                            stats['unchanged'] += 1
+                            continue
+                        self.connection.execute(self.KEEP_LOCAL, (remote_json, sheet_row, sheet_row, spec.title, key))
+                        continue
+                    if remote_json == row:
+                        # Обе стороны пришли к одному значению
+                        self.connection.execute(self.TAKE_REMOTE, (remote_json, remote_json, sheet_row, sheet_row,
+                                                                   now, spec.title, key))
+                        continue
+
+                    if dirty:
+                        stats['conflicts'] += 1
+                        if spec.owner == OWNER_LOCAL:
+                            # Локальная версия будет записана поверх таблицы
+                            self.connection.execute(self.KEEP_LOCAL, (remote_json, sheet_row, sheet_row,
+                                                                      spec.title, key))
+                            continue
+                    self.connection.execute(self.TAKE_REMOTE, (remote_json, remote_json, sheet_row, sheet_row,
+                                                               now, spec.title, key))
+                    stats['updated'] += 1
+
+                for key, (row, base, dirty, _, _) in local.items():
+                    if key in seen or base is None:
+                        # Новые локальные строки еще не отправлены в таблицу
+                        continue
+                    # Строку удалили из таблицы
+                    if spec.owner == OWNER_LOCAL:
+                        self.connection.execute(self.DETACH_ROW, (spec.title, key))
+                    else:
+                        self.connection.execute(self.DELETE_ROW, (spec.title, key))
+                        stats['deleted'] += 1
+
+                self.connection.execute('COMMIT')
+            except Exception:
+                self.connection.execute('ROLLBACK')
+                raise
+
+        if stats['conflicts']:
+            logger.warning(f"Sheet '{spec.title}': {stats['conflicts']} conflicts resolved in favor of {spec.owner}")
+        return stats
+
+    def close(self):
+        self.connection.close()
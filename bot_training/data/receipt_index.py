@@ -0,0 +1,119 @@
+from bisect import bisect_left, insort
+from heapq import heapify, heappop, heappush
+from typing import Any, Dict, List, Optional, Tuple
+
+# Фильтр индекса: (уровень или None, дата или None)
+Bucket = Tuple[Optional[str], Optional[str]]
+
+
+def receipt_sort_key(user_id: int, receipt_data: Dict[str, Any]) -> tuple:
+    """Чеки упорядочены по времени отправки, при равном времени - по user_id"""
+    return receipt_data.get('timestamp', ''), user_id
+
+
+def receipt_facets(receipt_data: Dict[str, Any]) -> Tuple[str, str]:
+    user_data = receipt_data.get('user_data', {})
+    return user_data.get('level', ''), user_data.get('date', '')
+
+
+class PendingReceiptIndex:
+    """Ожидающие чеки, отсортированные по времени отправки.
+
+    Для каждого фильтра - все чеки, уровень, дата, уровень и дата - хранится
+    свой отсортированный список ключей. Добавление и удаление обновляют
+    четыре списка бинарным поиском, а страница фильтра - это срез списка,
+    поэтому ее стоимость не зависит от числа остальных чеков.
+
+    Чеки, о просрочке которых еще не предупреждали, лежат в куче по
+    времени отправки. Записи удаленных чеков из кучи не вычищаются сразу:
+    они пропускаются, когда оказываются наверху.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[Bucket, list] = {}
+        self._entries: Dict[int, tuple] = {}  # user_id -> (ключ сортировки, уровень, дата)
+        self._age_heap: list = []
+        self._unalerted: Dict[int, tuple] = {}  # user_id -> ключ сортировки в куче
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _bucket_names(level: str, date: str) -> List[Bucket]:
+        return [(None, None), (level, None), (None, date), (level, date)]
+
+    def add(self, user_id: int, receipt_data: Dict[str, Any]):
+        self.remove(user_id)
+        key = receipt_sort_key(user_id, receipt_data)
+        level, date = receipt_facets(receipt_data)
+        self._entries[user_id] = (key, level, date)
+        for bucket in self._bucket_names(level, date):
+            insort(self._buckets.setdefault(bucket, []), key)
+        self._unalerted[user_id] = key
+        heappush(self._age_heap, key)
+        if len(self._age_heap) > 2 * len(self._unalerted) + 64:
+            # Много записей удаленных чеков - куча пересобирается из актуальных
+            self._age_heap = list(self._unalerted.values())
+            heapify(self._age_heap)
+
+    def remove(self, user_id: int):
+        self._unalerted.pop(user_id, None)
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return
+        key, level, date = entry
+        for bucket in self._bucket_names(level, date):
+            keys = self._buckets[bucket]
+            del keys[bisect_left(keys, key)]
+            if not keys:
+                del self._buckets[bucket]
+
+    def page(self, offset: int, limit: int, level: Optional[str] = None,
+             date: Optional[str] = None) -> Tuple[List[int], int]:
+        """user_id чеков страницы и общее число чеков под фильтром"""
+        keys = self._buckets.get((level, date), [])
+        return [user_id for _, user_id in keys[offset:offset + limit]], len(keys)
+
+    def facets(self) -> Dict[str, Dict[str, int]]:
+        """Сколько чеков ожидает по каждому уровню и каждой дате"""
+        facets = {'level': {}, 'date': {}}
+        for (level, date), keys in self._buckets.items():
+            if level is not None and date is None:
+                facets['level'][level] = len(keys)
+            elif level is None and date is not None:
+                facets['date'][date] = len(keys)
+        return facets
+
+    def oldest(self) -> Optional[int]:
+        """user_id чека, который ждет проверки дольше всех"""
+        keys = self._buckets.get((None, None))
+        return keys[0][1] if keys else None
+
+    def _heap_top(self) -> Optional[tuple]:
+        while self._age_heap:
+            key = self._age_heap[0]
+            if self._unalerted.get(key[1]) == key:
+                return key
+            heappop(self._age_heap)
+        return None
+
+    def next_unalerted(self) -> Optional[str]:
+        """Время отправки самого старого чека, о котором еще не предупреждали"""
+        key = self._heap_top()
+        return key[0] if key is not None else None
+
+    def pop_overdue(self, cutoff: str, limit: int) -> List[int]:
+        """Забирает из кучи не больше limit чеков, отправленных до cutoff.
+
+        Чеки остаются в списке ожидающих, но повторно не возвращаются,
+        пока их не отправят заново.
+        """
+        user_ids = []
+        while len(user_ids) < limit:
+            key = self._heap_top()
+            if key is None or key[0] > cutoff:
+                break
+            heappop(self._age_heap)
+            del self._unalerted[key[1]]
+            user_ids.append(key[1])
+        return user_ids
@@ -0,0 +1,60 @@
+import json
+import threading
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from data.backends import connect_sqlite
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище aiogram в локальной базе SQLite.
+
+    Запросы выполняются синхронно: чтение строки по первичному ключу
+    занимает микросекунды, выносить его в пул потоков дороже.
+    """
+
+    SCHEMA = 'CREATE TABLE IF NOT EXISTS fsm (key TEXT PRIMARY KEY, state TEXT, data TEXT)'
+    SET_STATE = (
+        'INSERT INTO fsm (key, state) VALUES (?, ?) '
+        'ON CONFLICT(key) DO UPDATE SET state = excluded.state'
+    )
+    SET_DATA = (
+        'INSERT INTO fsm (key, data) VALUES (?, ?) '
+        'ON CONFLICT(key) DO UPDATE SET data = excluded.data'
+    )
+    GET_STATE = 'SELECT state FROM fsm WHERE key = ?'
+    GET_DATA = 'SELECT data FROM fsm WHERE key = ?'
+
+    def __init__(self, path: str, key_builder: Optional[KeyBuilder] = None):
+        self.connection = connect_sqlite(path)
+        self.key_builder = key_builder or DefaultKeyBuilder()
+        self._lock = threading.Lock()
+        self.connection.execute(self.SCHEMA)
+
+    def _fetch_one(self, sql: str, key: StorageKey):
+        with self._lock:
+            row = self.connection.execute(sql, (self.key_builder.build(key),)).fetchone()
+        return row[0] if row else None
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        with self._lock:
+            self.connection.execute(self.SET_STATE, (self.key_builder.build(key), value))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return self._fetch_one(self.GET_STATE, key)
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        with self._lock:
+            self.connection.execute(
+                self.SET_DATA, (self.key_builder.build(key), json.dumps(dict(data), ensure_ascii=False))
+            )
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        value = self._fetch_one(self.GET_DATA, key)
+        return json.loads(value) if value else {}
+
+    async def close(self) -> None:
+        self.connection.close()
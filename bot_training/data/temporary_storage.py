@@ -1,42 +1,120 @@
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 
-# Временное хранилище данных пользователей
-user_data = {}
-# Хранилище ожидающих проверки чеков
-pending_receipts = {}
+from data.backends import StorageBackend, MemoryBackend
+
+# Хранилище данных пользователей и ожидающих проверки чеков.
+# По умолчанию в памяти процесса, при старте бота заменяется через configure()
+_backend: StorageBackend = MemoryBackend()
 
 class TemporaryStorage:
+    @staticmethod
+    def configure(backend: StorageBackend):
+        global _backend
+        _backend = backend
+
+    @staticmethod
+    def backend() -> StorageBackend:
+        return _backend
+
     @staticmethod
     def save_user_data(user_id: int, data: Dict[str, Any]):
-        user_data[user_id] = data
-    
+        _backend.save_user_data(user_id, data)
+
     @staticmethod
     def get_user_data(user_id: int) -> Dict[str, Any]:
-        return user_data.get(user_id, {})
-    
+        return _backend.get_user_data(user_id)
+
     @staticmethod
     def delete_user_data(user_id: int):
-        if user_id in user_data:
-            del user_data[user_id]
-    
+        _backend.delete_user_data(user_id)
+
+    @staticmethod
+    def session_stats() -> Dict[str, int]:
+        return _backend.session_stats()
+
     # Методы для управления чеками
     @staticmethod
     def add_pending_receipt(user_id: int, receipt_data: Dict[str, Any]):
-        pending_receipts[user_id] = {
+        _backend.add_pending_receipt(user_id, {
             **receipt_data,
             'timestamp': datetime.now().isoformat()
-        }
-    
+        })
+
     @staticmethod
     def get_pending_receipt(user_id: int) -> Dict[str, Any]:
-        return pending_receipts.get(user_id, {})
-    
+        return _backend.get_pending_receipt(user_id)
+
     @staticmethod
     def remove_pending_receipt(user_id: int):
-        if user_id in pending_receipts:
-            del pending_receipts[user_id]
-    
+        _backend.remove_pending_receipt(user_id)
+
+    @staticmethod
+    def pop_pending_receipt(user_id: int) -> Dict[str, Any]:
+        """Забирает чек из ожидающих. Пустой словарь - чек уже обработан"""
+        return _backend.pop_pending_receipt(user_id)
+
     @staticmethod
     def get_all_pending_receipts() -> Dict[int, Dict[str, Any]]:
-        return pending_receipts.copy()
\ No newline at end of file
+        return _backend.get_all_pending_receipts()
+
+    @staticmethod
+    def list_pending_receipts(offset: int, limit: int, level: Optional[str] = None,
+                              date: Optional[str] = None) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+        """Страница ожидающих чеков, старые первыми, и общее число под фильтром"""
+        return _backend.list_pending_receipts(offset, limit, level, date)
+
+    @staticmethod
+    def pending_receipt_facets() -> Dict[str, Dict[str, int]]:
+        return _backend.pending_receipt_facets()
+
+    @staticmethod
+    def oldest_pending_receipt() -> Optional[Tuple[int, Dict[str, Any]]]:
+        return _backend.oldest_pending_receipt()
+
+    @staticmethod
+    def next_unalerted_receipt_time() -> Optional[datetime]:
+        return _backend.next_unalerted_receipt_time()
+
+    @staticmethod
+    def pop_overdue_receipts(cutoff: datetime, limit: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """Просроченные чеки для предупреждения администраторам, каждый один раз"""
+        return _backend.pop_overdue_receipts(cutoff, limit)
+
+    # Решения администраторов по чекам, ключ - (user_id, id чека)
+    @staticmethod
+    def get_receipt_decision(user_id: int, receipt_id: int) -> Dict[str, Any]:
+        return _backend.get_receipt_decision(user_id, receipt_id)
+
+    @staticmethod
+    def claim_receipt_decision(user_id: int, receipt_id: int, decision: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return _backend.claim_receipt_decision(user_id, receipt_id, decision)
+
+    # Карточки чека у администраторов, чтобы после решения обновить их все
+    @staticmethod
+    def add_receipt_card(user_id: int, receipt_id: int, admin_id: int, message_id: int):
+        _backend.add_receipt_card(user_id, receipt_id, admin_id, message_id)
+
+    @staticmethod
+    def get_receipt_cards(user_id: int, receipt_id: int) -> List[Tuple[int, int]]:
+        return _backend.get_receipt_cards(user_id, receipt_id)
+
+    # Реестр учебных групп: (уровень, дата) -> chat_id и пригласительная ссылка
+    @staticmethod
+    def get_group(level: str, date: str) -> Dict[str, Any]:
+        return _backend.get_group(level, date)
+
+    @staticmethod
+    def get_group_chat_id(level: str, date: str) -> Optional[int]:
+        return _backend.get_group(level, date).get('chat_id')
+
+    @staticmethod
+    def set_group_chat_id(level: str, date: str, chat_id: int):
+        """Привязывает группу; ссылка прежней группы больше не действует"""
+        _backend.set_group(level, date, {'chat_id': chat_id})
+
+    @staticmethod
+    def set_group_invite_link(level: str, date: str, invite_link: str, expires_at: float):
+        group = _backend.get_group(level, date)
+        if group:
+            _backend.set_group(level, date, {**group, 'invite_link': invite_link, 'invite_expires_at': expires_at})
@@ -0,0 +1,128 @@
+from aiogram import Router
+from aiogram.types import Message
+from aiogram.filters import Command, CommandObject
+import logging
+import time
+
+from config import ADMIN_IDS, LEVELS
+from data.temporary_storage import TemporaryStorage
+from services.async_sheets import AsyncSheetsManager
+from services.group_manager import GroupManager
+from services.sheets_guard import CLOSED, OPEN
+from services.sheets_mirror import SCHEDULE_SHEET, SheetsMirror
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+@router.message(Command('refresh_schedule'))
+async def cmd_refresh_schedule(message: Message, sheets_manager: AsyncSheetsManager, sheets_mirror: SheetsMirror):
+    """Администратор принудительно забирает расписание из таблицы"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    
+    try:
+        if await sheets_mirror.pull(SCHEDULE_SHEET) is None:
+            raise RuntimeError("schedule sheet is unavailable")
+        snapshot = await sheets_manager.refresh_schedule()
+        await message.answer(
+            f"🔄 Расписание обновлено\n"
+            f"Версия: {snapshot.version}\n"
+            f"Строк: {len(snapshot.rows)}"
+        )
+    except Exception as e:
+        logger.error(f"Error refreshing schedule: {e}")
+        await message.answer("❌ Не удалось обновить расписание. Используется предыдущая версия.")
+
+@router.message(Command('sessions'))
+async def cmd_sessions(message: Message):
+    """Размер хранилища сессий регистрации и счетчики вытеснения"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    
+    stats = TemporaryStorage.session_stats()
+    await message.answer(
+        f"👥 Сессии регистрации: {stats['size']}\n"
+        f"⏳ Удалено по времени простоя: {stats['evicted_ttl']}\n"
+        f"📦 Удалено по лимиту: {stats['evicted_capacity']}"
+    )
+
+BREAKER_LABELS = {
+    CLOSED: "🟢 работает",
+    OPEN: "🔴 запросы приостановлены",
+}
+
+@router.message(Command('sheets_status'))
+async def cmd_sheets_status(message: Message, sheets_manager: AsyncSheetsManager, sheets_mirror: SheetsMirror):
+    """Состояние связи с Google Sheets: предохранитель, квота и отставание зеркала"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    
+    guard = sheets_manager.guard
+    if guard is None:
+        await message.answer("Учет квоты Google Sheets не настроен")
+        return
+    
+    status = guard.status()
+    lines = [f"📊 Google Sheets: {BREAKER_LABELS.get(status['state'], '🟡 пробный запрос')}"]
+    if status['state'] == OPEN:
+        lines.append(f"Повтор через: {status['open_remaining']:.0f} с")
+    if status['backoff_remaining']:
+        lines.append(f"⏸ Пауза после 429: {status['backoff_remaining']:.0f} с")
+    lines.append(f"Ошибок подряд: {status['failures']}")
+    for kind, (used, limit) in status['quota'].items():
+        lines.append(f"Квота {kind}: {used}/{limit} за минуту")
+    for title in sheets_mirror.sheets:
+        pulled_at = sheets_mirror.pulled_at.get(title)
+        age = f"{time.time() - pulled_at:.0f} с назад" if pulled_at else "не загружался"
+        lines.append(f"Лист '{title}': обновлен {age}, ждут отправки {sheets_mirror.store.pending_count(title)}")
+    if status['last_error']:
+        lines.append(f"Последняя ошибка: {status['last_error'][:200]}")
+    await message.answer("\n".join(lines))
+
+SET_GROUP_USAGE = (
+    "Команда отправляется в учебной группе: /set_group_id, если группа "
+    "называется '<уровень> - <дата>', или /set_group_id <уровень> <дата>.\n"
+    "В личных сообщениях боту: /set_group_id <ID группы> <уровень> <дата>"
+)
+
+def parse_group(text: str):
+    """Уровень и дата из '<уровень> <дата>' или названия группы '<уровень> - <дата>'"""
+    level, sep, date = text.partition(' - ')
+    if not sep:
+        level, _, date = text.strip().partition(' ')
+    level = next((title for title in LEVELS.values() if title.lower() == level.strip().lower()), None)
+    return level, date.strip() or None
+
+@router.message(Command('set_group_id'))
+async def cmd_set_group_id(message: Message, command: CommandObject, group_manager: GroupManager):
+    """Привязывает учебную группу к уровню и дате в реестре групп"""
+    if message.from_user is None or message.from_user.id not in ADMIN_IDS:
+        return
+    
+    args = (command.args or '').strip()
+    if message.chat.type in ('group', 'supergroup'):
+        chat_id = message.chat.id
+        level, date = parse_group(args or message.chat.title or '')
+    else:
+        chat_id, _, rest = args.partition(' ')
+        try:
+            chat_id = int(chat_id)
+        except ValueError:
+            chat_id = None
+        level, date = parse_group(rest)
+    
+    if chat_id is None or level is None or date is None:
+        await message.answer(f"❌ Не удалось определить группу.\n{SET_GROUP_USAGE}")
+        return
+    
+    try:
+        await group_manager.set_group_id(level, date, chat_id)
+        await message.answer(
+            f"✅ Группа привязана\n"
+            f"📚 Уровень: {level}\n"
+            f"📅 Дата: {date}\n"
+            f"🆔 ID группы: {chat_id}"
+        )
+    except Exception as e:
+        logger.error(f"Error setting group id: {e}")
+        await message.answer("❌ Не удалось сохранить группу")
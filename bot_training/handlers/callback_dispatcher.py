@@ -0,0 +1,55 @@
+from aiogram import Router
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import CallbackQuery
+
+from keyboards.callbacks import decode
+
+
+class CallbackHandlers:
+    """Обработчики кнопок одного модуля: код операции -> обработчик"""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def __call__(self, op: str):
+        def register(func):
+            if op in self.handlers:
+                raise ValueError(f"Callback handler for '{op}' is already registered")
+            self.handlers[op] = HandlerObject(callback=func)
+            return func
+        return register
+
+
+class CallbackDispatcher(Router):
+    """Единый обработчик callback_query.
+
+    callback_data разбирается один раз, обработчик выбирается по коду
+    операции поиском в словаре, а не перебором фильтров всех роутеров.
+    Обработчик получает разобранную кнопку в параметре payload и те же
+    зависимости, что и обычный хендлер aiogram (state, sheets_manager...).
+    """
+
+    def __init__(self, *tables: CallbackHandlers, name: str = 'callbacks'):
+        super().__init__(name=name)
+        self._handlers = {}
+        for table in tables:
+            for op, handler in table.handlers.items():
+                if op in self._handlers:
+                    raise ValueError(f"Callback handler for '{op}' is registered twice")
+                self._handlers[op] = handler
+        self.callback_query.register(self._dispatch, self._resolve)
+
+    def _resolve(self, callback: CallbackQuery):
+        """Фильтр: подходит, если для кода операции есть обработчик.
+
+        Найденный обработчик подменяет data['handler'], поэтому middleware
+        и флаги видят настоящий хендлер, а не _dispatch.
+        """
+        payload = decode(callback.data)
+        handler = self._handlers.get(payload.op) if payload is not None else None
+        if handler is None:
+            return False
+        return {'payload': payload, 'handler': handler}
+
+    async def _dispatch(self, callback: CallbackQuery, **data):
+        return await data['handler'].call(callback, **data)
@@ -1,17 +1,28 @@
-from aiogram import Router
 from aiogram.types import CallbackQuery
 
 from data.temporary_storage import TemporaryStorage
+from handlers.callback_dispatcher import CallbackHandlers
+from keyboards.callbacks import DATE, CallbackPayload, resolve_date
 from keyboards.inline_kb import get_payment_confirmation_keyboard
+from services.async_sheets import AsyncSheetsManager
 
-router = Router()
+callbacks = CallbackHandlers()
 
-@router.callback_query(lambda c: c.data.startswith('date_'))
-async def process_date_selection(callback: CallbackQuery):
-    selected_date = callback.data.split('_', 1)[1]
+@callbacks(DATE)
+async def process_date_selection(callback: CallbackQuery, payload: CallbackPayload, sheets_manager: AsyncSheetsManager):
+    user_data = TemporaryStorage.get_user_data(callback.from_user.id)
+    
+    selected_date = resolve_date(payload.arg(0))
+    if selected_date is None and user_data.get('level'):
+        # Кнопка собрана до перезапуска или другой репликой - ищем дату среди дат уровня
+        dates = await sheets_manager.get_dates_for_level(user_data['level'])
+        selected_date = resolve_date(payload.arg(0), dates)
+    
+    if selected_date is None:
+        await callback.answer("❌ Эта дата больше недоступна. Выберите уровень заново.", show_alert=True)
+        return
     
     # Сохраняем дату во временные данные
-    user_data = TemporaryStorage.get_user_data(callback.from_user.id)
     user_data['date'] = selected_date
     TemporaryStorage.save_user_data(callback.from_user.id, user_data)
     
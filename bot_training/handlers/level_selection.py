@@ -1,21 +1,22 @@
-from aiogram import Router
 from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.exceptions import TelegramBadRequest
 import logging
 
 from config import LEVELS
-from services.google_sheets import GoogleSheetsManager
+from services.async_sheets import AsyncSheetsManager
+from keyboards.callbacks import BACK_TO_LEVELS, LEVEL, CallbackPayload, level_key as level_key_by_id
 from keyboards.inline_kb import get_dates_keyboard, get_levels_keyboard
 from data.temporary_storage import TemporaryStorage
+from handlers.callback_dispatcher import CallbackHandlers
 
-router = Router()
+callbacks = CallbackHandlers()
 logger = logging.getLogger(__name__)
 
-@router.callback_query(lambda c: c.data.startswith('level_'))
-async def process_level_selection(callback: CallbackQuery, state: FSMContext):
+@callbacks(LEVEL)
+async def process_level_selection(callback: CallbackQuery, payload: CallbackPayload, state: FSMContext, sheets_manager: AsyncSheetsManager):
     try:
-        level_key = callback.data.split('_')[1]
+        level_key = level_key_by_id(payload.arg(0))
         
         if level_key not in LEVELS:
             await callback.answer("Неверный уровень")
@@ -27,17 +28,21 @@ async def process_level_selection(callback: CallbackQuery, state: FSMContext):
         user_data['level_key'] = level_key
         TemporaryStorage.save_user_data(callback.from_user.id, user_data)
         
-        # Получаем даты из Google Sheets
-        from config import GOOGLE_SHEETS_CREDENTIALS, SHEET_URL  # Импортируем напрямую
-        sheets_manager = GoogleSheetsManager(GOOGLE_SHEETS_CREDENTIALS, SHEET_URL)
-        
-        dates = sheets_manager.get_dates_for_level(LEVELS[level_key])
+        # Получаем даты из Google Sheets через общий менеджер
+        dates, schedule_version = await sheets_manager.get_dates_with_version(LEVELS[level_key])
         
         # ДЕБАГ: Логируем что ищем и что нашли
         logger.info(f"Searching dates for level: '{LEVELS[level_key]}'")
         logger.info(f"Found dates: {dates}")
         
-        if not dates:
+        if schedule_version is None:
+            # Расписание ни разу не удалось загрузить - это не то же самое, что "нет дат"
+            message_text = (
+                "⚠️ Расписание временно недоступно.\n"
+                "Пожалуйста, попробуйте через минуту."
+            )
+            keyboard = get_levels_keyboard()
+        elif not dates:
             message_text = (
                 "❌ На данный момент нет доступных дат для этого уровня.\n"
                 "Пожалуйста, выберите другой уровень или попробуйте позже."
@@ -45,7 +50,7 @@ async def process_level_selection(callback: CallbackQuery, state: FSMContext):
             keyboard = get_levels_keyboard()
         else:
             message_text = f"📅 Выберите дату для уровня {LEVELS[level_key]}:"
-            keyboard = get_dates_keyboard(dates)
+            keyboard = get_dates_keyboard(dates, LEVELS[level_key], schedule_version)
         
         # Пытаемся обновить сообщение с обработкой ошибки
         try:
@@ -68,7 +73,7 @@ async def process_level_selection(callback: CallbackQuery, state: FSMContext):
         logger.error(f"Error in level selection: {e}")
         await callback.answer("Произошла ошибка. Попробуйте еще раз.", show_alert=True)
 
-@router.callback_query(lambda c: c.data == 'back_to_levels')
+@callbacks(BACK_TO_LEVELS)
 async def back_to_levels(callback: CallbackQuery):
     try:
         await callback.message.edit_text(
@@ -1,17 +1,19 @@
-from aiogram import Router
 from aiogram.types import CallbackQuery
 import logging
 
 from data.temporary_storage import TemporaryStorage
-from services.google_sheets import GoogleSheetsManager
+from handlers.callback_dispatcher import CallbackHandlers
+from keyboards.callbacks import MAKE_PAYMENT
+from services.async_sheets import AsyncSheetsManager
 from services.group_manager import GroupManager
-from config import ADMIN_IDS, GOOGLE_SHEETS_CREDENTIALS, SHEET_URL
+from services.write_behind import StudentWriteQueue
 
-router = Router()
+callbacks = CallbackHandlers()
 logger = logging.getLogger(__name__)
 
-@router.callback_query(lambda c: c.data == 'make_payment')
-async def process_payment(callback: CallbackQuery):
+@callbacks(MAKE_PAYMENT)
+async def process_payment(callback: CallbackQuery, sheets_manager: AsyncSheetsManager, student_queue: StudentWriteQueue,
+                          group_manager: GroupManager):
     try:
         user_data = TemporaryStorage.get_user_data(callback.from_user.id)
         
@@ -22,25 +24,19 @@ async def process_payment(callback: CallbackQuery):
         # Заглушка для оплаты
         user_data['payment_status'] = 'paid'
         
-        # Сохраняем в Google Sheets
-        sheets_manager = GoogleSheetsManager(GOOGLE_SHEETS_CREDENTIALS, SHEET_URL)
-        
-        if sheets_manager.save_user_data(user_data):
-            # Получаем информацию о группе
-            group_info = sheets_manager.get_group_info_for_date(
-                user_data['level'], 
-                user_data['date']
-            )
+        # Ставим в очередь записи в Google Sheets
+        if student_queue.enqueue(user_data):
+            # Ссылка на группу: из реестра групп, таблица - только если группы там нет
+            group = (user_data['level'], user_data['date'])
+            group_links = await group_manager.resolve_group_links([group], sheets_manager)
             
             # Добавляем в группу
-            group_manager = GroupManager(callback.bot, ADMIN_IDS)
-            
             group_result = await group_manager.add_user_to_group(
                 level=user_data['level'],
                 date=user_data['date'],
                 user_id=callback.from_user.id,
                 user_data=user_data,
-                group_link=group_info.get('group_link') if group_info.get('group_exists') else None
+                group_link=group_links[group]
             )
             
             # Отправляем информацию о группе пользователю
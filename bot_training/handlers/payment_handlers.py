@@ -1,23 +1,39 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, ContentType, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import Message, CallbackQuery, ContentType, InlineKeyboardMarkup, InlineKeyboardButton, User
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from aiogram.exceptions import TelegramBadRequest
+import asyncio
 import logging
+import time
 from datetime import datetime
+from typing import List, Optional, Tuple
 
 from data.temporary_storage import TemporaryStorage
-from services.google_sheets import GoogleSheetsManager
+from services.async_sheets import AsyncSheetsManager
 from services.group_manager import GroupManager
-from config import ADMIN_IDS, GOOGLE_SHEETS_CREDENTIALS, SHEET_URL, PAYMENT_DETAILS, PRICES, calculate_prepayment
+from services.write_behind import StudentWriteQueue
+from services.fanout import fan_out, run_in_background
+from services.idempotency import receipt_locks
+from services.metrics import metrics
+from config import ADMIN_IDS, PAYMENT_DETAILS, PRICES, calculate_prepayment
+from handlers.callback_dispatcher import CallbackHandlers
+from keyboards.callbacks import (
+    CONFIRM_RECEIPT, PENDING_RECEIPTS, REJECT_RECEIPT, REVIEW_RECEIPT, START_PAYMENT,
+    CallbackPayload, encode, receipt_ref
+)
 from keyboards.inline_kb import get_payment_confirmation_keyboard, get_receipt_confirmation_keyboard
 
 router = Router()
+callbacks = CallbackHandlers()
 logger = logging.getLogger(__name__)
 
 class PaymentStates(StatesGroup):
     waiting_for_receipt = State()
 
-@router.callback_query(lambda c: c.data == 'start_payment')
+DECISION_TEXT = {'confirmed': 'подтвержден', 'rejected': 'отклонен'}
+
+@callbacks(START_PAYMENT)
 async def start_payment_process(callback: CallbackQuery, state: FSMContext):
     try:
         user_data = TemporaryStorage.get_user_data(callback.from_user.id)
@@ -84,8 +100,8 @@ async def handle_receipt(message: Message, state: FSMContext):
         user_data['payment_status'] = 'pending_verification'
         TemporaryStorage.save_user_data(user_id, user_data)
         
-        # Отправляем чек администраторам для проверки
-        await send_receipt_to_admins(message, user_data)
+        # Сохраняем чек в ожидающие
+        receipt_data = save_pending_receipt(message, user_data)
         
         await message.answer(
             "✅ Чек получен! Администратор проверит оплату в ближайшее время.\n\n"
@@ -94,6 +110,9 @@ async def handle_receipt(message: Message, state: FSMContext):
         
         await state.clear()
         
+        # Отправляем чек администраторам для проверки, не задерживая ответ пользователю
+        run_in_background(send_receipt_to_admins(message.bot, receipt_data), name=f"receipt_{user_id}")
+        
     except Exception as e:
         logger.error(f"Error handling receipt: {e}")
         await message.answer("❌ Произошла ошибка при обработке чека.")
@@ -113,10 +132,8 @@ def get_file_id(message: Message) -> str:
         return message.document.file_id
     return ""
 
-async def send_receipt_to_admins(message: Message, user_data: dict):
-    """Отправляет чек администраторам для проверки"""
-    
-    # Сохраняем чек в ожидающие
+def save_pending_receipt(message: Message, user_data: dict) -> dict:
+    """Сохраняет чек в ожидающие проверки"""
     receipt_data = {
         'user_data': user_data,
         'message_id': message.message_id,
@@ -125,155 +142,197 @@ async def send_receipt_to_admins(message: Message, user_data: dict):
         'timestamp': datetime.now().isoformat()
     }
     TemporaryStorage.add_pending_receipt(user_data['user_id'], receipt_data)
-    
-    receipt_info = (
-        "🧾 **НОВЫЙ ЧЕК ДЛЯ ПРОВЕРКИ**\n\n"
+    return receipt_data
+
+def receipt_caption(receipt_data: dict, title: str = "🧾 **НОВЫЙ ЧЕК ДЛЯ ПРОВЕРКИ**") -> str:
+    """Подпись карточки чека: данные ученика и время отправки"""
+    user_data = receipt_data['user_data']
+    try:
+        sent_at = datetime.fromisoformat(receipt_data['timestamp']).strftime('%H:%M %d.%m.%Y')
+    except (KeyError, ValueError):
+        sent_at = 'Неизвестно'
+    return (
+        f"{title}\n\n"
         f"👤 **ФИО:** {user_data['full_name']}\n"
         f"🏙 **Город:** {user_data['city']}\n"
         f"📚 **Уровень:** {user_data['level']}\n"
         f"📅 **Дата:** {user_data['date']}\n"
         f"🆔 **User ID:** {user_data['user_id']}\n"
         f"👤 **Username:** @{user_data.get('username', 'не указан')}\n"
-        f"⏰ **Время отправки:** {datetime.now().strftime('%H:%M %d.%m.%Y')}\n\n"
-        "👇 **Чек ниже** 👇"
+        f"⏰ **Время отправки:** {sent_at}"
     )
-    
-    for admin_id in ADMIN_IDS:
-        try:
-            # Отправляем информацию о пользователе
-            admin_message = await message.bot.send_message(admin_id, receipt_info)
-            
-            # Пересылаем сам чек (фото/документ)
-            if message.content_type == ContentType.PHOTO:
-                photo = message.photo[-1]
-                await message.bot.send_photo(admin_id, photo.file_id)
-            elif message.content_type == ContentType.DOCUMENT:
-                await message.bot.send_document(admin_id, message.document.file_id)
-                
-            # Кнопки для администратора с явным указанием user_id
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(
-                    text="✅ Подтвердить оплату", 
-                    callback_data=f"confirm_payment_{user_data['user_id']}"
-                )],
-                [InlineKeyboardButton(
-                    text="❌ Отклонить", 
-                    callback_data=f"reject_payment_{user_data['user_id']}"
-                )],
-                [InlineKeyboardButton(
-                    text="📋 Все ожидающие чеки", 
-                    callback_data="show_pending_receipts"
-                )]
-            ])
-            
-            await message.bot.send_message(
-                admin_id, 
-                f"💬 Действие для чека пользователя {user_data['full_name']}:",
-                reply_markup=keyboard
-            )
-            
-        except Exception as e:
-            logger.error(f"Error sending receipt to admin {admin_id}: {e}")
 
-# Добавляем хендлер для просмотра всех ожидающих чеков
-@router.callback_query(lambda c: c.data == 'show_pending_receipts')
-async def show_pending_receipts(callback: CallbackQuery):
-    """Показывает все чеки, ожидающие проверки"""
+def decided_caption(receipt_data: dict, decision: dict) -> str:
+    """Подпись карточки после решения: кнопок больше нет, видно, кто и когда решил"""
+    status = "✅ Оплата подтверждена" if decision['action'] == 'confirmed' else "❌ Оплата отклонена"
+    return (
+        f"{receipt_caption(receipt_data, '🧾 **ЧЕК ПРОВЕРЕН**')}\n\n"
+        f"{status}: {decision.get('admin_name', '')}, {decision.get('at', '')}"
+    )
+
+def receipt_keyboard(user_id: int, receipt_id: int) -> InlineKeyboardMarkup:
+    """Кнопки карточки с явным указанием user_id и id чека"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(
+            text="✅ Подтвердить оплату", 
+            callback_data=encode(CONFIRM_RECEIPT, user_id, receipt_id)
+        )],
+        [InlineKeyboardButton(
+            text="❌ Отклонить", 
+            callback_data=encode(REJECT_RECEIPT, user_id, receipt_id)
+        )],
+        [InlineKeyboardButton(
+            text="📋 Все ожидающие чеки", 
+            callback_data=encode(PENDING_RECEIPTS)
+        )]
+    ])
+
+async def edit_receipt_card(bot, card: Tuple[int, int], caption: str):
+    """Переводит карточку в итоговое состояние: новая подпись без кнопок"""
+    chat_id, message_id = card
     try:
-        pending_receipts = TemporaryStorage.get_all_pending_receipts()
-        
-        if not pending_receipts:
-            await callback.message.answer("📭 Нет чеков, ожидающих проверки.")
-            await callback.answer()
-            return
-        
-        response = "📋 **Чеки, ожидающие проверки:**\n\n"
-        
-        for user_id, receipt_data in pending_receipts.items():
-            user_data = receipt_data.get('user_data', {})
-            response += (
-                f"👤 {user_data.get('full_name', 'Неизвестно')} "
-                f"(ID: {user_id})\n"
-                f"📚 {user_data.get('level', 'Неизвестно')} • "
-                f"📅 {user_data.get('date', 'Неизвестно')}\n"
-                f"⏰ {receipt_data.get('timestamp', 'Неизвестно')}\n"
-            )
-            
-            # Кнопки для быстрого действия
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(
-                    text=f"🔍 Проверить {user_data.get('full_name', 'Unknown')}",
-                    callback_data=f"review_receipt_{user_id}"
-                )]
-            ])
-            
-            await callback.message.answer(response, reply_markup=keyboard)
-            response = ""  # Сбрасываем для следующего сообщения
-        
-        await callback.answer()
-        
-    except Exception as e:
-        logger.error(f"Error showing pending receipts: {e}")
-        await callback.answer("❌ Ошибка при загрузке списка чеков")
+        await bot.edit_message_caption(chat_id=chat_id, message_id=message_id, caption=caption, reply_markup=None)
+    except TelegramBadRequest as e:
+        # Карточку уже обновили (двойной вызов) или администратор ее удалил
+        if 'message is not modified' not in str(e):
+            raise
+
+async def send_receipt_card(bot, admin_id: int, receipt_data: dict, title: str = "🧾 **НОВЫЙ ЧЕК ДЛЯ ПРОВЕРКИ**") -> Message:
+    """Одно сообщение на администратора: чек с подписью и кнопками"""
+    user_id = receipt_data['user_data']['user_id']
+    receipt_id = receipt_data['message_id']
+    caption = receipt_caption(receipt_data, title)
+    keyboard = receipt_keyboard(user_id, receipt_id)
+    if receipt_data['content_type'] == ContentType.DOCUMENT:
+        card = await bot.send_document(admin_id, receipt_data['file_id'], caption=caption, reply_markup=keyboard)
+    else:
+        card = await bot.send_photo(admin_id, receipt_data['file_id'], caption=caption, reply_markup=keyboard)
+    
+    TemporaryStorage.add_receipt_card(user_id, receipt_id, admin_id, card.message_id)
+    # Решение могли принять, пока карточка отправлялась: тот, кто решал,
+    # ее еще не видел, поэтому она обновляется здесь
+    decision = TemporaryStorage.get_receipt_decision(user_id, receipt_id)
+    if decision:
+        await edit_receipt_card(bot, (admin_id, card.message_id), decided_caption(receipt_data, decision))
+    return card
+
+async def send_receipt_to_admins(bot, receipt_data: dict):
+    """Отправляет карточку чека всем администраторам параллельно"""
+    await fan_out(ADMIN_IDS, lambda admin_id: send_receipt_card(bot, admin_id, receipt_data))
+
+async def sync_receipt_cards(callback: CallbackQuery, user_id: int, receipt_data: dict, decision: dict):
+    """Обновляет карточки чека у всех администраторов одновременно"""
+    started = time.monotonic()
+    receipt_id = receipt_data['message_id']
+    caption = decided_caption(receipt_data, decision)
+    cards = TemporaryStorage.get_receipt_cards(user_id, receipt_id)
+    
+    clicked = (callback.message.chat.id, callback.message.message_id)
+    if clicked not in cards and callback.message.text is not None:
+        # Нажали кнопку в текстовом сообщении прежнего формата
+        await callback.message.edit_text(caption)
+    elif clicked not in cards:
+        cards.append(clicked)
+    
+    results = await fan_out(cards, lambda card: edit_receipt_card(callback.bot, card, caption))
+    metrics.observe('receipt_cards_sync_seconds', time.monotonic() - started)
+    metrics.inc('receipt_card_edits_total', len(results))
 
 # Хендлер для быстрого перехода к проверке чека
-@router.callback_query(lambda c: c.data.startswith('review_receipt_'))
-async def review_receipt(callback: CallbackQuery):
+@callbacks(REVIEW_RECEIPT)
+async def review_receipt(callback: CallbackQuery, payload: CallbackPayload):
     """Быстрый переход к проверке конкретного чека"""
     try:
-        user_id = int(callback.data.split('_')[-1])
+        user_id = payload.int_arg(0)
         receipt_data = TemporaryStorage.get_pending_receipt(user_id)
         
         if not receipt_data:
             await callback.answer("❌ Чек не найден или уже обработан")
             return
         
-        user_data = receipt_data.get('user_data', {})
-        
-        # Повторно отправляем информацию о чеке
-        receipt_info = (
-            "🔍 **ПРОВЕРКА ЧЕКА**\n\n"
-            f"👤 **ФИО:** {user_data['full_name']}\n"
-            f"🏙 **Город:** {user_data['city']}\n"
-            f"📚 **Уровень:** {user_data['level']}\n"
-            f"📅 **Дата:** {user_data['date']}\n"
-            f"⏰ **Время отправки:** {receipt_data.get('timestamp', 'Неизвестно')}\n\n"
-            "Выберите действие:"
-        )
-        
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(
-                text="✅ Подтвердить оплату", 
-                callback_data=f"confirm_payment_{user_id}"
-            )],
-            [InlineKeyboardButton(
-                text="❌ Отклонить", 
-                callback_data=f"reject_payment_{user_id}"
-            )],
-            [InlineKeyboardButton(
-                text="📋 Все чеки", 
-                callback_data="show_pending_receipts"
-            )]
-        ])
-        
-        await callback.message.answer(receipt_info, reply_markup=keyboard)
+        # Повторно отправляем карточку чека; после решения она обновится вместе с остальными
+        await send_receipt_card(callback.bot, callback.from_user.id, receipt_data, "🔍 **ПРОВЕРКА ЧЕКА**")
         await callback.answer()
         
     except Exception as e:
         logger.error(f"Error reviewing receipt: {e}")
         await callback.answer("❌ Ошибка при загрузке чека")
 
-@router.callback_query(lambda c: c.data.startswith('confirm_payment_'))
-async def confirm_payment(callback: CallbackQuery):
-    """Администратор подтверждает оплату"""
-    try:
-        user_id = int(callback.data.split('_')[-1])
+async def answer_duplicate_decision(callback: CallbackQuery, decision: dict, action: str, started: float):
+    """Мгновенный ответ на повторное нажатие по уже обработанному чеку"""
+    await callback.answer(
+        f"ℹ️ Чек уже {DECISION_TEXT[decision['action']]}: "
+        f"{decision.get('admin_name', '')}, {decision.get('at', '')}",
+        show_alert=True
+    )
+    # Сколько стоил проигравший вызов
+    metrics.inc('receipt_duplicate_callbacks_total', action=action)
+    metrics.observe('receipt_duplicate_seconds', time.monotonic() - started, action=action)
+
+def new_decision(admin: User, action: str) -> dict:
+    return {
+        'action': action,
+        'admin_id': admin.id,
+        'admin_name': admin.full_name,
+        'at': datetime.now().strftime('%H:%M %d.%m.%Y')
+    }
+
+async def take_receipt(user_id: int, receipt_id: Optional[int], decision: dict) -> Tuple[dict, dict]:
+    """Атомарно забирает чек под решение decision.
+
+    Возвращает (данные чека, {}), если чек забран этим вызовом, или
+    ({}, решение, принятое раньше). ({}, {}) - чека нет или он заменен новым.
+    """
+    async with receipt_locks.lock(user_id):
+        if receipt_id is not None:
+            existing = TemporaryStorage.get_receipt_decision(user_id, receipt_id)
+            if existing:
+                return {}, existing
+        
         receipt_data = TemporaryStorage.get_pending_receipt(user_id)
+        if not receipt_data or (receipt_id is not None and receipt_data.get('message_id') != receipt_id):
+            return {}, {}
         
-        if not receipt_data:
-            await callback.answer("❌ Чек не найден или уже обработан")
+        # Запись решения атомарна и для нескольких реплик бота
+        existing = TemporaryStorage.claim_receipt_decision(user_id, receipt_data['message_id'], decision)
+        if existing:
+            return {}, existing
+        
+        return TemporaryStorage.pop_pending_receipt(user_id), {}
+
+async def claim_receipt(callback: CallbackQuery, payload: CallbackPayload, action: str):
+    """Забирает чек для решения администратора.
+
+    Возвращает (user_id, данные чека, решение) или None, если чек уже обработан -
+    в этом случае администратору уже ответили, без запросов к Sheets
+    и без сообщений пользователю.
+    """
+    started = time.monotonic()
+    user_id, receipt_id = receipt_ref(payload)
+    decision = new_decision(callback.from_user, action)
+    
+    receipt_data, existing = await take_receipt(user_id, receipt_id, decision)
+    if existing:
+        await answer_duplicate_decision(callback, existing, action, started)
+        return None
+    if not receipt_data:
+        await callback.answer("❌ Чек не найден или уже обработан")
+        return None
+    
+    return user_id, receipt_data, decision
+
+@callbacks(CONFIRM_RECEIPT)
+async def confirm_payment(callback: CallbackQuery, payload: CallbackPayload, sheets_manager: AsyncSheetsManager,
+                          student_queue: StudentWriteQueue, group_manager: GroupManager):
+    """Администратор подтверждает оплату"""
+    try:
+        # При двойном нажатии или одновременном нажатии двух администраторов
+        # обработку продолжит только один вызов
+        claimed = await claim_receipt(callback, payload, 'confirmed')
+        if claimed is None:
             return
         
+        user_id, receipt_data, decision = claimed
         user_data = receipt_data.get('user_data', {})
         
         if not user_data:
@@ -286,22 +345,20 @@ async def confirm_payment(callback: CallbackQuery):
         user_data['verified_at'] = datetime.now().isoformat()
         
         TemporaryStorage.save_user_data(user_id, user_data)
-        TemporaryStorage.remove_pending_receipt(user_id)  # Удаляем из ожидающих
         
-        # Сохраняем в Google Sheets
-        sheets_manager = GoogleSheetsManager(GOOGLE_SHEETS_CREDENTIALS, SHEET_URL)
-        sheets_manager.save_user_data(user_data)
+        # Ставим в очередь записи в Google Sheets
+        student_queue.enqueue(user_data)
         
-        # Добавляем в группу
-        group_manager = GroupManager(callback.bot, ADMIN_IDS)
-        group_info = sheets_manager.get_group_info_for_date(user_data['level'], user_data['date'])
+        # Добавляем в группу: ссылка из реестра групп, таблица - только если группы там нет
+        group = (user_data['level'], user_data['date'])
+        group_links = await group_manager.resolve_group_links([group], sheets_manager)
         
         group_result = await group_manager.add_user_to_group(
             level=user_data['level'],
             date=user_data['date'],
             user_id=user_id,
             user_data=user_data,
-            group_link=group_info.get('group_link') if group_info.get('group_exists') else None
+            group_link=group_links[group]
         )
         
         # Уведомляем пользователя
@@ -311,11 +368,8 @@ async def confirm_payment(callback: CallbackQuery):
             "Спасибо за регистрацию! 🎉"
         )
         
-        # Уведомляем администратора об успешном завершении
-        await callback.message.edit_text(
-            f"✅ Оплата подтверждена для пользователя {user_data['full_name']}\n"
-            f"👤 Пользователь уведомлен, данные сохранены."
-        )
+        # Карточки чека у всех администраторов показывают итоговое решение
+        await sync_receipt_cards(callback, user_id, receipt_data, decision)
         
         await callback.answer()
         
@@ -323,19 +377,103 @@ async def confirm_payment(callback: CallbackQuery):
         logger.error(f"Error confirming payment: {e}")
         await callback.answer("❌ Ошибка при подтверждении оплаты")
 
-@router.callback_query(lambda c: c.data.startswith('reject_payment_'))
-async def reject_payment(callback: CallbackQuery):
+def confirmation_text(user_data: dict, group_link: Optional[str]) -> str:
+    """Одно сообщение ученику при массовом подтверждении: оплата и группа"""
+    text = (
+        f"✅ Ваша оплата подтверждена администратором!\n\n"
+        f"📚 Уровень: {user_data['level']}\n"
+        f"📅 Дата: {user_data['date']}\n\n"
+    )
+    if group_link:
+        text += f"Присоединяйтесь к учебной группе по ссылке:\n{group_link}\n\n"
+    else:
+        text += "Группа будет создана в ближайшее время. Администратор свяжется с вами для добавления в учебную группу.\n\n"
+    return text + "Спасибо за регистрацию! 🎉"
+
+async def confirm_receipts(bot, admin: User, refs: List[Tuple[int, int]], sheets_manager: AsyncSheetsManager,
+                           student_queue: StudentWriteQueue, group_manager: GroupManager) -> List[dict]:
+    """Подтверждает несколько чеков (user_id, id чека) за один раз.
+
+    Ученики уходят в таблицу пачками write-behind (одной, если очередь
+    пуста и чеков не больше max_batch), ссылки на группы берутся из
+    реестра групп или одного снимка расписания. Ученики, администраторы
+    и карточки чеков получают сообщения параллельно в пределах лимитов
+    Telegram. Возвращает результат по каждому чеку в порядке refs.
+    """
+    started = time.monotonic()
+    decision = new_decision(admin, 'confirmed')
+    results = []
+    confirmed = []
+    row_keys = {}  # user_id -> ключ строки ученика в локальной базе
+    for user_id, receipt_id in refs:
+        receipt_data, existing = await take_receipt(user_id, receipt_id, decision)
+        user_data = receipt_data.get('user_data', {})
+        result = {'user_id': user_id, 'name': user_data.get('full_name', '')}
+        if existing:
+            result.update(status='duplicate', decision=existing)
+        elif not user_data:
+            result['status'] = 'not_found'
+        else:
+            user_data['payment_status'] = 'confirmed'
+            user_data['verified_by'] = admin.id
+            user_data['verified_at'] = datetime.now().isoformat()
+            TemporaryStorage.save_user_data(user_id, user_data)
+            result.update(status='confirmed', queued=student_queue.enqueue(user_data))
+            if result['queued']:
+                row_keys[user_id] = student_queue.row_key(user_data)
+            confirmed.append((result, receipt_data))
+        results.append(result)
+    
+    if confirmed:
+        group_links = await group_manager.resolve_group_links(
+            list({(receipt_data['user_data']['level'], receipt_data['user_data']['date']) for _, receipt_data in confirmed}),
+            sheets_manager
+        )
+        
+        for result, receipt_data in confirmed:
+            user_data = receipt_data['user_data']
+            result['group_link'] = group_links[(user_data['level'], user_data['date'])]
+        
+        async def notify(i: int):
+            result, receipt_data = confirmed[i]
+            await bot.send_message(result['user_id'], confirmation_text(receipt_data['user_data'], result['group_link']))
+        
+        async def notify_admins(i: int):
+            # Как при подтверждении одного чека: о новом ученике или о том, что нужна группа
+            result, receipt_data = confirmed[i]
+            user_data = receipt_data['user_data']
+            await group_manager.notify_admins_about_new_user(
+                user_data['level'], user_data['date'], user_data, has_link=bool(result['group_link'])
+            )
+        
+        cards = [(card, decided_caption(receipt_data, decision))
+                 for result, receipt_data in confirmed
+                 for card in TemporaryStorage.get_receipt_cards(result['user_id'], receipt_data['message_id'])]
+        unwritten, notified, _, _ = await asyncio.gather(
+            # Строки всех учеников уже в базе - отправляются пачками, пока не уйдут все
+            student_queue.flush_rows(row_keys.values()),
+            fan_out(range(len(confirmed)), notify),
+            fan_out(range(len(confirmed)), notify_admins),
+            fan_out(range(len(cards)), lambda i: edit_receipt_card(bot, *cards[i]))
+        )
+        for i, (result, _) in enumerate(confirmed):
+            result['notified'] = not isinstance(notified[i], Exception)
+            result['written'] = result['user_id'] in row_keys and row_keys[result['user_id']] not in unwritten
+    
+    for result in results:
+        metrics.inc('bulk_confirm_receipts_total', status=result['status'])
+    metrics.observe('bulk_confirm_seconds', time.monotonic() - started)
+    return results
+
+@callbacks(REJECT_RECEIPT)
+async def reject_payment(callback: CallbackQuery, payload: CallbackPayload):
     """Администратор отклоняет оплату"""
     try:
-        user_id = int(callback.data.split('_')[-1])
-        receipt_data = TemporaryStorage.get_pending_receipt(user_id)
-        
-        if not receipt_data:
-            await callback.answer("❌ Чек не найден или уже обработан")
+        claimed = await claim_receipt(callback, payload, 'rejected')
+        if claimed is None:
             return
         
-        user_data = receipt_data.get('user_data', {})
-        TemporaryStorage.remove_pending_receipt(user_id)  # Удаляем из ожидающих
+        user_id, receipt_data, decision = claimed
         
         # Уведомляем пользователя
         await callback.bot.send_message(
@@ -344,10 +482,7 @@ async def reject_payment(callback: CallbackQuery):
             "Пожалуйста, свяжитесь с администратором для уточнения деталей или отправьте корректный чек."
         )
         
-        await callback.message.edit_text(
-            f"❌ Оплата отклонена для пользователя {user_data['full_name']}\n"
-            f"👤 Пользователь уведомлен об отклонении."
-        )
+        await sync_receipt_cards(callback, user_id, receipt_data, decision)
         
         await callback.answer()
         
@@ -0,0 +1,316 @@
+from aiogram import Router
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.exceptions import TelegramBadRequest
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import ADMIN_IDS, LEVELS
+from data.temporary_storage import TemporaryStorage
+from handlers.callback_dispatcher import CallbackHandlers
+from handlers.payment_handlers import DECISION_TEXT, confirm_receipts
+from keyboards.callbacks import (
+    INBOX_CONFIRM, INBOX_FILTER, INBOX_PAGE, INBOX_SELECT, PENDING_RECEIPTS, REVIEW_RECEIPT,
+    CallbackPayload, encode, inbox_callback, inbox_confirm_callback, inbox_filter_callback,
+    inbox_select_callback, level_key, resolve_date
+)
+from services.async_sheets import AsyncSheetsManager
+from services.group_manager import GroupManager
+from services.write_behind import StudentWriteQueue
+
+router = Router()
+callbacks = CallbackHandlers()
+logger = logging.getLogger(__name__)
+
+INBOX_PAGE_SIZE = 8
+INBOX_FILTER_LIMIT = 30  # кнопок с датами в выборе фильтра
+# Сколько чеков можно подтвердить за раз: столько учеников таблица примет одной пачкой
+BULK_CONFIRM_LIMIT = 50
+# Отмеченные чеки [[user_id, id чека], ...] хранятся в данных FSM администратора
+SELECTED_KEY = 'inbox_selected'
+
+# Список ожидающих чеков - одно сообщение у администратора. Листание и
+# фильтры редактируют его на месте, страница берется из индекса хранилища
+# срезом, без перебора всех чеков.
+
+def _sent_at(receipt_data: dict) -> str:
+    try:
+        return datetime.fromisoformat(receipt_data['timestamp']).strftime('%H:%M %d.%m')
+    except (KeyError, ValueError):
+        return 'Неизвестно'
+
+def _date_order(date: str):
+    try:
+        return 0, datetime.strptime(date, '%d.%m.%Y')
+    except ValueError:
+        return 1, date
+
+def inbox_view(payload: CallbackPayload, start: int) -> Tuple[int, Optional[str], Optional[str]]:
+    """Страница, уровень и дата из аргументов кнопки списка, начиная с start;
+    None - фильтра нет"""
+    page = payload.int_arg(start) or 0
+    level = LEVELS.get(level_key(payload.arg(start + 1)))
+    date_key = payload.arg(start + 2)
+    date = None
+    if date_key:
+        date = resolve_date(date_key)
+        if date is None:
+            # Кнопка отправлена до перезапуска: дата ищется среди дат ожидающих чеков
+            date = resolve_date(date_key, list(TemporaryStorage.pending_receipt_facets()['date']))
+    return page, level, date
+
+async def get_selected(state: FSMContext) -> Dict[int, int]:
+    """Отмеченные чеки администратора: user_id -> id чека"""
+    return {user_id: receipt_id for user_id, receipt_id in (await state.get_data()).get(SELECTED_KEY, [])}
+
+def render_inbox(page: int, level: Optional[str] = None, date: Optional[str] = None,
+                 selected: Optional[Dict[int, int]] = None) -> Tuple[str, InlineKeyboardMarkup]:
+    """Текст и кнопки страницы списка чеков"""
+    page = max(0, page)
+    selected = selected or {}
+    entries, total = TemporaryStorage.list_pending_receipts(page * INBOX_PAGE_SIZE, INBOX_PAGE_SIZE, level, date)
+    pages = max(1, -(-total // INBOX_PAGE_SIZE))
+    if page >= pages:
+        # Пока список был открыт, чеки проверили и страниц стало меньше
+        page = pages - 1
+        entries, total = TemporaryStorage.list_pending_receipts(page * INBOX_PAGE_SIZE, INBOX_PAGE_SIZE, level, date)
+
+    filters = ', '.join(value for value in (level, date) if value)
+    if not entries:
+        text = "📭 Нет чеков, ожидающих проверки."
+        if filters:
+            text += f"\nФильтр: {filters}"
+    else:
+        text = f"📋 **Чеки, ожидающие проверки:** {total}\n"
+        if filters:
+            text += f"Фильтр: {filters}\n"
+        if selected:
+            text += f"Отмечено: {len(selected)}\n"
+        text += "\n"
+
+    rows = []
+    for number, (user_id, receipt_data) in enumerate(entries, page * INBOX_PAGE_SIZE + 1):
+        user_data = receipt_data.get('user_data', {})
+        full_name = user_data.get('full_name', 'Неизвестно')
+        text += (
+            f"{number}. 👤 {full_name} (ID: {user_id})\n"
+            f"📚 {user_data.get('level', 'Неизвестно')} • "
+            f"📅 {user_data.get('date', 'Неизвестно')} • "
+            f"⏰ {_sent_at(receipt_data)}\n"
+        )
+        rows.append([
+            InlineKeyboardButton(text=f"🔍 {number}. {full_name}", callback_data=encode(REVIEW_RECEIPT, user_id)),
+            InlineKeyboardButton(text="☑️" if user_id in selected else "⬜",
+                                 callback_data=inbox_select_callback(user_id, page, level, date)),
+        ])
+
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton(text="◀️", callback_data=inbox_callback(page - 1, level, date)))
+    navigation.append(InlineKeyboardButton(text=f"🔄 {page + 1}/{pages}", callback_data=inbox_callback(page, level, date)))
+    if page < pages - 1:
+        navigation.append(InlineKeyboardButton(text="▶️", callback_data=inbox_callback(page + 1, level, date)))
+    rows.append(navigation)
+
+    filter_row = [
+        InlineKeyboardButton(text=f"📚 {level or 'Уровень'}", callback_data=inbox_filter_callback('level', level, date)),
+        InlineKeyboardButton(text=f"📅 {date or 'Дата'}", callback_data=inbox_filter_callback('date', level, date)),
+    ]
+    if filters:
+        filter_row.append(InlineKeyboardButton(text="✖️ Сбросить", callback_data=inbox_callback(0)))
+    rows.append(filter_row)
+
+    if entries or selected:
+        selection_row = [InlineKeyboardButton(text="☑️ Вся страница",
+                                              callback_data=inbox_select_callback('*', page, level, date))]
+        if selected:
+            selection_row.append(InlineKeyboardButton(text="✖️ Снять отметки",
+                                                      callback_data=inbox_select_callback('', page, level, date)))
+            rows.append(selection_row)
+            rows.append([InlineKeyboardButton(text=f"✅ Подтвердить отмеченные ({len(selected)})",
+                                              callback_data=inbox_confirm_callback(page, level, date))])
+        else:
+            rows.append(selection_row)
+    return text, InlineKeyboardMarkup(inline_keyboard=rows)
+
+def bulk_report(results: List[dict]) -> str:
+    """Итог массового подтверждения по каждому чеку"""
+    confirmed = [result for result in results if result['status'] == 'confirmed']
+    text = f"✅ **Подтверждено:** {len(confirmed)} из {len(results)}\n"
+    if confirmed:
+        written = all(result['written'] for result in confirmed)
+        text += "📤 Ученики записаны в таблицу\n" if written else "📤 Ученики сохранены, запись в таблицу будет повторена\n"
+    text += "\n"
+    for result in results:
+        name = f"{result['name']} (ID: {result['user_id']})" if result['name'] else f"ID: {result['user_id']}"
+        if result['status'] == 'duplicate':
+            decision = result['decision']
+            text += f"ℹ️ {name} — уже {DECISION_TEXT[decision['action']]}: {decision.get('admin_name', '')}\n"
+        elif result['status'] == 'not_found':
+            text += f"❌ {name} — чек не найден или заменен новым\n"
+        elif not result['notified']:
+            text += f"⚠️ {name} — подтвержден, сообщение ученику не доставлено\n"
+        elif not result['group_link']:
+            text += f"⚠️ {name} — подтвержден, ссылки на группу нет\n"
+        else:
+            text += f"✅ {name} — ссылка на группу отправлена\n"
+    return text
+
+def filter_keyboard(field: str, level: Optional[str], date: Optional[str]) -> InlineKeyboardMarkup:
+    """Выбор уровня или даты: значения с числом ожидающих чеков"""
+    counts = TemporaryStorage.pending_receipt_facets()[field]
+    if field == 'level':
+        values = sorted(counts)
+        buttons = [InlineKeyboardButton(text=f"{value} ({counts[value]})", callback_data=inbox_callback(0, value, date))
+                   for value in values]
+        reset = inbox_callback(0, None, date)
+    else:
+        values = sorted(counts, key=_date_order)[:INBOX_FILTER_LIMIT]
+        buttons = [InlineKeyboardButton(text=f"{value} ({counts[value]})", callback_data=inbox_callback(0, level, value))
+                   for value in values]
+        reset = inbox_callback(0, level, None)
+
+    rows = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+    rows.append([
+        InlineKeyboardButton(text="Все", callback_data=reset),
+        InlineKeyboardButton(text="◀️ Назад", callback_data=inbox_callback(0, level, date)),
+    ])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+async def _edit_inbox(callback: CallbackQuery, text: Optional[str], keyboard: InlineKeyboardMarkup):
+    """Один запрос к Telegram: правка текста и кнопок или только кнопок"""
+    try:
+        if text is None:
+            await callback.message.edit_reply_markup(reply_markup=keyboard)
+        else:
+            await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        # Нажали 🔄, а список не изменился
+        if 'message is not modified' not in str(e):
+            raise
+
+@router.message(Command('receipts'))
+async def cmd_receipts(message: Message, state: FSMContext):
+    """Список ожидающих чеков одним сообщением"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+
+    try:
+        text, keyboard = render_inbox(0, selected=await get_selected(state))
+        await message.answer(text, reply_markup=keyboard)
+    except Exception as e:
+        logger.error(f"Error showing receipt inbox: {e}")
+        await message.answer("❌ Ошибка при загрузке списка чеков")
+
+@callbacks(PENDING_RECEIPTS)
+async def show_pending_receipts(callback: CallbackQuery, state: FSMContext):
+    """Кнопка из карточки чека: карточка - фото, поэтому список приходит новым сообщением"""
+    if callback.from_user.id not in ADMIN_IDS:
+        await callback.answer()
+        return
+
+    try:
+        text, keyboard = render_inbox(0, selected=await get_selected(state))
+        await callback.message.answer(text, reply_markup=keyboard)
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Error showing pending receipts: {e}")
+        await callback.answer("❌ Ошибка при загрузке списка чеков")
+
+@callbacks(INBOX_PAGE)
+async def show_inbox_page(callback: CallbackQuery, payload: CallbackPayload, state: FSMContext):
+    """Листание и фильтры: сообщение со списком редактируется на месте"""
+    if callback.from_user.id not in ADMIN_IDS:
+        await callback.answer()
+        return
+
+    try:
+        page, level, date = inbox_view(payload, 0)
+        text, keyboard = render_inbox(page, level, date, await get_selected(state))
+        await _edit_inbox(callback, text, keyboard)
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Error showing receipt inbox page: {e}")
+        await callback.answer("❌ Ошибка при загрузке списка чеков")
+
+@callbacks(INBOX_FILTER)
+async def show_inbox_filter(callback: CallbackQuery, payload: CallbackPayload):
+    """Выбор значения фильтра: меняются только кнопки списка"""
+    if callback.from_user.id not in ADMIN_IDS:
+        await callback.answer()
+        return
+
+    try:
+        field = 'level' if payload.arg(0) == 'l' else 'date'
+        _, level, date = inbox_view(payload, 1)
+        await _edit_inbox(callback, None, filter_keyboard(field, level, date))
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Error showing receipt inbox filter: {e}")
+        await callback.answer("❌ Ошибка при загрузке списка чеков")
+
+@callbacks(INBOX_SELECT)
+async def toggle_inbox_selection(callback: CallbackQuery, payload: CallbackPayload, state: FSMContext):
+    """Отметка чеков для массового подтверждения"""
+    if callback.from_user.id not in ADMIN_IDS:
+        await callback.answer()
+        return
+
+    try:
+        target = payload.arg(0)
+        page, level, date = inbox_view(payload, 1)
+        selected = await get_selected(state)
+        if not target:
+            selected.clear()
+        elif target == '*':
+            entries, _ = TemporaryStorage.list_pending_receipts(page * INBOX_PAGE_SIZE, INBOX_PAGE_SIZE, level, date)
+            selected.update((user_id, receipt_data['message_id']) for user_id, receipt_data in entries)
+        elif int(target) in selected:
+            del selected[int(target)]
+        else:
+            receipt_data = TemporaryStorage.get_pending_receipt(int(target))
+            if receipt_data:
+                selected[int(target)] = receipt_data['message_id']
+
+        if len(selected) > BULK_CONFIRM_LIMIT:
+            await callback.answer(f"Можно отметить не больше {BULK_CONFIRM_LIMIT} чеков", show_alert=True)
+            return
+
+        await state.update_data({SELECTED_KEY: [[user_id, receipt_id] for user_id, receipt_id in selected.items()]})
+        text, keyboard = render_inbox(page, level, date, selected)
+        await _edit_inbox(callback, text, keyboard)
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Error selecting receipts: {e}")
+        await callback.answer("❌ Ошибка при загрузке списка чеков")
+
+@callbacks(INBOX_CONFIRM)
+async def confirm_selected_receipts(callback: CallbackQuery, payload: CallbackPayload, state: FSMContext,
+                                    sheets_manager: AsyncSheetsManager, student_queue: StudentWriteQueue,
+                                    group_manager: GroupManager):
+    """Массовое подтверждение отмеченных чеков; сообщение со списком заменяется отчетом"""
+    if callback.from_user.id not in ADMIN_IDS:
+        await callback.answer()
+        return
+
+    selected = await get_selected(state)
+    if not selected:
+        await callback.answer("Нет отмеченных чеков")
+        return
+
+    # Отметки снимаются сразу: повторное нажатие не подтвердит те же чеки еще раз
+    await state.update_data({SELECTED_KEY: []})
+    await callback.answer(f"⏳ Подтверждаю {len(selected)}...")
+    page, level, date = inbox_view(payload, 0)
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="📋 К списку чеков", callback_data=inbox_callback(page, level, date))
+    ]])
+    try:
+        results = await confirm_receipts(callback.bot, callback.from_user, list(selected.items()),
+                                         sheets_manager, student_queue, group_manager)
+        await _edit_inbox(callback, bulk_report(results), keyboard)
+    except Exception as e:
+        logger.error(f"Error confirming selected receipts: {e}")
+        await callback.message.answer("❌ Ошибка при подтверждении оплаты", reply_markup=keyboard)
@@ -0,0 +1,191 @@
+"""Компактный формат callback_data: '<код операции>:<аргумент>:...'.
+
+Уровни передаются номером в LEVELS, даты - коротким хешем строки даты,
+поэтому кнопка укладывается в 64 байта при любой дате в таблице.
+Кнопки старого формата ('level_basic', 'confirm_payment_1_2' и т.д.)
+остаются в уже отправленных сообщениях и разбираются в тот же вид.
+"""
+import zlib
+from typing import NamedTuple, Optional, Tuple
+
+from config import LEVELS
+
+MAX_CALLBACK_DATA = 64  # байт, ограничение Telegram
+SEP = ':'
+
+# Коды операций
+LEVEL = 'l'
+DATE = 'd'
+BACK_TO_LEVELS = 'bl'
+BACK_TO_DATES = 'bd'
+MAKE_PAYMENT = 'mp'
+START_PAYMENT = 'sp'
+RECEIPT_SENT = 'rs'
+CANCEL_PAYMENT = 'cp'
+CONFIRM_RECEIPT = 'ok'
+REJECT_RECEIPT = 'rj'
+REVIEW_RECEIPT = 'rv'
+PENDING_RECEIPTS = 'pr'
+INBOX_PAGE = 'ib'
+INBOX_FILTER = 'if'
+INBOX_SELECT = 'is'
+INBOX_CONFIRM = 'ic'
+
+OPS = frozenset((
+    LEVEL, DATE, BACK_TO_LEVELS, BACK_TO_DATES, MAKE_PAYMENT, START_PAYMENT,
+    RECEIPT_SENT, CANCEL_PAYMENT, CONFIRM_RECEIPT, REJECT_RECEIPT,
+    REVIEW_RECEIPT, PENDING_RECEIPTS, INBOX_PAGE, INBOX_FILTER, INBOX_SELECT, INBOX_CONFIRM
+))
+
+LEGACY_EXACT = {
+    'back_to_levels': BACK_TO_LEVELS,
+    'back_to_dates': BACK_TO_DATES,
+    'make_payment': MAKE_PAYMENT,
+    'start_payment': START_PAYMENT,
+    'receipt_sent': RECEIPT_SENT,
+    'cancel_payment': CANCEL_PAYMENT,
+    'show_pending_receipts': PENDING_RECEIPTS,
+}
+LEGACY_PREFIXES = (
+    ('level_', LEVEL),
+    ('date_', DATE),
+    ('confirm_payment_', CONFIRM_RECEIPT),
+    ('reject_payment_', REJECT_RECEIPT),
+    ('review_receipt_', REVIEW_RECEIPT),
+)
+
+DATE_IDS_LIMIT = 10000
+
+
+def _base36(number: int) -> str:
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    result = ''
+    while True:
+        number, rest = divmod(number, 36)
+        result = digits[rest] + result
+        if not number:
+            return result
+
+
+# Номер уровня в LEVELS <-> ключ уровня
+LEVEL_IDS = {key: _base36(i) for i, key in enumerate(LEVELS)}
+LEVEL_KEYS = {level_id: key for key, level_id in LEVEL_IDS.items()}
+
+# Хеш даты -> строка даты, заполняется при сборке клавиатур
+_dates = {}
+
+
+class CallbackPayload(NamedTuple):
+    op: str
+    args: Tuple[str, ...]
+
+    def arg(self, i: int) -> Optional[str]:
+        return self.args[i] if i < len(self.args) else None
+
+    def int_arg(self, i: int) -> Optional[int]:
+        value = self.arg(i)
+        return int(value) if value else None
+
+
+def encode(op: str, *args) -> str:
+    data = SEP.join((op, *map(str, args)))
+    if len(data.encode()) > MAX_CALLBACK_DATA:
+        raise ValueError(f"callback_data is longer than {MAX_CALLBACK_DATA} bytes: {data!r}")
+    return data
+
+
+def decode(data: Optional[str]) -> Optional[CallbackPayload]:
+    """Разбирает callback_data; None - кнопка не из этого бота"""
+    if not data:
+        return None
+    op, sep, rest = data.partition(SEP)
+    if op in OPS:
+        return CallbackPayload(op, tuple(rest.split(SEP)) if sep else ())
+    return _decode_legacy(data)
+
+
+def _decode_legacy(data: str) -> Optional[CallbackPayload]:
+    op = LEGACY_EXACT.get(data)
+    if op is not None:
+        return CallbackPayload(op, ())
+
+    for prefix, op in LEGACY_PREFIXES:
+        if data.startswith(prefix):
+            rest = data[len(prefix):]
+            if op == LEVEL:
+                return CallbackPayload(op, (LEVEL_IDS.get(rest, ''),))
+            if op == DATE:
+                return CallbackPayload(op, (intern_date(rest),))
+            return CallbackPayload(op, tuple(rest.split('_')))
+    return None
+
+
+def level_key(level_id: Optional[str]) -> Optional[str]:
+    return LEVEL_KEYS.get(level_id)
+
+
+def date_id(date: str) -> str:
+    return _base36(zlib.crc32(date.encode()))
+
+
+def intern_date(date: str) -> str:
+    """Запоминает дату под ее хешем и возвращает хеш"""
+    key = date_id(date)
+    if key not in _dates and len(_dates) >= DATE_IDS_LIMIT:
+        _dates.clear()
+    _dates[key] = date
+    return key
+
+
+def resolve_date(key: Optional[str], candidates: Optional[list] = None) -> Optional[str]:
+    """Дата по хешу. Если хеш не встречался в этом процессе (перезапуск,
+    другая реплика), дата ищется среди candidates - актуальных дат уровня.
+    """
+    date = _dates.get(key)
+    if date is None and candidates:
+        for candidate in candidates:
+            if date_id(candidate) == key:
+                intern_date(candidate)
+                return candidate
+    return date
+
+
+def level_callback(key: str) -> str:
+    return encode(LEVEL, LEVEL_IDS[key])
+
+
+def date_callback(date: str) -> str:
+    return encode(DATE, intern_date(date))
+
+
+def receipt_ref(payload: CallbackPayload) -> Tuple[int, Optional[int]]:
+    """user_id и id чека из кнопки администратора.
+
+    В кнопках, отправленных до появления id чека, его нет - тогда None.
+    """
+    return payload.int_arg(0), payload.int_arg(1)
+
+
+def _inbox_args(page: int, level: Optional[str], date: Optional[str]) -> tuple:
+    """Страница и фильтры списка чеков - последние три аргумента всех его кнопок.
+    level - название уровня, как в данных ученика; пустой аргумент - без фильтра"""
+    level_id = next((LEVEL_IDS[key] for key, title in LEVELS.items() if title == level), '') if level else ''
+    return page, level_id, intern_date(date) if date else ''
+
+
+def inbox_callback(page: int, level: Optional[str] = None, date: Optional[str] = None) -> str:
+    return encode(INBOX_PAGE, *_inbox_args(page, level, date))
+
+
+def inbox_filter_callback(field: str, level: Optional[str] = None, date: Optional[str] = None) -> str:
+    """Выбор значения фильтра field ('level' или 'date') при текущих фильтрах"""
+    return encode(INBOX_FILTER, field[0], *_inbox_args(0, level, date))
+
+
+def inbox_select_callback(target, page: int, level: Optional[str] = None, date: Optional[str] = None) -> str:
+    """Отметка чека для массового подтверждения: user_id, '*' - вся страница, '' - снять все"""
+    return encode(INBOX_SELECT, target, *_inbox_args(page, level, date))
+
+
+def inbox_confirm_callback(page: int, level: Optional[str] = None, date: Optional[str] = None) -> str:
+    return encode(INBOX_CONFIRM, *_inbox_args(page, level, date))
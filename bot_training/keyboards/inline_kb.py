@@ -1,31 +1,99 @@
+from typing import Optional
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from config import LEVELS
+from keyboards.callbacks import (
+    BACK_TO_DATES, BACK_TO_LEVELS, CANCEL_PAYMENT, CONFIRM_RECEIPT, MAKE_PAYMENT,
+    RECEIPT_SENT, REJECT_RECEIPT, START_PAYMENT, date_callback, encode, level_callback
+)
+from services.metrics import metrics
+
+
+class KeyboardCache:
+    """Готовые клавиатуры уровней и дат.
+
+    Клавиатура уровней строится один раз на версию LEVELS, клавиатура дат -
+    один раз на пару (уровень, версия снимка расписания). Новая версия
+    расписания сбрасывает весь кэш сразу. Клавиатуры после сборки
+    не изменяются, поэтому один объект отдается всем пользователям.
+    """
+
+    def __init__(self):
+        self.schedule_version = None
+        self._levels = {}  # версия LEVELS -> клавиатура
+        self._dates = {}   # (уровень, версия расписания) -> клавиатура
+
+    def invalidate(self):
+        self._levels.clear()
+        self._dates.clear()
+        metrics.inc('keyboard_cache_invalidations_total')
+
+    def _check_schedule_version(self, version: int):
+        if version != self.schedule_version:
+            if self.schedule_version is not None:
+                self.invalidate()
+            self.schedule_version = version
+
+    def levels(self) -> InlineKeyboardMarkup:
+        # Версия конфига - само содержимое LEVELS
+        config_version = tuple(LEVELS.items())
+        keyboard = self._levels.get(config_version)
+        if keyboard is None:
+            metrics.inc('keyboard_cache_misses_total', kind='levels')
+            keyboard = self._levels[config_version] = build_levels_keyboard()
+        else:
+            metrics.inc('keyboard_cache_hits_total', kind='levels')
+        return keyboard
+
+    def dates(self, level: str, dates: list, schedule_version: int) -> InlineKeyboardMarkup:
+        self._check_schedule_version(schedule_version)
+        key = (level, schedule_version)
+        keyboard = self._dates.get(key)
+        if keyboard is None:
+            metrics.inc('keyboard_cache_misses_total', kind='dates')
+            keyboard = self._dates[key] = build_dates_keyboard(dates)
+        else:
+            metrics.inc('keyboard_cache_hits_total', kind='dates')
+        return keyboard
+
+
+keyboard_cache = KeyboardCache()
+
 
 def get_levels_keyboard():
+    return keyboard_cache.levels()
+
+def get_dates_keyboard(dates: list, level: Optional[str] = None, schedule_version: Optional[int] = None):
+    """Клавиатура дат; без уровня и версии расписания собирается заново"""
+    if level is None or schedule_version is None:
+        return build_dates_keyboard(dates)
+    return keyboard_cache.dates(level, dates, schedule_version)
+
+def build_levels_keyboard():
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
     
     for key, value in LEVELS.items():
         button = InlineKeyboardButton(
             text=value,
-            callback_data=f"level_{key}"
+            callback_data=level_callback(key)
         )
         keyboard.inline_keyboard.append([button])  # Добавляем кнопку в новую строку
     
     return keyboard
 
-def get_dates_keyboard(dates: list):
+def build_dates_keyboard(dates: list):
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
     
     for date in dates:
         button = InlineKeyboardButton(
             text=date,
-            callback_data=f"date_{date}"
+            callback_data=date_callback(date)
         )
         keyboard.inline_keyboard.append([button])  # Добавляем кнопку в новую строку
     
     back_button = InlineKeyboardButton(
         text="◀️ Назад к уровням",
-        callback_data="back_to_levels"
+        callback_data=encode(BACK_TO_LEVELS)
     )
     keyboard.inline_keyboard.append([back_button])  # Добавляем кнопку "Назад"
     
@@ -36,11 +104,11 @@ def get_payment_keyboard():
     
     pay_button = InlineKeyboardButton(
         text="💳 Оплатить",
-        callback_data="make_payment"
+        callback_data=encode(MAKE_PAYMENT)
     )
     back_button = InlineKeyboardButton(
         text="◀️ Назад к датам",
-        callback_data="back_to_dates"
+        callback_data=encode(BACK_TO_DATES)
     )
     
     keyboard.inline_keyboard.append([pay_button])  # Добавляем кнопку "Оплатить"
@@ -54,11 +122,11 @@ def get_payment_confirmation_keyboard():
     
     pay_button = InlineKeyboardButton(
         text="💳 Перейти к оплате",
-        callback_data="start_payment"
+        callback_data=encode(START_PAYMENT)
     )
     back_button = InlineKeyboardButton(
         text="◀️ Назад к датам",
-        callback_data="back_to_dates"
+        callback_data=encode(BACK_TO_DATES)
     )
     
     keyboard.inline_keyboard.append([pay_button])
@@ -70,14 +138,14 @@ def get_payment_confirmation_keyboard():
 
 def get_receipt_confirmation_keyboard():
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="✅ Я отправил чек", callback_data="receipt_sent")],
-        [InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_payment")]
+        [InlineKeyboardButton(text="✅ Я отправил чек", callback_data=encode(RECEIPT_SENT))],
+        [InlineKeyboardButton(text="❌ Отмена", callback_data=encode(CANCEL_PAYMENT))]
     ])
     return keyboard
 
-def get_admin_payment_keyboard(user_id: int):
+def get_admin_payment_keyboard(user_id: int, receipt_id: int):
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="✅ Подтвердить оплату", callback_data=f"confirm_payment_{user_id}")],
-        [InlineKeyboardButton(text="❌ Отклонить", callback_data=f"reject_payment_{user_id}")]
+        [InlineKeyboardButton(text="✅ Подтвердить оплату", callback_data=encode(CONFIRM_RECEIPT, user_id, receipt_id))],
+        [InlineKeyboardButton(text="❌ Отклонить", callback_data=encode(REJECT_RECEIPT, user_id, receipt_id))]
     ])
     return keyboard
\ No newline at end of file
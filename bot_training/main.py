@@ -2,13 +2,71 @@ import asyncio
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import BOT_TOKEN, ADMIN_IDS, GOOGLE_SHEETS_CREDENTIALS, SHEET_URL
+from config import (
+    BOT_TOKEN, ADMIN_IDS, GOOGLE_SHEETS_CREDENTIALS, SHEET_URL, SCHEDULE_CACHE_TTL,
+    SHEETS_MAX_WORKERS, SHEETS_MAX_CONCURRENCY, SHEETS_CALL_TIMEOUT,
+    SHEETS_READ_QUOTA, SHEETS_WRITE_QUOTA, SHEETS_BREAKER_THRESHOLD, SHEETS_BREAKER_RESET,
+    SHEETS_BACKOFF_BASE, SHEETS_BACKOFF_MAX,
+    LOCAL_DB_PATH, MIRROR_PULL_INTERVAL, WRITE_BEHIND_INTERVAL_MS, WRITE_BEHIND_MAX_BATCH,
+    STORAGE_BACKEND, SQLITE_PATH, REDIS_URL, SESSION_IDLE_TTL, SESSION_MAX_ENTRIES,
+    TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST, TELEGRAM_MAX_RETRIES,
+    BOT_MODE, WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT,
+    METRICS_HOST, METRICS_PORT, RECEIPT_SLA_MINUTES
+)
+from data.backends import MemoryBackend, SQLiteBackend, RedisBackend
+from data.local_store import LocalStore
+from data.sqlite_fsm_storage import SQLiteStorage
+from data.temporary_storage import TemporaryStorage
 from handlers.start import router as start_router
 from handlers.registration import router as registration_router
-from handlers.level_selection import router as level_selection_router
-from handlers.date_selection import router as date_selection_router
-from handlers.payment import router as payment_router
-from handlers.payment_handlers import router as payment_handlers_router
+from handlers.level_selection import callbacks as level_selection_callbacks
+from handlers.date_selection import callbacks as date_selection_callbacks
+from handlers.payment import callbacks as payment_callbacks
+from handlers.payment_handlers import router as payment_handlers_router, callbacks as payment_handlers_callbacks
+from handlers.receipt_inbox import router as receipt_inbox_router, callbacks as receipt_inbox_callbacks
+from handlers.callback_dispatcher import CallbackDispatcher
+from handlers.admin import router as admin_router
+from services.google_sheets import GoogleSheetsManager
+from services.group_manager import GroupManager
+from services.async_sheets import AsyncSheetsManager
+from services.write_behind import StudentWriteQueue
+from services.sheets_guard import READ, WRITE, QuotaTracker, SheetsGuard
+from services.sheets_mirror import SCHEDULE_MIRROR, SCHEDULE_SHEET, STUDENTS_MIRROR, SheetsMirror
+from services.rate_limiter import TelegramRateLimiter
+from services.receipt_sla import ReceiptSlaMonitor
+from services.instrumentation import BotApiMetricsMiddleware, MetricsServer, setup_metrics
+from services.startup import Startup
+from services.webhook import run_webhook
+
+def create_storage():
+    """Настраивает хранилище TemporaryStorage и возвращает FSM-хранилище"""
+    if STORAGE_BACKEND == 'redis':
+        # Пакет redis нужен только в этом режиме
+        import redis
+        from aiogram.fsm.storage.redis import RedisStorage
+        TemporaryStorage.configure(RedisBackend(redis.Redis.from_url(REDIS_URL), SESSION_IDLE_TTL, SESSION_MAX_ENTRIES))
+        return RedisStorage.from_url(REDIS_URL)
+    if STORAGE_BACKEND == 'sqlite':
+        TemporaryStorage.configure(SQLiteBackend(SQLITE_PATH, SESSION_IDLE_TTL, SESSION_MAX_ENTRIES))
+        return SQLiteStorage(SQLITE_PATH)
+    TemporaryStorage.configure(MemoryBackend(SESSION_IDLE_TTL, SESSION_MAX_ENTRIES))
+    return MemoryStorage()
+
+def include_routers(dp: Dispatcher):
+    """Подключает роутеры бота; используется и нагрузочным тестом"""
+    dp.include_router(admin_router)
+    dp.include_router(start_router)
+    dp.include_router(registration_router)
+    # Все кнопки обрабатываются одним роутером с выбором обработчика по коду операции
+    dp.include_router(CallbackDispatcher(
+        level_selection_callbacks,
+        date_selection_callbacks,
+        #payment_callbacks,
+        payment_handlers_callbacks,
+        receipt_inbox_callbacks
+    ))
+    dp.include_router(payment_handlers_router)
+    dp.include_router(receipt_inbox_router)
 
 class BotConfig:
     def __init__(self):
@@ -18,23 +76,92 @@ class BotConfig:
 
 async def main():
     bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
+    # Все исходящие сообщения проходят через общую очередь с лимитами Telegram
+    bot.session.middleware(TelegramRateLimiter(
+        ADMIN_IDS,
+        global_rate=TELEGRAM_GLOBAL_RATE,
+        chat_rate=TELEGRAM_CHAT_RATE,
+        chat_burst=TELEGRAM_CHAT_BURST,
+        max_retries=TELEGRAM_MAX_RETRIES
+    ))
+    # Подключается после лимитера и измеряет только сам вызов Bot API
+    bot.session.middleware(BotApiMetricsMiddleware())
+    
+    # Локальная база - основная копия расписания и учеников
+    store = LocalStore(LOCAL_DB_PATH)
+    # Все запросы к Google проходят через учет квоты и предохранитель
+    sheets_guard = SheetsGuard(
+        QuotaTracker({READ: SHEETS_READ_QUOTA, WRITE: SHEETS_WRITE_QUOTA}),
+        failure_threshold=SHEETS_BREAKER_THRESHOLD,
+        reset_timeout=SHEETS_BREAKER_RESET,
+        backoff_base=SHEETS_BACKOFF_BASE,
+        backoff_max=SHEETS_BACKOFF_MAX
+    )
+    # Один менеджер таблиц на весь процесс, авторизуется при первом обращении
+    # Вызовы gspread выполняются вне event loop через асинхронный фасад
+    sheets_manager = AsyncSheetsManager(
+        GoogleSheetsManager(GOOGLE_SHEETS_CREDENTIALS, SHEET_URL, schedule_ttl=SCHEDULE_CACHE_TTL, store=store,
+                            guard=sheets_guard),
+        max_workers=SHEETS_MAX_WORKERS,
+        timeout=SHEETS_CALL_TIMEOUT,
+        max_concurrency=SHEETS_MAX_CONCURRENCY
+    )
+    # Таблица синхронизируется с базой в фоне в обе стороны
+    sheets_mirror = SheetsMirror(
+        sheets_manager,
+        store,
+        [SCHEDULE_MIRROR, STUDENTS_MIRROR],
+        push_interval=WRITE_BEHIND_INTERVAL_MS / 1000,
+        pull_interval=MIRROR_PULL_INTERVAL,
+        max_batch=WRITE_BEHIND_MAX_BATCH
+    )
+    # Новая версия расписания публикуется сразу после изменений в таблице
+    sheets_mirror.on_change(SCHEDULE_SHEET, sheets_manager.refresh_schedule)
+    student_queue = StudentWriteQueue(store, sheets_mirror)
+    # Передаются в хендлеры через dependency injection диспетчера
+    dp = Dispatcher(
+        storage=create_storage(),
+        sheets_manager=sheets_manager,
+        sheets_mirror=sheets_mirror,
+        student_queue=student_queue,
+        group_manager=GroupManager(bot, ADMIN_IDS)
+    )
+    # Время и ошибки каждого апдейта и хендлера
+    setup_metrics(dp)
+    startup = Startup(sheets_manager, sheets_mirror)
+    if METRICS_PORT:
+        # Сервер метрик поднимается первым, чтобы /ready отвечал и во время прогрева
+        metrics_server = MetricsServer(METRICS_HOST, METRICS_PORT, readiness=startup.ready)
+        dp.startup.register(metrics_server.start)
+        dp.shutdown.register(metrics_server.stop)
+    # Авторизация, первая синхронизация, расписание и клавиатуры - до приема апдейтов
+    dp.startup.register(startup.run)
+    dp.shutdown.register(startup.stop)
+    if RECEIPT_SLA_MINUTES:
+        # Предупреждения о чеках, которые слишком долго ждут проверки
+        sla_monitor = ReceiptSlaMonitor(RECEIPT_SLA_MINUTES * 60, ADMIN_IDS)
+        dp.startup.register(sla_monitor.start)
+        dp.shutdown.register(sla_monitor.stop)
+    dp.shutdown.register(sheets_mirror.stop)
     
     # Создаем объект конфига и привязываем к боту
     config = BotConfig()
     bot.config = config  # Правильное присваивание
     
     # Регистрируем ВСЕ роутеры
-    dp.include_router(start_router)
-    dp.include_router(registration_router)
-    dp.include_router(level_selection_router)
-    dp.include_router(date_selection_router)
-    #dp.include_router(payment_router)
-    dp.include_router(payment_handlers_router)
+    include_routers(dp)
     
-    print("Бот запущен...")
+    print(f"Бот запущен ({BOT_MODE})...")
     # Запускаем бота
-    await dp.start_polling(bot)
+    try:
+        if BOT_MODE == 'webhook':
+            await run_webhook(dp, bot, WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        sheets_manager.close()
+        store.close()
+        TemporaryStorage.backend().close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+
+from services.google_sheets import GoogleSheetsManager
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSheetsManager:
+    """Асинхронный фасад над GoogleSheetsManager.
+
+    Синхронные вызовы gspread выполняются в ограниченном пуле потоков,
+    поэтому медленный запрос к Google не останавливает обработку апдейтов.
+    """
+
+    def __init__(self, manager: GoogleSheetsManager, max_workers: int = 4,
+                 timeout: float = 10.0, max_concurrency: int = 8):
+        self.manager = manager
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sheets')
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _run(self, method: str, *args, timeout: Optional[float] = None):
+        """Выполняет метод менеджера в пуле потоков с таймаутом"""
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            started = time.monotonic()
+            future = loop.run_in_executor(self._executor, partial(getattr(self.manager, method), *args))
+            try:
+                # Поток после таймаута доработает сам, но обработчик его уже не ждет
+                return await asyncio.wait_for(future, timeout or self.timeout)
+            except asyncio.TimeoutError:
+                metrics.inc('sheets_call_timeouts_total', method=method)
+                logger.error(f"Sheets call '{method}' timed out")
+                raise
+            except Exception as e:
+                metrics.inc('sheets_call_errors_total', method=method, error=type(e).__name__)
+                raise
+            finally:
+                metrics.observe('sheets_call_seconds', time.monotonic() - started, method=method)
+
+    async def authorize(self):
+        return await self._run('authorize')
+
+    async def get_dates_for_level(self, level: str) -> list:
+        return await self._run('get_dates_for_level', level)
+
+    async def get_dates_with_version(self, level: str) -> tuple:
+        return await self._run('get_dates_with_version', level)
+
+    async def get_group_info_for_date(self, level: str, date: str) -> dict:
+        return await self._run('get_group_info_for_date', level, date)
+
+    async def get_group_infos(self, pairs: list) -> dict:
+        return await self._run('get_group_infos', pairs)
+
+    async def save_user_data(self, user_data: dict) -> bool:
+        return await self._run('save_user_data', user_data)
+
+    async def append_student_rows(self, rows: list):
+        return await self._run('append_student_rows', rows)
+
+    async def get_values(self, title: str) -> list:
+        return await self._run('get_values', title)
+
+    async def get_modified_time(self) -> str:
+        return await self._run('get_modified_time')
+
+    async def update_rows(self, title: str, updates: list):
+        return await self._run('update_rows', title, updates)
+
+    async def append_rows(self, title: str, rows: list):
+        return await self._run('append_rows', title, rows)
+
+    async def refresh_schedule(self):
+        return await self._run('refresh_schedule')
+
+    @property
+    def guard(self):
+        return self.manager.guard
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,48 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Iterable
+
+from config import ADMIN_FANOUT_CONCURRENCY
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Ссылки на фоновые задачи, чтобы сборщик мусора не удалил их до завершения
+_background_tasks = set()
+
+
+async def fan_out(recipients: Iterable[int], send: Callable[[int], Awaitable[Any]],
+                  limit: int = ADMIN_FANOUT_CONCURRENCY) -> Dict[int, Any]:
+    """Выполняет send для всех получателей параллельно, не более limit одновременно.
+
+    Ошибка у одного получателя не мешает остальным: вместо результата
+    для него возвращается исключение.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def deliver(recipient: int):
+        async with semaphore:
+            try:
+                return await send(recipient)
+            except Exception as e:
+                metrics.inc('fanout_failures_total')
+                logger.error(f"Error delivering to {recipient}: {e}")
+                return e
+
+    recipients = list(recipients)
+    results = await asyncio.gather(*(deliver(recipient) for recipient in recipients))
+    return dict(zip(recipients, results))
+
+
+def run_in_background(coro: Coroutine, name: str = None) -> asyncio.Task:
+    """Запускает корутину, не дожидаясь ее, и логирует необработанные ошибки"""
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+
+    def done(finished: asyncio.Task):
+        _background_tasks.discard(finished)
+        if not finished.cancelled() and finished.exception() is not None:
+            logger.error(f"Background task {finished.get_name()} failed: {finished.exception()}")
+
+    task.add_done_callback(done)
+    return task
@@ -1,63 +1,157 @@
 import logging
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import re
+import threading
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
 import json
 
+from data.local_store import LocalStore
+from services.metrics import metrics
+from services.schedule_cache import ScheduleCache, ScheduleSnapshot
+from services.sheets_guard import DRIVE, READ, WRITE, SheetsGuard
+from services.sheets_mirror import SCHEDULE_SHEET, STUDENTS_MIRROR, STUDENTS_SHEET
+
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+REQUIRED_USER_KEYS = ['user_id', 'full_name', 'city', 'level', 'date', 'payment_status']
+
+# Первая строка диапазона из ответа append, например "'Ученики'!A12:J14"
+UPDATED_RANGE_ROW = re.compile(r'![A-Z]+(\d+)')
+
+def _count_refreshes(credentials):
+    """Считает обновления токена учетных данных google-auth.
+
+    Сессия gspread вызывает credentials.refresh() сама - перед запросом с
+    истекшим токеном и после ответа 401, поэтому счетчик ставится на
+    метод экземпляра. Первое получение токена не считается.
+    """
+    refresh = credentials.refresh
+
+    def counted(request):
+        refreshed = credentials.token is not None
+        refresh(request)
+        if refreshed:
+            metrics.inc('sheets_token_refresh_total')
+            logger.info("Google Sheets token refreshed")
+
+    credentials.refresh = counted
+
 class GoogleSheetsManager:
-    def __init__(self, credentials_json: str, sheet_url: str):
-        scope = ['https://spreadsheets.google.com/feeds',
-                'https://www.googleapis.com/auth/drive']
-        
+    SCOPE = ['https://spreadsheets.google.com/feeds',
+             'https://www.googleapis.com/auth/drive']
+
+    def __init__(self, credentials_json: str, sheet_url: str, schedule_ttl: float = 60,
+                 store: Optional[LocalStore] = None, guard: Optional[SheetsGuard] = None):
+        # Авторизация выполняется лениво при первом обращении к таблице
+        self.credentials_json = credentials_json
+        self.sheet_url = sheet_url
+        self.client = None
+        self._sheet = None
+        self._worksheets = {}
+        self._auth_lock = threading.Lock()
+        # Квота запросов, пауза после 429 и предохранитель
+        self.guard = guard
+        # С локальной базой расписание и ученики читаются и пишутся в нее,
+        # а таблица обновляется через SheetsMirror
+        self.store = store
+        loader = partial(store.values, SCHEDULE_SHEET) if store is not None else self._fetch_schedule
+        # Все чтения листа 'Даты' идут из снимка в памяти
+        self.schedule = ScheduleCache(loader, schedule_ttl)
+
+    def _authorize(self):
+        """Авторизация и открытие таблицы.
+
+        Токен обновляет сам gspread: его сессия google-auth получает новый
+        перед запросом, если прежний истек. Эти обновления считаются в
+        sheets_token_refresh_total.
+        """
+        # gspread и oauth2client импортируются только здесь: вместе они
+        # заметно удлиняют импорт, а нужны лишь при обращении к Google
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+
         credentials = ServiceAccountCredentials.from_json_keyfile_dict(
-            json.loads(credentials_json), scope
+            json.loads(self.credentials_json), self.SCOPE
         )
         self.client = gspread.authorize(credentials)
-        self.sheet = self.client.open_by_url(sheet_url)
+        _count_refreshes(self.client.http_client.auth)
+        self._sheet = self.client.open_by_url(self.sheet_url)
+        metrics.inc('sheets_auth_total')
+        # Счетчик виден в /metrics с нуля, до первого обновления токена
+        metrics.inc('sheets_token_refresh_total', 0)
+        logger.info("Google Sheets authorized")
+
+    @property
+    def sheet(self):
+        with self._auth_lock:
+            if self._sheet is None:
+                self._authorize()
+        return self._sheet
+
+    def authorize(self):
+        """Авторизация и открытие таблицы заранее, при запуске бота"""
+        self._call(READ, lambda: self.sheet)
+
+    def _worksheet(self, title: str):
+        """Возвращает лист таблицы.
+
+        Объекты листов запоминаются: каждый sheet.worksheet() - это
+        отдельный запрос метаданных, который тоже расходует квоту чтения.
+        """
+        sheet = self.sheet
+        worksheet = self._worksheets.get(title)
+        if worksheet is None:
+            worksheet = self._worksheets[title] = sheet.worksheet(title)
+        return worksheet
+
+    def _call(self, kind: str, func, *args):
+        """Запрос к Google через guard; kind - READ или WRITE"""
+        try:
+            if self.guard is None:
+                return func(*args)
+            return self.guard.call(kind, func, *args)
+        except Exception:
+            # Лист могли переименовать или удалить - при повторе найдем его заново
+            self._worksheets.clear()
+            raise
+
+    def _fetch_schedule(self) -> list:
+        """Загружает лист 'Даты' целиком"""
+        return self.get_values(SCHEDULE_SHEET)
+
+    def get_values(self, title: str) -> List[list]:
+        """Все значения листа, ошибки не подавляются"""
+        return self._call(READ, lambda: self._worksheet(title).get_all_values())
+
+    def get_modified_time(self) -> str:
+        """Время последнего изменения таблицы (modifiedTime из Drive API).
+
+        Ответ занимает пару сотен байт против всего листа у get_values,
+        поэтому зеркало проверяет его перед загрузкой листов.
+        """
+        return self._call(DRIVE, lambda: self.sheet.get_lastUpdateTime())
+
+    def update_rows(self, title: str, updates: List[Tuple[int, list]]):
+        """Перезаписывает строки листа по номерам одним запросом"""
+        data = [{'range': f'A{row_number}', 'values': [row]} for row_number, row in updates]
+        self._call(WRITE, lambda: self._worksheet(title).batch_update(data))
+
+    def append_rows(self, title: str, rows: List[list]) -> Optional[int]:
+        """Добавляет строки в конец листа, возвращает номер первой добавленной строки"""
+        response = self._call(WRITE, lambda: self._worksheet(title).append_rows(rows))
+        match = UPDATED_RANGE_ROW.search(response.get('updates', {}).get('updatedRange', ''))
+        return int(match.group(1)) if match else None
+
+    def refresh_schedule(self) -> ScheduleSnapshot:
+        """Принудительно обновляет снимок расписания"""
+        return self.schedule.refresh()
     
     def get_dates_for_level(self, level: str) -> list:
+        """Актуальные даты для уровня из индекса текущего снимка"""
         try:
-            worksheet = self.sheet.worksheet('Даты')
-            
-            # Получаем все данные без автоматического парсинга заголовков
-            all_data = worksheet.get_all_values()
-            
-            # Если нет данных или только заголовки
-            if len(all_data) <= 1:
-                logger.info("No data found in worksheet")
-                return []
-            
-            # Извлекаем заголовки из первой строки
-            headers = [header.strip().lower() for header in all_data[0]]
-            logger.info(f"Headers found: {headers}")
-            
-            dates = []
-            
-            # Обрабатываем данные начиная со второй строки
-            for row in all_data[1:]:
-                if len(row) < 3:  # Проверяем, что в строке достаточно данных
-                    continue
-                
-                # Создаем словарь из заголовков и значений
-                record = dict(zip(headers, row))
-                logger.info(f"Processing record: {record}")
-                
-                # Проверяем условия с нормализацией данных
-                record_level = record.get('уровень', '').strip()
-                actual_status = record.get('актуальная', '').strip().lower()
-                date_value = record.get('дата', '').strip()
-                
-                logger.info(f"Level: '{record_level}', Actual: '{actual_status}', Date: '{date_value}'")
-                
-                # Сравниваем с учетом возможных вариантов написания
-                if (record_level.lower() == level.lower() and 
-                    actual_status in ['да', 'yes', 'true', '1', '+'] and
-                    date_value):
-                    dates.append(date_value)
-                    logger.info(f"✓ Added date: {date_value}")
-            
+            dates = self.schedule.get().index.dates_for_level(level)
             logger.info(f"Found dates for level '{level}': {dates}")
             return dates
             
@@ -65,69 +159,39 @@ class GoogleSheetsManager:
             logger.error(f"Error getting dates for level '{level}': {e}")
             return []
     
+    def get_dates_with_version(self, level: str) -> tuple:
+        """Даты для уровня и версия снимка, из которого они взяты"""
+        try:
+            snapshot = self.schedule.get()
+            return snapshot.index.dates_for_level(level), snapshot.version
+            
+        except Exception as e:
+            logger.error(f"Error getting dates for level '{level}': {e}")
+            return [], None
+    
     def get_group_info_for_date(self, level: str, date: str) -> dict:
         """Получает информацию о группе для конкретного уровня и даты"""
         try:
-            worksheet = self.sheet.worksheet('Даты')
-            all_data = worksheet.get_all_values()
-            
-            if len(all_data) <= 1:
-                return {"group_exists": False, "group_link": None}
-            
-            # Нормализуем заголовки
-            headers = [header.strip().lower() for header in all_data[0]]
-            
-            # Ищем индексы колонок
-            level_col = None
-            date_col = None
-            actual_col = None
-            link_col = None
-            
-            for i, header in enumerate(headers):
-                if 'уровень' in header:
-                    level_col = i
-                elif 'дата' in header:
-                    date_col = i
-                elif 'актуальная' in header:
-                    actual_col = i
-                elif 'ссылка' in header:
-                    link_col = i
-            
-            if level_col is None or date_col is None or actual_col is None:
-                return {"group_exists": False, "group_link": None}
-            
-            # Ищем подходящую запись
-            for row in all_data[1:]:
-                if len(row) <= max(level_col, date_col, actual_col):
-                    continue
-                
-                record_level = row[level_col].strip()
-                record_date = row[date_col].strip()
-                actual_status = row[actual_col].strip().lower()
-                
-                if (record_level.lower() == level.lower() and 
-                    record_date == date and
-                    actual_status in ['да', 'yes', 'true', '1', '+']):
-                    
-                    group_link = row[link_col].strip() if link_col is not None and len(row) > link_col else None
-                    
-                    return {
-                        "group_exists": True,
-                        "group_link": group_link if group_link else None,
-                        "has_link": bool(group_link)
-                    }
+            return self.schedule.get().index.group_info(level, date)
             
+        except Exception as e:
+            logger.error(f"Error getting group info: {e}")
             return {"group_exists": False, "group_link": None}
+    
+    def get_group_infos(self, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], dict]:
+        """Группы для нескольких пар (уровень, дата) из одного снимка расписания"""
+        try:
+            index = self.schedule.get().index
+            return {pair: index.group_info(*pair) for pair in pairs}
             
         except Exception as e:
             logger.error(f"Error getting group info: {e}")
-            return {"group_exists": False, "group_link": None}
+            return {pair: {"group_exists": False, "group_link": None} for pair in pairs}
     
     def debug_worksheet_structure(self):
         """Функция для отладки структуры worksheet"""
         try:
-            worksheet = self.sheet.worksheet('Даты')
-            all_data = worksheet.get_all_values()
+            all_data = self.schedule.get().rows
             
             logger.info("=== WORKSHEET STRUCTURE DEBUG ===")
             logger.info(f"Total rows: {len(all_data)}")
@@ -141,87 +205,75 @@ class GoogleSheetsManager:
             return []
     
     def get_dates_alternative_method(self, level: str) -> list:
-        """Альтернативный метод получения дат"""
+        """Альтернативный метод получения дат (оставлен для совместимости)"""
         try:
-            worksheet = self.sheet.worksheet('Даты')
-            
-            # Находим колонки по заголовкам
-            all_data = worksheet.get_all_values()
-            if not all_data:
-                return []
-            
-            headers = [header.strip().lower() for header in all_data[0]]
-            
-            # Ищем индексы колонок
-            level_col = None
-            date_col = None
-            actual_col = None
-            
-            for i, header in enumerate(headers):
-                if 'уровень' in header:
-                    level_col = i
-                elif 'дата' in header:
-                    date_col = i
-                elif 'актуальная' in header:
-                    actual_col = i
-            
-            logger.info(f"Column indexes - Level: {level_col}, Date: {date_col}, Actual: {actual_col}")
-            
-            if level_col is None or date_col is None or actual_col is None:
-                logger.error("Required columns not found")
-                return []
-            
-            dates = []
-            
-            # Обрабатываем данные
-            for i, row in enumerate(all_data[1:], start=2):
-                if len(row) <= max(level_col, date_col, actual_col):
-                    continue
-                
-                record_level = row[level_col].strip()
-                actual_status = row[actual_col].strip().lower()
-                date_value = row[date_col].strip()
-                
-                if (record_level.lower() == level.lower() and 
-                    actual_status in ['да', 'yes', 'true', '1', '+'] and
-                    date_value):
-                    dates.append(date_value)
-            
-            return dates
+            index = self.schedule.get().index
+            logger.info(f"Column indexes: {index.columns}")
+            return index.dates_for_level(level)
             
         except Exception as e:
             logger.error(f"Alternative method error: {e}")
             return []
     
+    @staticmethod
+    def has_required_user_data(user_data: dict) -> bool:
+        return all(key in user_data for key in REQUIRED_USER_KEYS)
+
+    @staticmethod
+    def build_student_row(user_data: dict) -> list:
+        """Строка листа 'Ученики' из данных пользователя"""
+        return [
+            user_data['user_id'],
+            user_data['full_name'],
+            user_data['city'],
+            user_data['level'],
+            user_data['date'],
+            user_data['payment_status'],
+            user_data.get('full_price', ''),
+            user_data.get('prepayment', ''),
+            user_data.get('verified_by', ''),
+            user_data.get('verified_at', '')
+        ]
+
+    @classmethod
+    def save_student(cls, store: LocalStore, user_data: dict) -> bool:
+        """Запись ученика в локальную базу; в таблицу ее отправит SheetsMirror"""
+        if not cls.has_required_user_data(user_data):
+            logger.error("Недостающие данные в user_data")
+            return False
+        
+        row = cls.build_student_row(user_data)
+        store.upsert(STUDENTS_SHEET, STUDENTS_MIRROR.key([], row), row)
+        return True
+
     def save_user_data(self, user_data: dict) -> bool:
         """Сохранение данных пользователя в Google Sheets."""
-        required_keys = ['user_id', 'full_name', 'city', 'level', 'date', 'payment_status']
+        if self.store is not None:
+            return self.save_student(self.store, user_data)
         
         # Проверка наличия всех необходимых данных
-        if not all(key in user_data for key in required_keys):
+        if not self.has_required_user_data(user_data):
             logging.error("Недостающие данные в user_data")
             return False
         
         try:
-            worksheet = self.sheet.worksheet('Ученики')
-            worksheet.append_row([
-                user_data['user_id'],
-                user_data['full_name'],
-                user_data['city'],
-                user_data['level'],
-                user_data['date'],
-                user_data['payment_status'],
-                user_data.get('full_price', ''),
-                user_data.get('prepayment', ''),
-                user_data.get('verified_by', ''),
-                user_data.get('verified_at', '')
-            ])
+            row = self.build_student_row(user_data)
+            self._call(WRITE, lambda: self._worksheet(STUDENTS_SHEET).append_row(row))
             logging.info("Данные пользователя успешно сохранены.")
             return True
         except Exception as e:
             logging.error(f"Ошибка при сохранении данных: {e}")
             return False
 
+    def append_student_rows(self, rows: list):
+        """Добавляет несколько строк в лист 'Ученики' одним запросом.
+
+        В отличие от save_user_data, ошибки не подавляются: очередь
+        отложенной записи должна знать, что пачку нужно повторить.
+        """
+        self._call(WRITE, lambda: self._worksheet(STUDENTS_SHEET).append_rows(rows))
+        logger.info(f"Saved {len(rows)} student rows in one batch")
+
 # Функция для тестирования
 def test_sheet_connection():
     """Тестирование подключения и структуры таблицы"""
@@ -1,21 +1,86 @@
 from aiogram import Bot
 import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import GROUP_INVITE_LINK_TTL
+from data.temporary_storage import TemporaryStorage
+from services.fanout import fan_out
+from services.idempotency import KeyedLocks
+from services.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+# Ссылку, которая истекает раньше, ученик может не успеть открыть - создается новая
+INVITE_LINK_MIN_TTL = 3600
+
 class GroupManager:
+    """Один экземпляр на процесс, передается в хендлеры через диспетчер.
+
+    Реестр групп {(уровень, дата): chat_id и пригласительная ссылка}
+    хранится в TemporaryStorage - в SQLite или Redis он переживает
+    перезапуск и общий для всех экземпляров бота. Пока группа есть в
+    реестре, ссылка для ученика берется оттуда, без чтения таблицы.
+    """
+
     def __init__(self, bot: Bot, admin_ids: list):
         self.bot = bot
         self.admin_ids = admin_ids
-        self.existing_groups = {}  # Кэш созданных групп: {("level", "date"): chat_id}
+        # Одновременные подтверждения в одну группу создают одну ссылку
+        self._invite_locks = KeyedLocks()
+    
+    async def get_invite_link(self, level: str, date: str) -> Optional[str]:
+        """Действующая ссылка в группу из реестра; None - группа не привязана
+        или бот не может создать ссылку (не администратор группы)"""
+        group = TemporaryStorage.get_group(level, date)
+        if not group:
+            return None
+        if group.get('invite_link') and (group.get('invite_expires_at') or 0) - time.time() > INVITE_LINK_MIN_TTL:
+            metrics.inc('group_invite_links_total', result='cached')
+            return group['invite_link']
+        
+        async with self._invite_locks.lock((level, date)):
+            # Пока ждали замок, ссылку мог создать другой вызов
+            group = TemporaryStorage.get_group(level, date)
+            if group.get('invite_link') and (group.get('invite_expires_at') or 0) - time.time() > INVITE_LINK_MIN_TTL:
+                metrics.inc('group_invite_links_total', result='cached')
+                return group['invite_link']
+            
+            try:
+                expires_at = time.time() + GROUP_INVITE_LINK_TTL
+                invite = await self.bot.create_chat_invite_link(
+                    group['chat_id'], name=f"{level} {date}"[:32], expire_date=int(expires_at)
+                )
+            except Exception as e:
+                metrics.inc('group_invite_links_total', result='error')
+                logger.error(f"Error creating invite link for {level} - {date}: {e}")
+                return None
+            
+            TemporaryStorage.set_group_invite_link(level, date, invite.invite_link, expires_at)
+            metrics.inc('group_invite_links_total', result='created')
+            return invite.invite_link
+    
+    async def resolve_group_links(self, pairs: List[Tuple[str, str]], sheets_manager) -> Dict[Tuple[str, str], Optional[str]]:
+        """Ссылки на группы для пар (уровень, дата).
+
+        Сначала реестр; таблица читается только для пар без группы в
+        реестре, и для всех них - из одного снимка расписания.
+        """
+        links = {pair: await self.get_invite_link(*pair) for pair in pairs}
+        missing = [pair for pair, link in links.items() if link is None]
+        if missing:
+            group_infos = await sheets_manager.get_group_infos(missing)
+            for pair in missing:
+                group_info = group_infos.get(pair, {})
+                links[pair] = group_info.get('group_link') if group_info.get('group_exists') else None
+        return links
     
     async def get_or_create_group(self, level: str, date: str) -> dict:
         """Находит существующую группу или возвращает информацию для администратора"""
-        group_key = (level, date)
-        
-        # Проверяем кэш
-        if group_key in self.existing_groups:
-            return {"chat_id": self.existing_groups[group_key], "is_new": False}
+        # Проверяем реестр групп
+        chat_id = TemporaryStorage.get_group_chat_id(level, date)
+        if chat_id is not None:
+            return {"chat_id": chat_id, "is_new": False}
         
         # Боты не могут создавать группы, поэтому возвращаем инструкцию для администратора
         return await self.get_group_creation_instructions(level, date)
@@ -29,15 +94,11 @@ class GroupManager:
             f"1. Создать группу с названием: '{group_title}'\n"
             f"2. Добавить бота в группу как администратора\n"
             f"3. Отправить команду /set_group_id в группе\n"
-            f"4. Или предоставить ID группы для добавления учеников"
+            f"4. Или отправить боту /set_group_id <ID группы> {level} {date}"
         )
         
-        # Отправляем инструкции всем администраторам
-        for admin_id in self.admin_ids:
-            try:
-                await self.bot.send_message(admin_id, instructions)
-            except Exception as e:
-                logger.error(f"Error sending instructions to admin {admin_id}: {e}")
+        # Отправляем инструкции всем администраторам параллельно
+        await fan_out(self.admin_ids, lambda admin_id: self.bot.send_message(admin_id, instructions))
         
         return {
             "needs_admin_action": True,
@@ -121,16 +182,11 @@ class GroupManager:
                 f"Необходимо создать группу и добавить участника."
             )
         
-        for admin_id in self.admin_ids:
-            try:
-                await self.bot.send_message(admin_id, message_text)
-            except Exception as e:
-                logger.error(f"Error notifying admin {admin_id}: {e}")
+        await fan_out(self.admin_ids, lambda admin_id: self.bot.send_message(admin_id, message_text))
     
     async def set_group_id(self, level: str, date: str, chat_id: int):
         """Устанавливает ID существующей группы (вызывается администратором)"""
-        group_key = (level, date)
-        self.existing_groups[group_key] = chat_id
+        TemporaryStorage.set_group_chat_id(level, date, chat_id)
         logger.info(f"Group ID set for {level} - {date}: {chat_id}")
     
     async def send_group_info_to_user(self, user_id: int, group_info: dict):
@@ -0,0 +1,32 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable
+
+
+class KeyedLocks:
+    """asyncio.Lock на каждый ключ; замок удаляется, когда его никто не ждет"""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, list] = {}  # ключ -> [замок, число владельцев и ожидающих]
+
+    @asynccontextmanager
+    async def lock(self, key: Hashable):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+# Замки на обработку чеков, ключ - user_id
+receipt_locks = KeyedLocks()
+
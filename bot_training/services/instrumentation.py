@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiohttp import web
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods.base import TelegramMethod, TelegramType
+from aiogram.types import TelegramObject, Update
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Хендлеры и вызовы Bot API обычно укладываются в миллисекунды
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware диспетчера: время и ошибки обработки каждого апдейта"""
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: Dict[str, Any]) -> Any:
+        event_type = event.event_type
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            metrics.inc('update_errors_total', event_type=event_type, error=type(e).__name__)
+            raise
+        finally:
+            metrics.observe('update_seconds', time.perf_counter() - started, FAST_BUCKETS, event_type=event_type)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Внутренний middleware: время и ошибки каждого хендлера.
+
+    Подключается к наблюдателям диспетчера и поэтому действует во всех
+    вложенных роутерах; имя хендлера берется из data['handler'].
+    """
+
+    def __init__(self):
+        self._names = {}  # функция хендлера -> имя метки
+
+    def _name(self, callback) -> str:
+        name = self._names.get(callback)
+        if name is None:
+            name = self._names[callback] = f"{callback.__module__}.{callback.__qualname__}"
+        return name
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        name = self._name(data['handler'].callback)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            metrics.inc('handler_errors_total', handler=name, error=type(e).__name__)
+            raise
+        finally:
+            metrics.observe('handler_seconds', time.perf_counter() - started, FAST_BUCKETS, handler=name)
+
+
+class BotApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время и ошибки каждого вызова Bot API"""
+
+    async def __call__(self, make_request: NextRequestMiddlewareType[TelegramType], bot,
+                       method: TelegramMethod[TelegramType]):
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            metrics.inc('bot_api_errors_total', method=name, error=type(e).__name__)
+            raise
+        finally:
+            metrics.observe('bot_api_seconds', time.perf_counter() - started, FAST_BUCKETS, method=name)
+
+
+def setup_metrics(dp: Dispatcher):
+    """Подключает middleware метрик ко всем типам апдейтов диспетчера"""
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    handler_middleware = HandlerMetricsMiddleware()
+    for name, observer in dp.observers.items():
+        if name not in ('update', 'error'):
+            observer.middleware(handler_middleware)
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        body=metrics.render().encode(),
+        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    )
+
+
+class MetricsServer:
+    """Локальный HTTP-сервер с GET /metrics в текстовом формате Prometheus.
+
+    Если передан readiness (asyncio.Event), GET /ready отвечает 200 после
+    прогрева бота и 503 до него - для проверок готовности оркестратора.
+    """
+
+    def __init__(self, host: str, port: int, readiness: Optional[asyncio.Event] = None):
+        self.host = host
+        self.port = port
+        self.readiness = readiness
+        self._runner = None
+
+    async def handle_ready(self, request: web.Request) -> web.Response:
+        if self.readiness.is_set():
+            return web.Response(text='ready')
+        return web.Response(status=503, text='starting')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', handle_metrics)
+        if self.readiness is not None:
+            app.router.add_get('/ready', self.handle_ready)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host=self.host, port=self.port).start()
+        logger.info(f"Metrics available at http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,110 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, Tuple
+
+# Границы гистограмм по умолчанию (в секундах)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _key(name: str, labels: dict) -> Tuple[str, tuple]:
+    return name, tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _sort_key(item) -> tuple:
+    (name, labels), _ = item
+    return name, str(labels)
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин"""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Metrics:
+    """Реестр метрик процесса: счетчики, текущие значения и гистограммы"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, tuple], float] = {}
+        self.gauges: Dict[Tuple[str, tuple], float] = {}
+        self.histograms: Dict[Tuple[str, tuple], Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, buckets: tuple = DEFAULT_BUCKETS, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        with self._lock:
+            counters = sorted(self.counters.items(), key=_sort_key)
+            gauges = sorted(self.gauges.items(), key=_sort_key)
+            histograms = sorted(((key, (histogram.buckets, list(histogram.counts), histogram.count, histogram.sum))
+                                 for key, histogram in self.histograms.items()), key=_sort_key)
+
+        lines = []
+        for kind, items in (('counter', counters), ('gauge', gauges)):
+            previous = None
+            for (name, labels), value in items:
+                if name != previous:
+                    lines.append(f'# TYPE {name} {kind}')
+                    previous = name
+                lines.append(f'{name}{_labels(labels)} {value}')
+
+        previous = None
+        for (name, labels), (buckets, counts, count, total) in histograms:
+            if name != previous:
+                lines.append(f'# TYPE {name} histogram')
+                previous = name
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{_labels(labels)} {total}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def get(self, name: str, **labels) -> float:
+        """Возвращает значение счетчика или текущего значения"""
+        key = _key(name, labels)
+        with self._lock:
+            if key in self.counters:
+                return self.counters[key]
+            return self.gauges.get(key, 0)
+
+
+# Общий реестр метрик процесса
+metrics = Metrics()
@@ -0,0 +1,155 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import Dict, Iterable
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    CopyMessage, EditMessageCaption, EditMessageReplyMarkup, EditMessageText,
+    ForwardMessage, SendDocument, SendMessage, SendPhoto
+)
+from aiogram.methods.base import Response, TelegramMethod, TelegramType
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Методы, которые Telegram считает отправкой сообщений в чат
+LIMITED_METHODS = (
+    SendMessage, SendPhoto, SendDocument, CopyMessage, ForwardMessage,
+    EditMessageText, EditMessageCaption, EditMessageReplyMarkup,
+)
+
+# Приоритеты очереди: ответы пользователям обгоняют уведомления администраторам
+PRIORITY_USER = 0
+PRIORITY_ADMIN = 1
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until_token(self) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def reserve(self) -> float:
+        """Занимает токен заранее и возвращает, сколько нужно подождать"""
+        wait = self.time_until_token()
+        self.tokens -= 1
+        return wait
+
+    def consume(self):
+        self._refill()
+        self.tokens -= 1
+
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class TelegramRateLimiter(BaseRequestMiddleware):
+    """Общая очередь исходящих сообщений бота.
+
+    Подключается к сессии бота, поэтому через нее проходят все отправки -
+    из хендлеров, GroupManager и фоновых задач. Сначала запрос ждет токен
+    своего чата (без очереди, чтобы один занятый чат не держал остальных),
+    затем встает в общую приоритетную очередь за глобальным токеном.
+    На 429 запрос ждет retry_after и повторяется.
+    """
+
+    MAX_CHAT_BUCKETS = 10000
+
+    def __init__(self, admin_ids: Iterable[int], global_rate: float = 30, chat_rate: float = 1,
+                 chat_burst: float = 1, max_retries: int = 3):
+        self.admin_ids = set(admin_ids)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._queue: asyncio.PriorityQueue = None
+        self._sequence = itertools.count()
+        self._worker = None
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.MAX_CHAT_BUCKETS:
+                # Полные ведра ничего не ограничивают, их можно забыть
+                self._chat_buckets = {key: value for key, value in self._chat_buckets.items() if not value.is_full()}
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = self._queue or asyncio.PriorityQueue()
+            self._worker = asyncio.create_task(self._dispatch(), name='telegram-rate-limiter')
+
+    async def _dispatch(self):
+        """Выдает глобальные токены ожидающим в порядке приоритета"""
+        while True:
+            wait = self._global_bucket.time_until_token()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            # Берем элемент только когда токен уже есть: новый ответ пользователю
+            # успеет обогнать уведомления, пришедшие раньше
+            _, _, waiter = await self._queue.get()
+            metrics.set('send_queue_depth', self._queue.qsize())
+            if waiter.done():
+                continue
+            self._global_bucket.consume()
+            waiter.set_result(None)
+
+    async def _acquire(self, chat_id, priority: int):
+        started = time.monotonic()
+
+        if chat_id is not None:
+            wait = self._chat_bucket(chat_id).reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        self._ensure_worker()
+        waiter = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((priority, next(self._sequence), waiter))
+        metrics.set('send_queue_depth', self._queue.qsize())
+        await waiter
+
+        label = 'admin' if priority == PRIORITY_ADMIN else 'user'
+        metrics.observe('send_queue_wait_seconds', time.monotonic() - started, priority=label)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if not isinstance(method, LIMITED_METHODS):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, 'chat_id', None)
+        priority = PRIORITY_ADMIN if chat_id in self.admin_ids else PRIORITY_USER
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                metrics.inc('telegram_retry_after_total', method=type(method).__name__)
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"Flood control for chat {chat_id}, retry in {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
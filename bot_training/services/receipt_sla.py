@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from data.temporary_storage import TemporaryStorage
+from keyboards.callbacks import PENDING_RECEIPTS, encode
+from services.fanout import fan_out
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ALERT_BATCH = 20  # чеков в одном предупреждении
+ALERT_LINES = 10  # из них перечисляются в тексте
+
+
+class ReceiptSlaMonitor:
+    """Предупреждает администраторов о чеках, которые ждут проверки дольше threshold.
+
+    Хранилище держит непредупрежденные чеки в куче по времени отправки,
+    поэтому монитор не перебирает список: он спит до момента, когда
+    просрочится верхний чек кучи, и забирает все просроченные. Чек,
+    отправленный позже, не может просрочиться раньше, чем через threshold,
+    поэтому при пустой куче монитор спит ровно threshold.
+    """
+
+    def __init__(self, threshold: float, admin_ids: Iterable[int]):
+        self.threshold = threshold
+        self.admin_ids = list(admin_ids)
+        self.bot = None
+        self._task = None
+
+    async def start(self, bot: Bot):
+        self.bot = bot
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _delay(self) -> float:
+        """Секунды до следующей просрочки"""
+        sent_at = TemporaryStorage.next_unalerted_receipt_time()
+        if sent_at is None:
+            return self.threshold
+        due = sent_at + timedelta(seconds=self.threshold)
+        return max(0.0, (due - datetime.now()).total_seconds())
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+                delay = self._delay()
+            except Exception as e:
+                logger.error(f"Error checking receipt SLA: {e}")
+                delay = self.threshold
+            await asyncio.sleep(delay)
+
+    async def check(self) -> int:
+        """Отправляет предупреждения о всех просроченных чеках; возвращает их число"""
+        now = datetime.now()
+        oldest = TemporaryStorage.oldest_pending_receipt()
+        metrics.set('pending_receipt_oldest_age_seconds', _waiting(oldest[1], now).total_seconds() if oldest else 0)
+
+        cutoff = now - timedelta(seconds=self.threshold)
+        alerted = 0
+        while True:
+            overdue = TemporaryStorage.pop_overdue_receipts(cutoff, ALERT_BATCH)
+            if not overdue:
+                return alerted
+            alerted += len(overdue)
+            metrics.inc('receipt_sla_alerts_total', len(overdue))
+            text = alert_text(overdue, self.threshold, now)
+            keyboard = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(
+                text="📋 Все ожидающие чеки",
+                callback_data=encode(PENDING_RECEIPTS)
+            )]])
+            await fan_out(self.admin_ids, lambda admin_id: self.bot.send_message(admin_id, text, reply_markup=keyboard))
+
+
+def _waiting(receipt_data: Dict, now: datetime) -> timedelta:
+    try:
+        return now - datetime.fromisoformat(receipt_data['timestamp'])
+    except (KeyError, ValueError):
+        return timedelta(0)
+
+
+def alert_text(overdue: List[Tuple[int, Dict]], threshold: float, now: datetime) -> str:
+    text = f"⏰ **Чеки ждут проверки дольше {threshold / 60:.0f} мин:** {len(overdue)}\n\n"
+    for user_id, receipt_data in overdue[:ALERT_LINES]:
+        user_data = receipt_data.get('user_data', {})
+        minutes = _waiting(receipt_data, now).total_seconds() // 60
+        text += (
+            f"👤 {user_data.get('full_name', 'Неизвестно')} (ID: {user_id}) • "
+            f"📚 {user_data.get('level', 'Неизвестно')} • "
+            f"📅 {user_data.get('date', 'Неизвестно')} • "
+            f"⌛ {minutes:.0f} мин\n"
+        )
+    if len(overdue) > ALERT_LINES:
+        text += f"… и еще {len(overdue) - ALERT_LINES}\n"
+    return text
@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+from services.metrics import metrics
+from services.schedule_index import ScheduleIndex
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduleSnapshot:
+    """Неизменяемая копия листа 'Даты' с номером версии и индексом"""
+
+    def __init__(self, rows: List[list], version: int, fetched_at: float, index: ScheduleIndex):
+        self.rows = rows
+        self.version = version
+        self.fetched_at = fetched_at
+        self.index = index
+
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+
+class ScheduleCache:
+    """Кэш листа расписания с TTL и фоновым обновлением (stale-while-revalidate)"""
+
+    def __init__(self, loader: Callable[[], List[list]], ttl: float):
+        self._loader = loader
+        self.ttl = ttl
+        self._snapshot: Optional[ScheduleSnapshot] = None
+        self._load_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self) -> ScheduleSnapshot:
+        """Возвращает текущий снимок, устаревший снимок обновляется в фоне"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Первой загрузки нет - ждем ее синхронно
+            return self.refresh()
+
+        if snapshot.age() > self.ttl:
+            metrics.inc('schedule_cache_stale_reads_total')
+            self._start_background_refresh()
+        else:
+            metrics.inc('schedule_cache_hits_total')
+        return snapshot
+
+    def refresh(self) -> ScheduleSnapshot:
+        """Синхронно перечитывает лист и публикует новый снимок"""
+        with self._load_lock:
+            started = time.monotonic()
+            rows = self._loader()
+            metrics.observe('schedule_cache_refresh_seconds', time.monotonic() - started)
+
+            current = self._snapshot
+            if current is not None and current.rows == rows:
+                # Данные не изменились - версию и индекс не пересобираем
+                version = current.version
+                index = current.index
+            else:
+                version = current.version + 1 if current is not None else 1
+                index = ScheduleIndex(rows)
+
+            self._snapshot = ScheduleSnapshot(rows, version, time.monotonic(), index)
+            metrics.set('schedule_cache_version', version)
+            logger.info(f"Schedule snapshot v{version} loaded: {len(rows)} rows")
+            return self._snapshot
+
+    def _start_background_refresh(self):
+        with self._state_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        threading.Thread(target=self._background_refresh, name='schedule-refresh', daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            # Пользователи продолжают получать предыдущий снимок
+            metrics.inc('schedule_cache_refresh_errors_total')
+            logger.error(f"Background schedule refresh failed: {e}")
+        finally:
+            with self._state_lock:
+                self._refreshing = False
@@ -0,0 +1,90 @@
+from typing import Dict, List, Optional, Tuple
+
+# Значения колонки 'Актуальная', при которых дата доступна для записи
+ACTIVE_VALUES = {'да', 'yes', 'true', '1', '+'}
+
+# Допустимые названия колонок листа 'Даты' (после strip и lower)
+COLUMN_ALIASES = {
+    'level': {'уровень'},
+    'date': {'дата'},
+    'actual': {'актуальная'},
+    'link': {'ссылка', 'ссылка на группу'},
+}
+
+REQUIRED_COLUMNS = ('level', 'date', 'actual')
+
+
+def find_columns(header_row: list) -> Dict[str, int]:
+    """Сопоставляет колонки листа с полями по точному совпадению заголовка"""
+    columns = {}
+    for i, header in enumerate(header_row):
+        normalized = header.strip().lower()
+        for field, aliases in COLUMN_ALIASES.items():
+            if normalized in aliases and field not in columns:
+                columns[field] = i
+    return columns
+
+
+class ScheduleIndex:
+    """Индекс расписания, строится один раз на каждый снимок листа 'Даты'"""
+
+    def __init__(self, rows: List[list]):
+        # уровень -> упорядоченный список актуальных дат
+        self._dates: Dict[str, List[str]] = {}
+        # (уровень, дата) -> ссылка на группу и статус
+        self._groups: Dict[Tuple[str, str], dict] = {}
+        self.columns: Dict[str, int] = {}
+
+        if len(rows) <= 1:
+            return
+
+        self.columns = find_columns(rows[0])
+        if any(field not in self.columns for field in REQUIRED_COLUMNS):
+            return
+
+        level_col = self.columns['level']
+        date_col = self.columns['date']
+        actual_col = self.columns['actual']
+        link_col = self.columns.get('link')
+
+        for row in rows[1:]:
+            self._add_row(row, level_col, date_col, actual_col, link_col)
+
+    def _add_row(self, row: list, level_col: int, date_col: int, actual_col: int, link_col: Optional[int]):
+        if len(row) <= max(level_col, date_col, actual_col):
+            return
+
+        level = row[level_col].strip().lower()
+        date = row[date_col].strip()
+        if not level or not date:
+            return
+
+        active = row[actual_col].strip().lower() in ACTIVE_VALUES
+        group_link = row[link_col].strip() if link_col is not None and len(row) > link_col else ''
+
+        key = (level, date)
+        existing = self._groups.get(key)
+        # Первая актуальная строка имеет приоритет, как и при прежнем поиске
+        if existing is not None and (existing['active'] or not active):
+            return
+
+        self._groups[key] = {'active': active, 'group_link': group_link or None}
+        if active:
+            self._dates.setdefault(level, []).append(date)
+
+    def dates_for_level(self, level: str) -> List[str]:
+        return self._dates.get(level.lower(), [])
+
+    def group_info(self, level: str, date: str) -> dict:
+        group = self._groups.get((level.lower(), date))
+        if group is None or not group['active']:
+            return {"group_exists": False, "group_link": None}
+
+        return {
+            "group_exists": True,
+            "group_link": group['group_link'],
+            "has_link": bool(group['group_link'])
+        }
+
+    def __len__(self) -> int:
+        return len(self._groups)
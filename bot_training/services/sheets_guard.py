@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+READ = 'read'
+WRITE = 'write'
+# Метаданные файла из Drive API: своя квота, намного больше квоты Sheets
+DRIVE = 'drive'
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+BREAKER_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class SheetsUnavailable(Exception):
+    """Запрос к Google не отправлялся: квота, пауза после 429 или открытый предохранитель"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QuotaExceeded(SheetsUnavailable):
+    pass
+
+
+class CircuitOpen(SheetsUnavailable):
+    pass
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """429 от Sheets API (gspread.exceptions.APIError)"""
+    code = getattr(error, 'code', None)
+    if code is None:
+        code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return code == 429
+
+
+class QuotaTracker:
+    """Скользящее окно запросов к Sheets API с отдельными бюджетами на чтение и запись"""
+
+    def __init__(self, limits: Dict[str, int], window: float = 60.0):
+        self.limits = limits
+        self.window = window
+        self._calls = {kind: deque() for kind in limits}
+        self._lock = threading.Lock()
+
+    def _expire(self, kind: str, now: float):
+        calls = self._calls[kind]
+        while calls and calls[0] <= now - self.window:
+            calls.popleft()
+
+    def try_acquire(self, kind: str) -> float:
+        """0 - запрос учтен, иначе сколько секунд ждать освобождения бюджета"""
+        if kind not in self.limits:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            self._expire(kind, now)
+            calls = self._calls[kind]
+            if len(calls) >= self.limits[kind]:
+                return calls[0] + self.window - now
+            calls.append(now)
+            return 0.0
+
+    def used(self, kind: str) -> int:
+        with self._lock:
+            self._expire(kind, time.monotonic())
+            return len(self._calls[kind])
+
+
+class SheetsGuard:
+    """Учет квоты, пауза после 429 и предохранитель для вызовов Google Sheets.
+
+    Вызовы выполняются в потоках пула AsyncSheetsManager, поэтому guard
+    не ждет, а сразу отказывает исключением SheetsUnavailable: зеркало
+    повторит синхронизацию позже, а обработчики в это время работают
+    с локальной копией данных.
+
+    После failure_threshold ошибок подряд предохранитель размыкается на
+    reset_timeout секунд, затем пропускает один пробный запрос. На 429
+    запросы приостанавливаются на backoff_base * 2^n секунд (не больше
+    backoff_max), n растет с каждым 429 подряд.
+    """
+
+    def __init__(self, quota: QuotaTracker, failure_threshold: int = 5, reset_timeout: float = 30,
+                 backoff_base: float = 1, backoff_max: float = 64):
+        self.quota = quota
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.state = CLOSED
+        self.failures = 0
+        self.throttled = 0
+        self.last_error: Optional[str] = None
+        self._opened_at = 0.0
+        self._backoff_until = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        metrics.set('sheets_breaker_state', BREAKER_STATE_VALUES[CLOSED])
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"Sheets circuit breaker: {self.state} -> {state}")
+            self.state = state
+            metrics.set('sheets_breaker_state', BREAKER_STATE_VALUES[state])
+
+    def _before(self, kind: str):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN:
+                if now - self._opened_at < self.reset_timeout:
+                    raise CircuitOpen("Sheets circuit breaker is open", self._opened_at + self.reset_timeout - now)
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._trial_running:
+                    raise CircuitOpen("Sheets circuit breaker is probing", self.reset_timeout)
+                self._trial_running = True
+            if now < self._backoff_until:
+                self._trial_running = False
+                metrics.inc('sheets_backoff_rejections_total', kind=kind)
+                raise QuotaExceeded("Sheets API backoff after 429", self._backoff_until - now)
+
+        wait = self.quota.try_acquire(kind)
+        if wait:
+            with self._lock:
+                self._trial_running = False
+            metrics.inc('sheets_quota_rejections_total', kind=kind)
+            raise QuotaExceeded(f"Sheets {kind} quota exhausted", wait)
+
+    def _on_success(self):
+        with self._lock:
+            self.failures = 0
+            self.throttled = 0
+            self._trial_running = False
+            self._set_state(CLOSED)
+
+    def _on_failure(self, error: Exception):
+        now = time.monotonic()
+        with self._lock:
+            self._trial_running = False
+            self.last_error = f"{type(error).__name__}: {error}"
+            if is_rate_limited(error):
+                delay = min(self.backoff_max, self.backoff_base * 2 ** self.throttled)
+                self.throttled += 1
+                self._backoff_until = now + delay
+                metrics.inc('sheets_throttled_total')
+                logger.warning(f"Sheets API returned 429, pausing requests for {delay:.1f}s")
+                if self.state == HALF_OPEN:
+                    self._opened_at = now
+                    self._set_state(OPEN)
+                return
+
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self._opened_at = now
+                if self.state != OPEN:
+                    metrics.inc('sheets_breaker_opens_total')
+                self._set_state(OPEN)
+
+    def call(self, kind: str, func: Callable, *args):
+        """Выполняет запрос к Google с учетом квоты и состояния предохранителя"""
+        self._before(kind)
+        try:
+            result = func(*args)
+        except Exception as e:
+            self._on_failure(e)
+            raise
+        self._on_success()
+        return result
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'throttled': self.throttled,
+                'backoff_remaining': max(0.0, self._backoff_until - now),
+                'open_remaining': max(0.0, self._opened_at + self.reset_timeout - now) if self.state == OPEN else 0.0,
+                'last_error': self.last_error,
+                'quota': {kind: (self.quota.used(kind), limit) for kind, limit in self.quota.limits.items()},
+            }
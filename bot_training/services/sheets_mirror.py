@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from data.local_store import OWNER_LOCAL, OWNER_SHEETS, LocalStore, MirroredSheet
+from services.metrics import metrics
+from services.schedule_index import find_columns
+from services.sheets_guard import SheetsUnavailable
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_SHEET = 'Даты'
+STUDENTS_SHEET = 'Ученики'
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+@lru_cache(maxsize=16)
+def _schedule_key_columns(header: tuple) -> tuple:
+    columns = find_columns(list(header))
+    return columns.get('level'), columns.get('date')
+
+
+def schedule_key(header: list, row: list) -> Optional[str]:
+    """Строка расписания определяется уровнем и датой"""
+    level_col, date_col = _schedule_key_columns(tuple(header))
+    if level_col is None or date_col is None or len(row) <= max(level_col, date_col):
+        return None
+    level, date = row[level_col].strip().lower(), row[date_col].strip()
+    return f"{level}|{date}" if level and date else None
+
+
+def student_key(header: list, row: list) -> Optional[str]:
+    """Ученик в листе - это user_id, уровень и дата (см. build_student_row)"""
+    if len(row) < 5 or not str(row[0]).strip():
+        return None
+    return f"{row[0]}|{row[3]}|{row[4]}"
+
+
+# Расписание ведут администраторы в таблице, учеников записывает бот
+SCHEDULE_MIRROR = MirroredSheet(SCHEDULE_SHEET, schedule_key, OWNER_SHEETS)
+STUDENTS_MIRROR = MirroredSheet(STUDENTS_SHEET, student_key, OWNER_LOCAL)
+
+
+class SheetsMirror:
+    """Фоновая двусторонняя синхронизация LocalStore с Google Sheets.
+
+    Изменения из базы отправляются пачками раз в push_interval секунд
+    (или сразу после wakeup), содержимое листов забирается раз в
+    pull_interval секунд. Обработчики работают только с локальной базой
+    и Google не ждут.
+
+    Листы скачиваются, только если с прошлого pull изменилось время
+    изменения таблицы в Drive; скачанные строки сравниваются с базой,
+    и записываются только изменившиеся.
+    """
+
+    def __init__(self, sheets_manager, store: LocalStore, sheets: List[MirroredSheet],
+                 push_interval: float = 0.5, pull_interval: float = 60, max_batch: int = 50,
+                 check_modified: bool = True):
+        self.sheets_manager = sheets_manager
+        self.store = store
+        self.sheets = {spec.title: spec for spec in sheets}
+        self.push_interval = push_interval
+        self.pull_interval = pull_interval
+        self.max_batch = max_batch
+        # Перед загрузкой листов сверять время изменения таблицы
+        self.check_modified = check_modified
+        self._pulled_revision: Optional[str] = None
+        self._listeners: Dict[str, List[Callable[[], Awaitable]]] = {}
+        self._wakeup = asyncio.Event()
+        self._sync_lock = asyncio.Lock()
+        self._last_pull = 0.0
+        # Время последнего успешного pull каждого листа - возраст локальной копии
+        self.pulled_at: Dict[str, float] = {}
+        self._task = None
+
+    def on_change(self, title: str, listener: Callable[[], Awaitable]):
+        """listener вызывается, когда pull изменил локальную копию листа"""
+        self._listeners.setdefault(title, []).append(listener)
+
+    def wakeup(self):
+        self._wakeup.set()
+
+    async def start(self):
+        # Первая синхронизация до приема апдейтов; без Google бот работает на локальной копии
+        await self.pull_all()
+        for title in self.sheets:
+            metrics.set('write_behind_pending_rows', self.store.pending_count(title), sheet=title)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Последняя попытка отправить все, что накопилось
+        for title in self.sheets:
+            while self.store.pending_count(title):
+                if not await self.push(title):
+                    break
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.push_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if time.monotonic() - self._last_pull >= self.pull_interval:
+                await self.pull_all()
+            for title in self.sheets:
+                if self.store.pending_count(title) and not await self.push(title):
+                    # Таблица недоступна - остальные листы подождут следующего цикла
+                    break
+
+    async def pull_all(self):
+        """Забирает все листы, если таблица изменилась с прошлого полного pull"""
+        self._last_pull = time.monotonic()
+        revision = await self._remote_revision() if self.check_modified else None
+        if revision is not None and revision == self._pulled_revision:
+            metrics.inc('mirror_pulls_skipped_total')
+            return
+        results = [await self.pull(title) for title in self.sheets]
+        if all(stats is not None for stats in results):
+            # Время изменения получено до загрузки, поэтому правки,
+            # сделанные во время нее, не потеряются: их увидит следующая проверка
+            self._pulled_revision = revision
+
+    async def _remote_revision(self) -> Optional[str]:
+        """modifiedTime таблицы или None, если его не удалось узнать"""
+        try:
+            return await self.sheets_manager.get_modified_time()
+        except Exception as e:
+            logger.warning(f"Could not check spreadsheet modified time: {e}")
+            return None
+
+    async def pull(self, title: str) -> Optional[dict]:
+        """Забирает лист и сливает его с базой. None - таблица недоступна"""
+        spec = self.sheets[title]
+        async with self._sync_lock:
+            started = time.monotonic()
+            try:
+                values = await self.sheets_manager.get_values(title)
+            except SheetsUnavailable as e:
+                # Запрос не отправлялся; обработчики работают с последней копией листа
+                metrics.inc('mirror_pull_errors_total', sheet=title)
+                logger.warning(f"Sheet '{title}' not pulled: {e}, retry in {e.retry_after:.0f}s")
+                return None
+            except Exception as e:
+                metrics.inc('mirror_pull_errors_total', sheet=title)
+                logger.error(f"Error pulling sheet '{title}': {e}")
+                return None
+            stats = self.store.merge_remote(spec, values)
+            self.pulled_at[title] = time.time()
+            metrics.observe('mirror_pull_seconds', time.monotonic() - started, sheet=title)
+
+        if stats['conflicts']:
+            metrics.inc('mirror_conflicts_total', stats['conflicts'], sheet=title)
+        if stats['inserted'] or stats['updated'] or stats['deleted']:
+            logger.info(f"Sheet '{title}' pulled: {stats}")
+            for listener in self._listeners.get(title, []):
+                await listener()
+        return stats
+
+    async def push(self, title: str) -> bool:
+        """Отправляет одну пачку измененных строк. False - отправка будет повторена"""
+        async with self._sync_lock:
+            batch = self.store.dirty_rows(title, self.max_batch)
+            if not batch:
+                return True
+
+            started = time.monotonic()
+            updates = []
+            appends = []
+            for key, row, base, sheet_row, _ in batch:
+                if sheet_row is None:
+                    appends.append((key, row))
+                else:
+                    # Дополняем пустыми ячейками, чтобы стереть хвост прежней строки
+                    updates.append((key, row, sheet_row, row + [''] * (len(base or []) - len(row))))
+
+            pushed = []
+            try:
+                if updates:
+                    await self.sheets_manager.update_rows(title, [(sheet_row, padded) for _, _, sheet_row, padded in updates])
+                    pushed.extend((key, row, sheet_row) for key, row, sheet_row, _ in updates)
+                if appends:
+                    first_row = await self.sheets_manager.append_rows(title, [row for _, row in appends])
+                    pushed.extend((key, row, first_row + i if first_row else None)
+                                  for i, (key, row) in enumerate(appends))
+            except Exception as e:
+                metrics.inc('write_behind_flush_errors_total')
+                if isinstance(e, SheetsUnavailable):
+                    # Строки остаются в базе до следующей попытки
+                    logger.debug(f"Push to sheet '{title}' deferred: {e}")
+                else:
+                    logger.error(f"Error pushing {len(batch)} rows to sheet '{title}': {e}")
+                self.store.mark_pushed(title, pushed)
+                return False
+
+            self.store.mark_pushed(title, pushed)
+            metrics.observe('write_behind_flush_seconds', time.monotonic() - started)
+            # Сколько строка ждала от записи в базу до попадания в таблицу
+            metrics.observe('write_behind_row_delay_seconds', time.time() - min(entry[4] for entry in batch))
+            metrics.observe('write_behind_batch_size', len(batch), buckets=BATCH_SIZE_BUCKETS)
+            metrics.set('write_behind_pending_rows', self.store.pending_count(title), sheet=title)
+            return True
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict
+
+from config import LEVELS
+from keyboards.inline_kb import get_dates_keyboard, get_levels_keyboard
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+    """Прогрев бота до начала polling или webhook.
+
+    Регистрируется в dp.startup, поэтому aiogram не принимает апдейты,
+    пока прогрев не закончится: авторизация в Google, первая синхронизация
+    с таблицей, снимок расписания и клавиатуры готовы к первому
+    пользователю. ready - признак готовности; его отдает /ready на
+    сервере метрик и метрика bot_ready.
+    """
+
+    def __init__(self, sheets_manager, sheets_mirror):
+        self.sheets_manager = sheets_manager
+        self.sheets_mirror = sheets_mirror
+        self.ready = asyncio.Event()
+        self.phases: Dict[str, float] = {}
+        metrics.set('bot_ready', 0)
+
+    async def _phase(self, name: str, func: Callable[[], Awaitable], optional: bool = False):
+        started = time.monotonic()
+        try:
+            await func()
+        except Exception as e:
+            if not optional:
+                raise
+            # Без Google бот стартует на локальной копии данных
+            logger.warning(f"Startup phase '{name}' failed: {e}")
+        finally:
+            self.phases[name] = time.monotonic() - started
+            metrics.set('startup_phase_seconds', self.phases[name], phase=name)
+
+    async def _build_keyboards(self):
+        get_levels_keyboard()
+        for level in LEVELS.values():
+            dates, version = await self.sheets_manager.get_dates_with_version(level)
+            if dates:
+                get_dates_keyboard(dates, level, version)
+
+    async def run(self):
+        started = time.monotonic()
+        await self._phase('sheets_auth', self.sheets_manager.authorize, optional=True)
+        await self._phase('mirror', self.sheets_mirror.start)
+        await self._phase('schedule', self.sheets_manager.refresh_schedule, optional=True)
+        await self._phase('keyboards', self._build_keyboards, optional=True)
+
+        elapsed = time.monotonic() - started
+        metrics.set('startup_seconds', elapsed)
+        metrics.set('bot_ready', 1)
+        self.ready.set()
+        phases = ', '.join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+        logger.info(f"Bot is ready in {elapsed:.2f}s ({phases})")
+
+    async def stop(self):
+        self.ready.clear()
+        metrics.set('bot_ready', 0)
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+logger = logging.getLogger(__name__)
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, path: str, secret_token: str,
+                       handle_in_background: bool = True) -> web.Application:
+    """aiohttp-приложение, принимающее апдейты от Telegram.
+
+    Запросы без правильного заголовка X-Telegram-Bot-Api-Secret-Token
+    отклоняются с кодом 401 еще до разбора апдейта.
+    """
+    if not secret_token:
+        raise ValueError("WEBHOOK_SECRET обязателен в режиме webhook")
+
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=secret_token,
+        handle_in_background=handle_in_background
+    ).register(app, path=path)
+    # startup/shutdown диспетчера вызываются вместе с запуском приложения
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, base_url: str, path: str, secret_token: str,
+                      host: str, port: int):
+    """Регистрирует webhook в Telegram и обслуживает его до остановки процесса"""
+
+    async def set_webhook(bot: Bot):
+        await bot.set_webhook(
+            f"{base_url.rstrip('/')}{path}",
+            secret_token=secret_token,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+        logger.info(f"Webhook set to {base_url}{path}")
+
+    dp.startup.register(set_webhook)
+    app = create_webhook_app(dp, bot, path, secret_token)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    logger.info(f"Webhook server listening on {host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
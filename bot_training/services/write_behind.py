@@ -0,0 +1,55 @@
+import logging
+from typing import Iterable, Set
+
+from data.local_store import LocalStore
+from services.google_sheets import GoogleSheetsManager
+from services.sheets_mirror import STUDENTS_MIRROR, STUDENTS_SHEET, SheetsMirror
+
+logger = logging.getLogger(__name__)
+
+
+class StudentWriteQueue:
+    """Отложенная запись учеников в лист 'Ученики'.
+
+    Ученик сразу сохраняется в локальную базу - она основная копия и
+    переживает перезапуск, - а в таблицу строки уходят пачками через
+    SheetsMirror. Повторная запись того же ученика на ту же дату
+    (например, смена статуса оплаты) обновляет его строку, а не добавляет новую.
+    """
+
+    def __init__(self, store: LocalStore, mirror: SheetsMirror):
+        self.store = store
+        self.mirror = mirror
+
+    def enqueue(self, user_data: dict) -> bool:
+        """Сохраняет ученика. True - строка записана в локальную базу"""
+        if not GoogleSheetsManager.save_student(self.store, user_data):
+            return False
+        if self.store.pending_count(STUDENTS_SHEET) >= self.mirror.max_batch:
+            self.mirror.wakeup()
+        return True
+
+    async def flush(self) -> bool:
+        """Отправляет одну пачку строк. False - запись не удалась и будет повторена"""
+        return await self.mirror.push(STUDENTS_SHEET)
+
+    @staticmethod
+    def row_key(user_data: dict) -> str:
+        """Ключ строки ученика в локальной базе"""
+        return STUDENTS_MIRROR.key([], GoogleSheetsManager.build_student_row(user_data))
+
+    async def flush_rows(self, keys: Iterable[str]) -> Set[str]:
+        """Отправляет пачки, пока строки keys не окажутся в таблице.
+
+        Пачка - это самые старые измененные строки, поэтому перед keys
+        могут уйти строки, ждавшие раньше. Возвращает ключи, которые еще
+        ждут записи: отправка не удалась и будет повторена в фоне.
+        """
+        pending = self.store.dirty_keys(STUDENTS_SHEET, keys)
+        # Строки keys уходят не позже, чем все ожидающие сейчас
+        attempts = -(-self.store.pending_count(STUDENTS_SHEET) // self.mirror.max_batch) + 1
+        for _ in range(attempts):
+            if not pending or not await self.flush():
+                break
+            pending = self.store.dirty_keys(STUDENTS_SHEET, pending)
+        return pending